@@ -1,19 +1,23 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Header, Depends
 from pydantic import BaseModel
-from typing import List, Optional
-import json
-import numpy as np
-import redis
+from typing import Dict, List, Optional, Tuple
 import logging
-from sqlalchemy import create_engine, text
+import numpy as np
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
 
 from app.core.config import settings
+from app.core.connections import async_qdrant_client
+from app.core.vector_codec import EncodedVector
 from app.db.session import get_db
+from app.db.collection_profiles import get_profile, collection_config
+from app.db.init_db import async_ensure_payload_indexes
 
 from app.services.wandb_service import wandb_service
+from app.services.centroid_cache import centroid_cache, CentroidSet, DEFAULT_LEVEL
+from app.services.ingest_service import persist_results, VECTOR_DIM
+from app.services.write_behind import write_behind
+from app.services.worker import worker_stats
 
 # 로거 설정
 logger = logging.getLogger(__name__)
@@ -23,39 +27,39 @@ router = APIRouter()
 # 1. 데이터 모델 정의
 # ---------------------------------------------------------
 class InferenceResult(BaseModel):
-    job_id: int                 # post_id
-    unified_vector: List[float] # 1152차원 벡터
-    status: str                 # "completed" or "failed"
+    job_id: int                                     # post_id
+    unified_vector: Optional[List[float]] = None    # 1152차원 벡터 (JSON 리스트, 기존 형식)
+    vector: Optional[EncodedVector] = None          # 1152차원 벡터 (base64 바이너리, 신규 형식)
+    status: str                                     # "completed" or "failed"
+
+    def get_vector(self) -> Optional[np.ndarray]:
+        """바이너리 형식을 우선 사용하고, 없으면 JSON 리스트로 fallback"""
+        if self.vector is not None:
+            return self.vector.to_numpy().reshape(-1)
+        if self.unified_vector:
+            return np.asarray(self.unified_vector, dtype=np.float32)
+        return None
+
+class ScoreLevelsRequest(BaseModel):
+    """vectors / vector / post_ids 중 하나로 채점 대상을 지정합니다."""
+    vectors: Optional[List[List[float]]] = None     # (N, 1152) JSON 리스트
+    vector: Optional[EncodedVector] = None          # (N, 1152) base64 바이너리
+    post_ids: Optional[List[int]] = None            # Qdrant 에 저장된 포스트를 다시 채점 (감사용)
+    centroids: Optional[Dict[str, List[float]]] = None  # 지정하면 현재 Centroid 대신 사용 (what-if)
+    top_k: int = 3
 
 class FeedbackRequest(BaseModel):
     post_id: int
     correct_level: int
 
 # ---------------------------------------------------------
-# 2. 유틸리티: DB 및 Redis 연결 설정
+# 2. 유틸리티: DB 및 Qdrant 연결 설정
 # ---------------------------------------------------------
-# Redis 연결
-redis_kwargs = {"decode_responses": True}
-if settings.REDIS_PASSWORD:
-    # AWS ElastiCache는 보통 SSL(rediss://) 필요
-    redis_url = f"rediss://:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}"
-    redis_kwargs["ssl_cert_reqs"] = None
-else:
-    redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"
-
-try:
-    redis_client = redis.Redis.from_url(redis_url, **redis_kwargs)
-    redis_client.ping()
-    logger.info("Redis 연결 성공 (routes.py)")
-except Exception as e:
-    logger.error(f"Redis 연결 실패 (routes.py): {e}")
-
-# MySQL 연결 (SQLAlchemy Core 사용 - 빠른 업데이트용)
-db_url = f"mysql+pymysql://{settings.MYSQL_USER}:{settings.MYSQL_PASSWORD}@{settings.MYSQL_HOST}:{settings.MYSQL_PORT}/{settings.MYSQL_DB}"
-db_engine = create_engine(db_url, pool_recycle=3600)
-
-# Qdrant 연결
-qdrant_client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+# 웹훅은 이벤트 루프(워커와 공유) 위에서 돌기 때문에 모두 비동기 클라이언트를 사용합니다.
+# - Redis: app/core/connections.redis_client (redis.asyncio)
+# - Qdrant: AsyncQdrantClient
+# - MySQL: aiomysql 기반 async_engine (app/services/ingest_service.py)
+qdrant_client = async_qdrant_client
 
 # ---------------------------------------------------------
 # 3. API 엔드포인트: 결과 수신 (Modal Webhook)
@@ -72,61 +76,36 @@ async def receive_inference_result(
         logger.warning("승인되지 않은 접근 시도 (Token Mismatch)")
         raise HTTPException(status_code=403, detail="Unauthorized")
 
-    if result.status != "completed" or not result.unified_vector:
+    try:
+        vector = result.get_vector()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if result.status != "completed" or vector is None or vector.size == 0:
         logger.warning("실패한 작업이므로 DB 업데이트를 건너뜁니다.")
         return {"status": "ignored"}
 
+    # 일괄 수신(/internal/inference-results)과 같은 차원 검사
+    if vector.size != VECTOR_DIM:
+        raise HTTPException(status_code=422, detail=f"vector dimension {vector.size} != {VECTOR_DIM}")
+
     try:
-        # A. Qdrant에 벡터 저장
-        # collection_name은 기존에 쓰시던 "santa_images"로 통일합니다.
-        try:
-            qdrant_client.upsert(
-                collection_name="santa_images",
-                points=[
-                    models.PointStruct(
-                        id=result.job_id,
-                        vector=result.unified_vector,
-                        payload={"post_id": result.job_id, "level": 0} # 초기엔 0, 아래에서 업데이트
-                    )
-                ]
-            )
-            logger.info(f"Qdrant 저장 완료 (ID: {result.job_id})")
-        except Exception as q_err:
-            logger.error(f"Qdrant 저장 실패: {q_err}")
-            # Qdrant 실패해도 RDS 업데이트는 시도하도록 continue
-
-        # B. 레벨 계산 (Centroid와 비교)
-        centroids_data = redis_client.get("system:centroids")
-        centroids = {}
-        if centroids_data:
-            centroids = json.loads(centroids_data)
-
-        level = calculate_level(result.unified_vector)
+        # A. 레벨 계산 (메모리 캐시된 Centroid와 비교)
+        level, bound = await calculate_level(vector)
         logger.info(f"📏 계산된 레벨: {level}")
 
-        # C. MySQL 업데이트 (level, content_visible=1)
-        with db_engine.connect() as conn:
-            # 1. posts 테이블 업데이트
-            stmt = text("""
-                UPDATE posts 
-                SET post_level = :lvl
-                WHERE post_id = :pid
-            """)
-            conn.execute(stmt, {"lvl": level, "pid": result.job_id})
-            
-            conn.commit()
-            
-        logger.info(f"RDS 업데이트 완료 (Post ID: {result.job_id} -> Level {level})")
-
-        # Qdrant Payload 업데이트 (레벨 확정)
-        qdrant_client.set_payload(
-            collection_name="santa_images",
-            payload={"level": level},
-            points=[result.job_id]
-        )
+        # B. Qdrant(벡터 + 레벨 + 재계산 bound) / MySQL(post_level) 저장
+        entry = (result.job_id, vector, level, bound)
+        if settings.WRITE_BEHIND_ENABLED:
+            # 다른 웹훅 결과와 묶여서 한 번에 저장된 뒤 반환됨
+            await write_behind.submit(*entry)
+        else:
+            await persist_results([entry])
+
+        logger.info(f"저장 완료 (Post ID: {result.job_id} -> Level {level})")
 
         wandb_service.log_point(
-            vector=result.unified_vector,
+            vector=vector.tolist(),
             point_type="post",
             point_id=str(result.job_id),
             level=level # 위에서 계산된 level
@@ -139,42 +118,156 @@ async def receive_inference_result(
 
     return {"status": "success", "assigned_level": level}
 
+# ---------------------------------------------------------
+# 3-1. API 엔드포인트: 결과 일괄 수신 (배치 작업 / 백필용)
+# ---------------------------------------------------------
+@router.post("/internal/inference-results")
+async def receive_inference_results(
+    results: List[InferenceResult],
+    x_santa_token: Optional[str] = Header(None, alias="x-santa-token")
+):
+    """
+    여러 건의 추론 결과를 한 번에 받아서
+    한 번의 행렬 연산으로 레벨을 계산하고, 한 번의 upsert / 일괄 UPDATE 로 저장합니다.
+    항목별 status: success / partial(RDS만 반영) / ignored / invalid
+    """
+    logger.info(f"[Webhook] 일괄 결과 수신 ({len(results)}건)")
+
+    if x_santa_token != settings.SANTA_SECRET_TOKEN:
+        logger.warning("승인되지 않은 접근 시도 (Token Mismatch)")
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    items = [{"job_id": r.job_id, "status": "ignored"} for r in results]
+    valid_idx = []
+    valid_vectors = []
+    for i, r in enumerate(results):
+        if r.status != "completed":
+            continue
+        try:
+            vector = r.get_vector()
+        except ValueError as e:
+            items[i]["status"] = "invalid"
+            items[i]["detail"] = str(e)
+            continue
+        if vector is None or vector.size == 0:
+            continue
+        if vector.size != VECTOR_DIM:
+            items[i]["status"] = "invalid"
+            items[i]["detail"] = f"vector dimension {vector.size} != {VECTOR_DIM}"
+            continue
+        valid_idx.append(i)
+        valid_vectors.append(vector)
+
+    if valid_idx:
+        try:
+            # A. 레벨 일괄 계산 (N x D) @ (D x L)
+            vectors = np.stack(valid_vectors)
+            centroid_set = await centroid_cache.get()
+            scores = centroid_set.score_batch(vectors)
+            levels = scores.levels
+            bounds = centroid_set.bounds(scores.margins)
+
+            # B. 일괄 저장
+            entries = [
+                (results[i].job_id, vectors[k], int(levels[k]), bounds[k])
+                for k, i in enumerate(valid_idx)
+            ]
+            vector_stored = await persist_results(entries)
+
+        except Exception as e:
+            logger.error(f"일괄 데이터 처리 중 에러: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for k, i in enumerate(valid_idx):
+            items[i]["status"] = "success" if vector_stored else "partial"
+            items[i]["assigned_level"] = int(levels[k])
+
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    logger.info(f"[Webhook] 일괄 처리 완료: {counts}")
+
+    return {"status": "success", "counts": counts, "results": items}
+
 # ---------------------------------------------------------
 # 4. 레벨 계산 로직
 # ---------------------------------------------------------
-def calculate_level(target_vector: List[float]) -> int:
+async def calculate_level(target_vector) -> Tuple[int, Optional[float]]:
+    """(레벨, 재계산 bound) 반환. bound 를 모르면 None (다음 재계산 때 무조건 다시 계산됨)"""
     try:
-        data = redis_client.get("system:centroids")
-        if not data:
-            logger.warning("Redis에 Centroid 데이터가 없습니다! 기본값 5 반환")
-            return 5
-        
-        centroids = json.loads(data)
-        
-        best_level = 5
-        max_similarity = -1.0
-        
-        target_np = np.array(target_vector)
-        target_norm = np.linalg.norm(target_np)
-
-        if target_norm == 0: return 5
-
-        for lvl_str, centroid_vec in centroids.items():
-            c_np = np.array(centroid_vec)
-            c_norm = np.linalg.norm(c_np)
-            if c_norm == 0: continue
-            
-            similarity = np.dot(target_np, c_np) / (target_norm * c_norm)
-            
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_level = int(lvl_str)
-        
-        return best_level
+        centroid_set = await centroid_cache.get()
+        if centroid_set.is_empty:
+            logger.warning(f"Centroid 데이터가 없습니다! 기본값 {DEFAULT_LEVEL} 반환")
+            return DEFAULT_LEVEL, None
+
+        scores = centroid_set.score_batch(target_vector)
+        return int(scores.levels[0]), centroid_set.bounds(scores.margins)[0]
 
     except Exception as e:
         logger.error(f"레벨 계산 중 에러: {e}")
-        return 5
+        return DEFAULT_LEVEL, None
+
+# ---------------------------------------------------------
+# 4-1. API 엔드포인트: 레벨 일괄 채점 (감사 / what-if, 저장하지 않음)
+# ---------------------------------------------------------
+@router.post("/internal/score-levels")
+async def score_levels(
+    request: ScoreLevelsRequest,
+    x_santa_token: Optional[str] = Header(None, alias="x-santa-token")
+):
+    """
+    (N, 1152) 벡터 묶음을 한 번의 행렬 연산으로 채점해서
+    항목별 레벨 / margin / 상위 top_k 레벨과 유사도를 돌려줍니다.
+    """
+    if x_santa_token != settings.SANTA_SECRET_TOKEN:
+        logger.warning("승인되지 않은 접근 시도 (Token Mismatch)")
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    post_ids = None
+    missing = []
+    try:
+        if request.vector is not None:
+            vectors = request.vector.to_numpy().reshape(-1, VECTOR_DIM)
+        elif request.vectors is not None:
+            vectors = np.asarray(request.vectors, dtype=np.float32).reshape(-1, VECTOR_DIM)
+        elif request.post_ids is not None:
+            points = await qdrant_client.retrieve(
+                collection_name="santa_images", ids=request.post_ids, with_vectors=True, with_payload=False
+            )
+            found = {int(p.id): p.vector for p in points if p.vector}
+            post_ids = [pid for pid in request.post_ids if pid in found]
+            missing = [pid for pid in request.post_ids if pid not in found]
+            vectors = np.asarray([found[pid] for pid in post_ids], dtype=np.float32).reshape(-1, VECTOR_DIM)
+        else:
+            raise ValueError("vectors / vector / post_ids 중 하나가 필요합니다.")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if len(vectors) > settings.SCORE_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"batch size {len(vectors)} > {settings.SCORE_MAX_BATCH}")
+
+    if request.centroids is not None:
+        try:
+            centroid_set = CentroidSet.from_dict(request.centroids)
+            if not centroid_set.is_empty and centroid_set.matrix.shape[1] != VECTOR_DIM:
+                raise ValueError(f"centroid 차원은 {VECTOR_DIM} 이어야 합니다. (받은 값: {centroid_set.matrix.shape[1]})")
+        except (ValueError, TypeError) as e:
+            # 정수가 아닌 레벨 키 / 길이가 제각각인 centroid / 차원 불일치
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        centroid_set = await centroid_cache.get()
+
+    results = centroid_set.score_batch(vectors, top_k=request.top_k).to_list()
+    if post_ids is not None:
+        for pid, row in zip(post_ids, results):
+            row["post_id"] = pid
+
+    return {
+        "version": centroid_set.version if request.centroids is None else None,
+        "count": len(results),
+        "missing": missing,
+        "results": results,
+    }
 
 # ---------------------------------------------------------
 # 5. Qdrant 초기화 (유틸리티)
@@ -183,20 +276,33 @@ def calculate_level(target_vector: List[float]) -> int:
 async def setup_qdrant():
     try:
         collection_name = "santa_images"
-        collections = qdrant_client.get_collections().collections
-        exists = any(c.name == collection_name for c in collections)
-        
+        exists = await qdrant_client.collection_exists(collection_name)
+
         if exists:
             return {"message": f"Collection '{collection_name}' already exists."}
 
-        qdrant_client.create_collection(
+        profile = get_profile()
+        await qdrant_client.create_collection(
             collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=1152, 
-                distance=models.Distance.COSINE
-            ),
+            **collection_config(profile, 1152),
         )
-        return {"message": f"Collection '{collection_name}' created successfully!"}
+        # 증분 재계산 필터(bound <= drift)용 payload 인덱스 (init_db 와 같은 목록)
+        await async_ensure_payload_indexes(qdrant_client, collection_name)
+        return {"message": f"Collection '{collection_name}' created successfully! (profile={profile.name})"}
     
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+# ---------------------------------------------------------
+# 6. 워커 상태 (모니터링)
+# ---------------------------------------------------------
+@router.get("/internal/worker-stats")
+async def get_worker_stats(
+    x_santa_token: Optional[str] = Header(None, alias="x-santa-token")
+):
+    """큐 길이 / pending / 추론 동시 실행 수 / WandB 로깅 큐 상태"""
+    if x_santa_token != settings.SANTA_SECRET_TOKEN:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    stats = await worker_stats()
+    stats["wandb"] = wandb_service.stats
+    return stats
@@ -14,10 +14,85 @@ class Settings(BaseSettings):
     REDIS_QUEUE_NAME: str = "queue:inference"
     REDIS_FEEDBACK_QUEUE_NAME: str = "queue:feedback"
     REDIS_PASSWORD: str | None = None
+    REDIS_MAX_CONNECTIONS: int = 50
+
+    # [작업 큐 백엔드] list(기존 LPUSH/BLPOP) / stream(Redis Streams + Consumer Group)
+    # - stream 사용 시 생산자는 XADD <stream> * data '<job json>' 으로 넣어야 함
+    # - 처리 완료 후 XACK, 죽은 워커가 들고 있던 항목은 QUEUE_CLAIM_IDLE_MS 후 XAUTOCLAIM 으로 회수
+    QUEUE_BACKEND: str = "list"
+    REDIS_INFERENCE_STREAM: str = "stream:inference"
+    REDIS_FEEDBACK_STREAM: str = "stream:feedback"
+    QUEUE_CONSUMER_GROUP: str = "santa-workers"
+    QUEUE_CONSUMER_NAME: Optional[str] = None   # 기본값: 호스트명 (재시작 시 자기 pending 부터 다시 처리)
+    QUEUE_READ_COUNT: int = 10                  # XREADGROUP 한 번에 읽을 최대 개수
+    QUEUE_BLOCK_MS: int = 1000
+    QUEUE_CLAIM_IDLE_MS: int = 60000
+    QUEUE_MAX_DELIVERIES: int = 5               # 초과하면 <stream>:dead 로 옮기고 ACK
+    QUEUE_STREAM_MAXLEN: int = 100000           # XADD 시 대략적인 길이 상한
+    INFERENCE_CONSUMERS: int = 1                # 프로세스당 inference 소비 루프 수
+    FEEDBACK_CONSUMERS: int = 1                 # 프로세스당 feedback 소비 루프 수
+
+    # [추론 요청 동시 실행 제한] 다 차면 큐에서 더 꺼내지 않음
+    INFERENCE_MAX_IN_FLIGHT: int = 32
+    WORKER_DRAIN_TIMEOUT: float = 30.0          # 종료 시 실행 중인 요청을 기다리는 시간
+
+    # [워커 실행 위치]
+    # - EMBEDDED_WORKER_ENABLED=False 면 API 프로세스는 큐를 소비하지 않음 (python -m app.worker 로 따로 실행)
+    # - WORKER_ROLE: all / inference / feedback
+    EMBEDDED_WORKER_ENABLED: bool = True
+    WORKER_ROLE: str = "all"
+
+    # [추론 마이크로 배칭] 1 이면 기존처럼 건별 run_inference, 2 이상이면 모아서 run_inference_batch
+    # (INFERENCE_MAX_IN_FLIGHT 가 배치 크기보다 작으면 배치가 다 차지 않음)
+    INFERENCE_BATCH_SIZE: int = 1
+    INFERENCE_BATCH_MAX_DELAY_MS: int = 200
     
     # [Qdrant 설정]
     QDRANT_HOST: str = "qdrant"
     QDRANT_PORT: int = 6333
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_PREFER_GRPC: bool = False
+    # santa_images 저장 프로필 (default / float16 / int8 / binary / compact, app/db/collection_profiles.py)
+    QDRANT_COLLECTION_PROFILE: str = "default"
+
+    # [웹훅 Write-behind 버퍼] (opt-in)
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_MAX_ITEMS: int = 200       # 한 번에 flush 할 최대 건수
+    WRITE_BEHIND_MAX_DELAY_MS: int = 50     # 첫 건 수신 후 최대 대기 시간
+    WRITE_BEHIND_MAX_PENDING: int = 5000    # 버퍼 상한 (가득 차면 웹훅이 대기)
+
+    # [벡터 직렬화 형식] json(기존) / float32 / float16
+    # - VECTOR_WIRE_ENCODING: Modal -> 웹훅 전송 형식 (json 이 아니면 base64 바이너리)
+    # - CENTROID_STORAGE_FORMAT: Redis system:centroids 저장 형식 (읽을 때는 자동 판별)
+    VECTOR_WIRE_ENCODING: str = "json"
+    CENTROID_STORAGE_FORMAT: str = "json"
+
+    # [레벨 일괄 채점 API] /internal/score-levels 한 번에 받을 최대 벡터 수
+    SCORE_MAX_BATCH: int = 10000
+
+    # [피드백 처리] 한 번에 꺼내서 묶어 반영할 최대 피드백 수
+    FEEDBACK_DRAIN_MAX: int = 500
+
+    # [피드백 후 레벨 재계산]
+    # - incremental: 저장된 margin bound 로 레벨이 바뀔 수 있는 포스트만 재계산
+    # - full: 모든 포스트 재계산
+    RECALC_MODE: str = "incremental"
+    RECALC_PAGE_SIZE: int = 1000               # Qdrant scroll 한 페이지 크기
+    RECALC_TRUST_PAYLOAD_LEVEL: bool = False   # True 면 기존 레벨을 RDS 대신 Qdrant payload 로 비교
+    RECALC_WORKERS: int = 1                    # 2 이상이면 post_id 구간별로 프로세스 병렬 처리
+
+    # [로컬 임베딩 미러] santa_images 의 memmap 사본 (재계산/통계를 Qdrant 없이 수행)
+    MIRROR_ENABLED: bool = False
+    MIRROR_DIR: str = "mirror_data"
+    MIRROR_RECONCILE_INTERVAL: int = 3600   # 초
+    MIRROR_RECALC_MAX_STALENESS: int = 300  # 재계산 전, 마지막 정합성 맞춤이 이보다 오래됐으면 먼저 맞춤 (초)
+
+    # [WandB 모니터링] 백그라운드 스레드에서 묶어서 전송
+    WANDB_API_KEY: Optional[str] = None
+    WANDB_MODE: str = "online"          # online / offline / disabled(no-op sink)
+    WANDB_QUEUE_SIZE: int = 10000       # 가득 차면 버리고 dropped 카운트
+    WANDB_FLUSH_INTERVAL: float = 10.0  # 초
+    WANDB_MAX_BATCH: int = 1000         # Table 하나에 담을 최대 행 수
 
     # [보안 및 통신]
     CALLBACK_BASE_URL: str 
@@ -34,10 +109,16 @@ class Settings(BaseSettings):
     MYSQL_PASSWORD: str
     MYSQL_DB: str
     MYSQL_PORT: int = 3306
+    MYSQL_POOL_SIZE: int = 10
+    MYSQL_MAX_OVERFLOW: int = 20
 
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         return f"mysql+pymysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DB}"
+
+    @property
+    def ASYNC_SQLALCHEMY_DATABASE_URI(self) -> str:
+        return f"mysql+aiomysql://{self.MYSQL_USER}:{self.MYSQL_PASSWORD}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DB}"
     
     model_config = SettingsConfigDict(
         env_file=".env",
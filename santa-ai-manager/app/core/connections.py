@@ -1,10 +1,70 @@
+# app/core/connections.py
+# Redis / MySQL / Qdrant 연결을 한 곳에서 만들고 재사용합니다. (프로세스당 1세트)
+# - 풀 크기는 settings 로 조정
+# - FastAPI lifespan 종료 시 close_connections() 로 모두 정리
+import redis
 from redis.asyncio import Redis
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
 from app.core.config import settings
+from app.core.redis_options import redis_options
+
+# ---------------------------------------------------------
+# 1. Redis
+# ---------------------------------------------------------
+# AWS ElastiCache는 보통 SSL(rediss://) 필요 - 비밀번호가 있으면 rediss:// (app/core/redis_options.py)
+redis_url, redis_kwargs = redis_options(settings.REDIS_HOST, settings.REDIS_PORT, settings.REDIS_PASSWORD)
+redis_kwargs["max_connections"] = settings.REDIS_MAX_CONNECTIONS
+
+# 비동기 (서버 / 워커)
+redis_client = Redis.from_url(redis_url, **redis_kwargs)
+
+def create_sync_redis() -> redis.Redis:
+    """동기 스크립트용 (inject_centroids.py, push_job.py 등) - 같은 URL/SSL 설정 사용"""
+    return redis.Redis.from_url(redis_url, **redis_kwargs)
+
+# ---------------------------------------------------------
+# 2. MySQL
+# ---------------------------------------------------------
+mysql_pool_kwargs = dict(
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=settings.MYSQL_POOL_SIZE,
+    max_overflow=settings.MYSQL_MAX_OVERFLOW,
+)
+
+# 동기 (재계산 등 스레드/프로세스 작업용, pymysql)
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **mysql_pool_kwargs)
+
+# 비동기 (웹훅 등 이벤트 루프 위의 경로용, aiomysql)
+async_engine = create_async_engine(settings.ASYNC_SQLALCHEMY_DATABASE_URI, **mysql_pool_kwargs)
+
+# ---------------------------------------------------------
+# 3. Qdrant (QDRANT_PREFER_GRPC=True 이면 gRPC 사용)
+# ---------------------------------------------------------
+qdrant_kwargs = dict(
+    host=settings.QDRANT_HOST,
+    port=settings.QDRANT_PORT,
+    grpc_port=settings.QDRANT_GRPC_PORT,
+    prefer_grpc=settings.QDRANT_PREFER_GRPC,
+)
+
+def create_qdrant_client() -> QdrantClient:
+    """별도 프로세스(병렬 재계산 등)에서 자체 연결이 필요할 때 사용"""
+    return QdrantClient(**qdrant_kwargs)
 
-redis_url = f"rediss://:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+# 동기 (스레드 작업용) / 비동기 (이벤트 루프용)
+qdrant_client = create_qdrant_client()
+async_qdrant_client = AsyncQdrantClient(**qdrant_kwargs)
 
-redis_client = Redis.from_url(
-    redis_url,
-    decode_responses=True,
-    ssl_cert_reqs=None
-)
\ No newline at end of file
+# ---------------------------------------------------------
+# 4. 정리
+# ---------------------------------------------------------
+async def close_connections():
+    await redis_client.aclose()
+    await async_qdrant_client.close()
+    qdrant_client.close()
+    await async_engine.dispose()
+    engine.dispose()
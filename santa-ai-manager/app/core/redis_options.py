@@ -0,0 +1,14 @@
+# app/core/redis_options.py
+# Redis 접속 URL / 옵션 (서버, 워커, 스크립트, Modal 배치 작업이 같은 설정으로 접속)
+# 앱 설정을 import 하지 않으므로 환경 변수만 있는 Modal 컨테이너에서도 사용할 수 있습니다.
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+
+def redis_options(host: str, port: int, password: Optional[str] = None) -> Tuple[str, dict]:
+    """(url, redis.Redis.from_url 키워드 인자). 비밀번호가 있으면 SSL(rediss://, AWS ElastiCache)."""
+    kwargs = {"decode_responses": True}
+    if password:
+        kwargs["ssl_cert_reqs"] = None
+        return f"rediss://:{quote(password, safe='')}@{host}:{port}", kwargs
+    return f"redis://{host}:{port}", kwargs
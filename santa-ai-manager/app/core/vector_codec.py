@@ -0,0 +1,62 @@
+import base64
+from typing import List, Literal, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+# 벡터를 JSON 실수 리스트 대신 little-endian 바이너리(base64)로 주고받기 위한 코덱
+# - JSON 리스트(1152차원) 약 20KB -> float32 약 6KB / float16 약 3KB
+# - 디코딩은 np.frombuffer 로 파싱 없이 바로 배열화
+SUPPORTED_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+class EncodedVector(BaseModel):
+    dtype: Literal["float32", "float16"] = "float32"
+    shape: List[int]
+    data: str  # base64(little-endian raw bytes)
+
+    def to_numpy(self) -> np.ndarray:
+        return decode_array(self.dtype, self.shape, self.data)
+
+
+def encode_array(array: Sequence, dtype: str = "float32") -> dict:
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"지원하지 않는 dtype: {dtype}")
+    arr = np.ascontiguousarray(array, dtype=SUPPORTED_DTYPES[dtype])
+    return {
+        "dtype": dtype,
+        "shape": list(arr.shape),
+        "data": base64.b64encode(arr.tobytes()).decode("ascii"),
+    }
+
+
+def decode_array(dtype: str, shape: Sequence[int], data: str) -> np.ndarray:
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"지원하지 않는 dtype: {dtype}")
+    raw = base64.b64decode(data)
+    arr = np.frombuffer(raw, dtype=SUPPORTED_DTYPES[dtype])
+    if arr.size != int(np.prod(shape)):
+        raise ValueError(f"shape {list(shape)} 와 데이터 크기({arr.size})가 맞지 않습니다.")
+    # float16 은 계산용으로 float32 로 올림 (float32 는 복사 없이 그대로 사용)
+    return arr.reshape(shape).astype(np.float32, copy=False)
+
+
+if __name__ == "__main__":
+    # 간단 벤치마크: JSON 리스트 vs base64 바이너리 (1152차원 벡터 1개)
+    import json
+    import timeit
+    from pydantic import TypeAdapter
+
+    float_list = TypeAdapter(List[float])
+
+    vec = np.random.default_rng(0).normal(size=1152)
+    vec = (vec / np.linalg.norm(vec)).tolist()
+
+    as_json = json.dumps({"unified_vector": vec})
+    print(f"JSON 리스트  : {len(as_json):>6} bytes, "
+          f"decode {timeit.timeit(lambda: np.array(float_list.validate_python(json.loads(as_json)['unified_vector']), dtype=np.float32), number=1000):.3f} ms/op")
+
+    for dt in SUPPORTED_DTYPES:
+        as_bin = json.dumps({"vector": encode_array(vec, dt)})
+        print(f"{dt:<12}: {len(as_bin):>6} bytes, "
+              f"decode {timeit.timeit(lambda: EncodedVector(**json.loads(as_bin)['vector']).to_numpy(), number=1000):.3f} ms/op")
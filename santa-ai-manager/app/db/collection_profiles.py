@@ -0,0 +1,408 @@
+# app/db/collection_profiles.py
+# santa_images 컬렉션 저장 프로필 (datatype / 양자화 / on_disk / HNSW)
+#
+# 사용법:
+#   python -m app.db.collection_profiles bench                 # 프로필별 메모리/레벨 일치율 (합성 데이터)
+#   python -m app.db.collection_profiles bench --source qdrant # 실제 santa_images 샘플로 측정
+#   python -m app.db.collection_profiles migrate int8          # 새 프로필로 복사 후 alias 전환
+import time
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIM = 1152
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    - datatype: 저장 벡터 타입 (float32 / float16). 재계산이 읽어가는 벡터가 이 정밀도입니다.
+    - quantization: none / int8 / binary. 검색용 보조 인덱스이며 원본은 그대로 유지 (rescore)
+    - on_disk: 원본 벡터를 mmap 으로 디스크에 두고 RAM 에는 양자화 벡터만 유지
+    - hnsw_m / hnsw_ef_construct: HNSW 그래프 파라미터 (m=0 이면 그래프를 만들지 않음)
+    """
+    name: str
+    datatype: str = "float32"
+    quantization: str = "none"
+    on_disk: bool = False
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "default": CollectionProfile("default"),
+    "float16": CollectionProfile("float16", datatype="float16"),
+    "int8": CollectionProfile("int8", quantization="int8", on_disk=True),
+    "binary": CollectionProfile("binary", quantization="binary", on_disk=True),
+    # 레벨 판정은 전체 스캔(matmul)이라 ANN 그래프가 필요 없을 때
+    "compact": CollectionProfile("compact", datatype="float16", on_disk=True, hnsw_m=0),
+}
+
+
+def get_profile(name: Optional[str] = None) -> CollectionProfile:
+    name = name or settings.QDRANT_COLLECTION_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"알 수 없는 컬렉션 프로필: {name} (가능: {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+# ---------------------------------------------------------
+# 1. Qdrant 설정 변환
+# ---------------------------------------------------------
+def collection_config(profile: CollectionProfile, dim: int = VECTOR_DIM) -> dict:
+    """create_collection(**...) 에 그대로 넘길 수 있는 설정 (동기/비동기 클라이언트 공용)"""
+    config = {
+        "vectors_config": models.VectorParams(
+            size=dim,
+            distance=models.Distance.COSINE,
+            datatype=models.Datatype.FLOAT16 if profile.datatype == "float16" else models.Datatype.FLOAT32,
+            on_disk=profile.on_disk,
+        ),
+        "hnsw_config": models.HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct),
+    }
+    if profile.quantization == "int8":
+        config["quantization_config"] = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif profile.quantization == "binary":
+        config["quantization_config"] = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return config
+
+
+# ---------------------------------------------------------
+# 2. 메모리 사용량 추정 / 레벨 일치율
+# ---------------------------------------------------------
+def estimate_memory(profile: CollectionProfile, n_points: int, dim: int = VECTOR_DIM) -> dict:
+    """포인트 n 개 기준 RAM / 디스크 사용량 추정 (bytes, payload 제외)"""
+    vector_bytes = n_points * dim * (2 if profile.datatype == "float16" else 4)
+    quant_bytes = {"none": 0, "int8": n_points * dim, "binary": n_points * dim // 8}[profile.quantization]
+    # HNSW 0층 링크 2m 개 * 4 bytes (상위 층은 무시할 만큼 작음)
+    hnsw_bytes = n_points * profile.hnsw_m * 2 * 4
+    ram = quant_bytes + hnsw_bytes + (0 if profile.on_disk else vector_bytes)
+    return {
+        "ram_bytes": ram,
+        "disk_bytes": vector_bytes + quant_bytes + hnsw_bytes,
+        "ram_per_point": ram / max(n_points, 1),
+    }
+
+
+def _stored(profile: CollectionProfile, vectors: np.ndarray) -> np.ndarray:
+    """Qdrant 가 저장 후 돌려주는 벡터 (재계산이 보게 되는 값)"""
+    if profile.datatype == "float16":
+        return vectors.astype(np.float16).astype(np.float32)
+    return vectors
+
+
+def _quantized(profile: CollectionProfile, vectors: np.ndarray) -> np.ndarray:
+    """rescore 없이 양자화 벡터만으로 비교할 때의 근사값"""
+    if profile.quantization == "int8":
+        lo, hi = np.quantile(vectors, [0.005, 0.995])
+        scale = (hi - lo) / 255.0
+        codes = np.round((np.clip(vectors, lo, hi) - lo) / scale)
+        return (codes * scale + lo).astype(np.float32)
+    if profile.quantization == "binary":
+        return np.where(vectors > 0, 1.0, -1.0).astype(np.float32)
+    return _stored(profile, vectors)
+
+
+def level_agreement(profile: CollectionProfile, vectors: np.ndarray, centroid_set) -> dict:
+    """float32 기준 레벨과의 일치율. stored = 실제 재계산 경로, quantized = rescore 없는 근사 검색"""
+    base = centroid_set.assign(vectors)
+    return {
+        "stored": float(np.mean(centroid_set.assign(_stored(profile, vectors)) == base)),
+        "quantized": float(np.mean(centroid_set.assign(_quantized(profile, vectors)) == base)),
+    }
+
+
+def _synthetic_sample(n: int, levels: int = 10, dim: int = VECTOR_DIM, seed: int = 0):
+    from app.services.centroid_cache import CentroidSet
+
+    rng = np.random.default_rng(seed)
+    # 실제 임베딩처럼 Centroid 끼리도 유사도가 높도록 공통 성분을 크게 둠 (margin 이 작아야 차이가 드러남)
+    common = rng.standard_normal(dim)
+    centers = (common + 0.1 * rng.standard_normal((levels, dim))).astype(np.float32)
+    labels = rng.integers(0, levels, n)
+    vectors = centers[labels] + rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    centroid_set = CentroidSet.from_dict({str(i + 1): centers[i].tolist() for i in range(levels)})
+    return vectors, centroid_set
+
+
+def _qdrant_sample(client: QdrantClient, collection_name: str, n: int):
+    from app.core.connections import create_sync_redis
+    from app.services.centroid_cache import CentroidSet, CENTROIDS_KEY
+
+    vectors = []
+    next_offset = None
+    while len(vectors) < n:
+        points, next_offset = client.scroll(
+            collection_name=collection_name,
+            limit=min(1000, n - len(vectors)),
+            offset=next_offset,
+            with_vectors=True,
+            with_payload=False,
+        )
+        vectors.extend(p.vector for p in points if p.vector)
+        if next_offset is None:
+            break
+
+    data = create_sync_redis().get(CENTROIDS_KEY)
+    if not data:
+        raise RuntimeError("Redis에 Centroid 데이터가 없습니다.")
+    return np.asarray(vectors, dtype=np.float32), CentroidSet.from_payload(data)
+
+
+def benchmark(vectors: np.ndarray, centroid_set, n_points: int) -> Dict[str, dict]:
+    report = {}
+    for name, profile in PROFILES.items():
+        report[name] = {
+            **estimate_memory(profile, n_points, vectors.shape[1]),
+            **level_agreement(profile, vectors, centroid_set),
+        }
+    return report
+
+
+# ---------------------------------------------------------
+# 3. 마이그레이션 (새 컬렉션으로 복사 후 alias 전환)
+# ---------------------------------------------------------
+def _resolve_alias(client: QdrantClient, alias: str) -> Optional[str]:
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def _copy_points(client: QdrantClient, source: str, target: str, batch_size: int) -> int:
+    """source 전체를 target 으로 upsert 합니다. 복사 건수를 반환."""
+    copied = 0
+    next_offset = None
+    while True:
+        points, next_offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=next_offset,
+            with_vectors=True,
+            with_payload=True,
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                wait=True,
+            )
+            copied += len(points)
+        if next_offset is None:
+            return copied
+
+
+def _point_ids(client: QdrantClient, collection_name: str, batch_size: int) -> set:
+    """벡터/payload 없이 ID 만 스크롤"""
+    ids = set()
+    next_offset = None
+    while True:
+        points, next_offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=next_offset,
+            with_vectors=False,
+            with_payload=False,
+        )
+        ids.update(p.id for p in points)
+        if next_offset is None:
+            return ids
+
+
+# float16 대상은 원본과 비트 단위로 같지 않으므로 벡터 비교에 여유를 둠 (단위벡터 성분 기준)
+VECTOR_TOLERANCE = 1e-3
+
+
+def _same_point(source: models.Record, copied: Optional[models.Record]) -> bool:
+    """대상의 포인트가 원본과 같은지 (payload 전체 + 벡터)"""
+    if copied is None or (source.payload or {}) != (copied.payload or {}):
+        return False
+    return np.allclose(
+        np.asarray(source.vector, dtype=np.float32),
+        np.asarray(copied.vector, dtype=np.float32),
+        atol=VECTOR_TOLERANCE,
+    )
+
+
+def _catch_up(client: QdrantClient, source: str, target: str, batch_size: int) -> Tuple[int, int]:
+    """
+    복사 중 원본에서 바뀐 포인트를 따라잡습니다. (다시 복사한 건수, 삭제 건수) 반환.
+    - 원본을 벡터/payload 와 함께 스크롤하면서 같은 ID 를 대상에서 조회해 비교하고,
+      없거나 payload(level / bound / embedded_at) 또는 벡터가 다른 포인트는 다시 복사
+    - 원본에 없는 대상 포인트는 삭제
+    """
+    source_ids = set()
+    updated = 0
+    next_offset = None
+    while True:
+        points, next_offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=next_offset,
+            with_vectors=True,
+            with_payload=True,
+        )
+        if points:
+            source_ids.update(p.id for p in points)
+            copied = {
+                p.id: p
+                for p in client.retrieve(target, ids=[p.id for p in points], with_vectors=True, with_payload=True)
+            }
+            outdated = [p for p in points if not _same_point(p, copied.get(p.id))]
+            if outdated:
+                client.upsert(
+                    collection_name=target,
+                    points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in outdated],
+                    wait=True,
+                )
+                updated += len(outdated)
+        if next_offset is None:
+            break
+
+    stale = sorted(_point_ids(client, target, batch_size) - source_ids, key=str)
+    if stale:
+        client.delete(collection_name=target, points_selector=models.PointIdsList(points=stale), wait=True)
+    return updated, len(stale)
+
+
+def migrate_collection(
+    client: QdrantClient,
+    profile: CollectionProfile,
+    alias: str = "santa_images",
+    batch_size: int = 500,
+    drop_source: bool = False,
+    catch_up_passes: int = 3,
+) -> str:
+    """
+    alias(=santa_images) 가 가리키는 컬렉션을 새 프로필의 컬렉션으로 복사하고 alias 를 옮깁니다.
+    - 복사 후 원본/대상의 포인트(ID, payload, 벡터)를 비교해서 복사 중 추가/변경/삭제된 포인트를
+      최대 catch_up_passes 번 따라잡고, 마지막 비교에서도 차이가 있거나 건수가 다르면
+      alias 를 전환하지 않고 RuntimeError (대상 컬렉션은 확인용으로 남겨둠)
+    - 이미 alias 라면 delete+create 를 한 번의 요청으로 처리해 원자적으로 전환
+    - 아직 실제 컬렉션이라면 같은 이름의 alias 를 만들 수 없으므로 drop_source=True 일 때만
+      원본을 지우고 alias 를 만듭니다. 삭제 직전에 건수를 다시 확인합니다.
+    """
+    from app.db.init_db import ensure_payload_indexes
+
+    source = _resolve_alias(client, alias) or alias
+    if not client.collection_exists(source):
+        raise ValueError(f"원본 컬렉션이 없습니다: {source}")
+
+    target = f"{alias}_{profile.name}_{int(time.time())}"
+    dim = client.get_collection(source).config.params.vectors.size
+    client.create_collection(collection_name=target, **collection_config(profile, dim))
+    ensure_payload_indexes(client, target)
+    logger.info(f"컬렉션 복사 시작: {source} -> {target} (profile={profile.name})")
+
+    def counts():
+        return client.count(source, exact=True).count, client.count(target, exact=True).count
+
+    copied = _copy_points(client, source, target, batch_size)
+    logger.info(f"1차 복사 완료: {copied}건")
+
+    # 복사 중 추가/변경/삭제된 포인트 따라잡기 (건수가 같아도 재임베딩 / payload 갱신이 있을 수 있어 내용으로 비교)
+    in_sync = False
+    for attempt in range(1, catch_up_passes + 1):
+        updated, removed = _catch_up(client, source, target, batch_size)
+        logger.info(f"따라잡기 {attempt}/{catch_up_passes}: 갱신 {updated}건, 삭제 {removed}건")
+        if not updated and not removed:
+            in_sync = True
+            break
+
+    if not in_sync:
+        raise RuntimeError(
+            f"따라잡기 {catch_up_passes}회 후에도 원본과 대상이 달라 alias 를 전환하지 않았습니다. "
+            f"쓰기를 멈춘 뒤 다시 실행하세요. (대상 컬렉션 {target} 은 남겨둠)"
+        )
+
+    source_count, target_count = counts()
+    if source_count != target_count:
+        raise RuntimeError(
+            f"원본({source_count})과 대상({target_count}) 건수가 맞지 않아 alias 를 전환하지 않았습니다. "
+            f"쓰기를 멈춘 뒤 다시 실행하세요. (대상 컬렉션 {target} 은 남겨둠)"
+        )
+
+    if source != alias:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias)),
+        ])
+        logger.info(f"alias 전환 완료: {alias} -> {target} (이전: {source}, 확인 후 직접 삭제)")
+    elif drop_source:
+        # 마지막 확인 이후 들어온 쓰기가 있으면 원본을 지우지 않음
+        source_count, target_count = counts()
+        if source_count != target_count:
+            raise RuntimeError(
+                f"삭제 직전 건수가 달라졌습니다 ({source_count} != {target_count}). 원본을 유지합니다. "
+                f"(대상 컬렉션 {target} 은 남겨둠)"
+            )
+        client.delete_collection(source)
+        client.update_collection_aliases(change_aliases_operations=[
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=alias)),
+        ])
+        logger.info(f"원본 삭제 후 alias 생성: {alias} -> {target}")
+    else:
+        logger.warning(f"'{alias}' 가 실제 컬렉션이라 alias 로 전환하지 않았습니다. --drop-source 로 다시 실행하세요.")
+
+    logger.info(f"마이그레이션 완료: {target_count}건 복사")
+    return target
+
+
+# ---------------------------------------------------------
+# 4. CLI
+# ---------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="santa_images 컬렉션 프로필 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="프로필별 메모리 사용량 / 레벨 일치율")
+    bench.add_argument("--source", choices=["synthetic", "qdrant"], default="synthetic")
+    bench.add_argument("--sample", type=int, default=5000)
+    bench.add_argument("--points", type=int, default=1_000_000, help="메모리 추정 기준 포인트 수")
+
+    migrate = sub.add_parser("migrate", help="새 프로필로 컬렉션 재구성 후 alias 전환")
+    migrate.add_argument("profile", choices=list(PROFILES))
+    migrate.add_argument("--alias", default="santa_images")
+    migrate.add_argument("--batch-size", type=int, default=500)
+    migrate.add_argument("--drop-source", action="store_true")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "bench":
+        if args.source == "qdrant":
+            from app.core.connections import qdrant_client
+            vectors, centroid_set = _qdrant_sample(qdrant_client, "santa_images", args.sample)
+        else:
+            vectors, centroid_set = _synthetic_sample(args.sample)
+
+        print(f"샘플 {len(vectors)}건, 레벨 {len(centroid_set.levels)}개, 추정 기준 {args.points:,}건")
+        print(f"{'profile':<10}{'RAM(MB)':>10}{'disk(MB)':>10}{'B/point':>10}{'stored':>9}{'quant':>9}")
+        for name, row in benchmark(vectors, centroid_set, args.points).items():
+            print(
+                f"{name:<10}{row['ram_bytes'] / 1e6:>10.1f}{row['disk_bytes'] / 1e6:>10.1f}"
+                f"{row['ram_per_point']:>10.0f}{row['stored']:>9.4f}{row['quantized']:>9.4f}"
+            )
+    else:
+        from app.core.connections import qdrant_client
+        migrate_collection(
+            qdrant_client, get_profile(args.profile),
+            alias=args.alias, batch_size=args.batch_size, drop_source=args.drop_source,
+        )
+
+
+if __name__ == "__main__":
+    main()
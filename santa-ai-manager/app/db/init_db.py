@@ -1,34 +1,51 @@
 import os
 import sys
-from sqlalchemy import create_engine, text
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from urllib.parse import quote_plus
 
 # 프로젝트 설정 가져오기
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from app.core.config import settings
+from app.core.connections import qdrant_client
+from app.db.collection_profiles import get_profile, collection_config
+
+# santa_images payload 인덱스 (bound: 증분 재계산 필터 bound <= drift, type: Centroid 포인트 제외)
+PAYLOAD_INDEXES = {
+    "bound": models.PayloadSchemaType.FLOAT,
+    "type": models.PayloadSchemaType.KEYWORD,
+}
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str):
+    """이미 있으면 Qdrant 가 그대로 두므로 매번 호출해도 됩니다."""
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(collection_name, field_name=field_name, field_schema=field_schema)
+
+async def async_ensure_payload_indexes(client: AsyncQdrantClient, collection_name: str):
+    """ensure_payload_indexes 의 비동기 버전 (API 라우트용)"""
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        await client.create_payload_index(collection_name, field_name=field_name, field_schema=field_schema)
 
 def init_system():
     print("\nQdrant 'santa_images' 컬렉션 생성 중...")
     try:
-        client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        client = qdrant_client
         collection_name = "santa_images"
         
-        # 컬렉션 목록 조회
-        collections = client.get_collections().collections
-        exists = any(c.name == collection_name for c in collections)
-        
+        # 컬렉션 존재 확인 (마이그레이션 후에는 alias 이므로 목록 대신 exists 사용)
+        exists = client.collection_exists(collection_name)
+
         if exists:
             print(f"Qdrant: '{collection_name}' 컬렉션이 이미 존재합니다.")
         else:
+            profile = get_profile()
             client.create_collection(
                 collection_name=collection_name,
-                vectors_config=models.VectorParams(
-                    size=1152,  # Modal 벡터 차원 수
-                    distance=models.Distance.COSINE
-                ),
+                **collection_config(profile, 1152),  # Modal 벡터 차원 수
             )
-            print(f"Qdrant: '{collection_name}' 컬렉션 생성 완료!")
+            print(f"Qdrant: '{collection_name}' 컬렉션 생성 완료! (profile={profile.name})")
+
+        # 증분 재계산 필터(bound <= drift)용 payload 인덱스
+        ensure_payload_indexes(client, collection_name)
 
     except Exception as e:
         print(f"Qdrant 초기화 실패: {e}")
@@ -0,0 +1,38 @@
+from typing import Iterable, Iterator, List, Tuple
+from sqlalchemy import text
+
+# MySQL max_allowed_packet 을 넘지 않도록 한 문장에 담을 최대 행 수
+LEVEL_UPDATE_CHUNK_SIZE = 1000
+
+
+def level_update_statements(
+    pairs: Iterable[Tuple[int, int]],
+    chunk_size: int = LEVEL_UPDATE_CHUNK_SIZE,
+) -> Iterator[Tuple[object, dict]]:
+    """
+    (post_id, level) 목록을 UPDATE ... CASE 문장으로 묶어서 돌려줍니다.
+    행마다 UPDATE 를 보내는 대신 chunk_size 개씩 한 번의 왕복으로 처리합니다.
+    같은 post_id 가 여러 번 오면 마지막 값이 적용됩니다.
+    """
+    latest = {}
+    for post_id, level in pairs:
+        latest[int(post_id)] = int(level)
+
+    items: List[Tuple[int, int]] = list(latest.items())
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        params = {}
+        whens = []
+        ids = []
+        for i, (post_id, level) in enumerate(chunk):
+            params[f"p{i}"] = post_id
+            params[f"l{i}"] = level
+            whens.append(f"WHEN :p{i} THEN :l{i}")
+            ids.append(f":p{i}")
+
+        stmt = text(f"""
+            UPDATE posts
+            SET post_level = CASE post_id {' '.join(whens)} END
+            WHERE post_id IN ({', '.join(ids)})
+        """)
+        yield stmt, params
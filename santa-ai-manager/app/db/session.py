@@ -1,15 +1,8 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
-# 1. 엔진 생성
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20
-)
+# 1. 엔진 (풀은 app/core/connections.py 에서 관리)
+from app.core.connections import engine, async_engine
 
 # 2. 세션 공장
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
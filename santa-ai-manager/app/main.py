@@ -1,7 +1,15 @@
 from fastapi import FastAPI
 import asyncio
 from app.api.routes import router as api_router
-from app.services.worker import start_worker
+from app.services.worker import start_worker, centroid_service
+from app.services.centroid_cache import centroid_cache
+from app.services.write_behind import write_behind
+from app.services.wandb_service import wandb_service
+from app.services.embedding_mirror import embedding_mirror, run_mirror_reconciliation
+from app.core.config import settings
+from app.core.connections import close_connections
+from app.services.inference_dispatcher import inference_dispatcher
+from app.services.inference_batcher import inference_batcher
 from app.db.init_db import init_system
 from contextlib import asynccontextmanager
 
@@ -13,14 +21,52 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"시스템 초기화 실패: {e}")
 
-    # 2. 백그라운드 워커 실행
-    # (워커를 변수에 담아두면 나중에 제어하기 좋습니다, 일단 실행만 함)
-    asyncio.create_task(start_worker())
-    print("백그라운드 워커 시작됨")
+    # 2. Centroid 메모리 캐시 + 변경 구독 시작
+    centroid_cache.start()
+
+    # 3. 웹훅 Write-behind 버퍼 (opt-in)
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind.start()
+
+    # 4. 로컬 임베딩 미러 (opt-in) - 주기적으로 Qdrant 와 정합성 맞춤
+    mirror_task = None
+    if settings.MIRROR_ENABLED:
+        embedding_mirror.open()
+        mirror_task = asyncio.create_task(run_mirror_reconciliation())
+
+    # 5. WandB 로깅 스레드
+    wandb_service.start()
+
+    # 6. 백그라운드 워커 실행 (EMBEDDED_WORKER_ENABLED=False 면 python -m app.worker 가 담당)
+    # (종료 시 연결을 닫기 전에 먼저 멈춤)
+    worker_task = None
+    if settings.EMBEDDED_WORKER_ENABLED:
+        worker_task = asyncio.create_task(start_worker(settings.WORKER_ROLE))
+        print("백그라운드 워커 시작됨")
     
     yield
     
     print("서버 종료 중...")
+    # 버퍼에 남은 웹훅 결과를 모두 저장한 뒤 종료
+    await write_behind.stop()
+    await centroid_cache.stop()
+    # 워커를 멈추고(더 꺼내지 않음) 실행 중인 추론 요청을 마무리한 뒤 공용 연결 풀(Redis/MySQL/Qdrant) 정리
+    if worker_task is not None:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+    await inference_dispatcher.drain(settings.WORKER_DRAIN_TIMEOUT)
+    await inference_batcher.stop()
+    # 백그라운드 재계산이 닫힌 연결을 쓰지 않도록 먼저 중단
+    await centroid_service.cancel_recalculation()
+    await asyncio.to_thread(centroid_service.close)
+    if mirror_task is not None:
+        # 워커 / 재계산(set_scores) / 스레드에서 돌던 정합성 맞춤이 모두 끝난 뒤에 flush (연결도 그 이후에 닫힘)
+        mirror_task.cancel()
+        await asyncio.gather(mirror_task, return_exceptions=True)
+        embedding_mirror.close()
+    # 남은 WandB 항목 전송 후 종료 (피드백 / 재계산이 멈춘 뒤라 더 들어오지 않음, 이후 로그는 버림)
+    await asyncio.to_thread(wandb_service.close)
+    await close_connections()
 
 app = FastAPI(title="Project Santa AI Manager", lifespan=lifespan)
 
@@ -0,0 +1,290 @@
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.connections import redis_client
+from app.core.vector_codec import encode_array, decode_array
+# 키 이름 / DRIFT_INVALIDATE_ALL 은 배치 작업과 공유 (app/services/centroid_store.py)
+from app.services.centroid_store import (
+    CENTROIDS_KEY, VERSION_KEY, UPDATE_CHANNEL, DRIFT_KEY, DRIFT_INVALIDATE_ALL,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVEL = 5
+
+
+@dataclass(frozen=True)
+class LevelScores:
+    """CentroidSet.score_batch 결과 (N 개 벡터)"""
+    levels: np.ndarray              # (N,) 1위 레벨
+    margins: np.ndarray             # (N,) 1위 - 2위 유사도, 판정 불가면 NaN
+    top_levels: np.ndarray          # (N, k) 유사도 상위 레벨
+    top_similarities: np.ndarray    # (N, k) 위 레벨들의 코사인 유사도
+
+    def to_list(self) -> List[dict]:
+        """JSON 응답용 (판정 불가 항목은 margin=None, top=[])"""
+        rows = []
+        for i in range(len(self.levels)):
+            margin = float(self.margins[i])
+            valid = not np.isnan(margin)
+            rows.append({
+                "level": int(self.levels[i]),
+                "margin": margin if valid else None,
+                "top": [
+                    {"level": int(lvl), "similarity": float(sim)}
+                    for lvl, sim in zip(self.top_levels[i], self.top_similarities[i])
+                    if valid and np.isfinite(sim)
+                ],
+            })
+        return rows
+
+
+@dataclass(frozen=True)
+class CentroidSet:
+    """
+    프로세스 메모리에 올려두는 읽기 전용 Centroid 묶음.
+    - matrix: (L, D) float32, 행 단위 L2 정규화 (연속 메모리)
+    - levels: (L,) 각 행에 대응하는 레벨 번호
+    - version: Redis VERSION_KEY 값
+    - drift: Redis DRIFT_KEY 값 (모든 Centroid 이동 거리의 누적 합)
+    """
+    matrix: np.ndarray
+    levels: np.ndarray
+    version: int = 0
+    drift: float = 0.0
+
+    @classmethod
+    def from_dict(cls, centroids: Dict[str, List[float]], version: int = 0) -> "CentroidSet":
+        if not centroids:
+            return cls.empty(version)
+
+        keys = sorted(centroids.keys(), key=int)
+        matrix = np.array([centroids[k] for k in keys], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # 길이 0인 Centroid는 그대로 0벡터로 두고 score 단계에서 제외
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+        return cls(
+            matrix=np.ascontiguousarray(matrix),
+            levels=np.array([int(k) for k in keys], dtype=np.int64),
+            version=version,
+        )
+
+    @classmethod
+    def empty(cls, version: int = 0) -> "CentroidSet":
+        return cls(
+            matrix=np.zeros((0, 0), dtype=np.float32),
+            levels=np.zeros(0, dtype=np.int64),
+            version=version,
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.levels) == 0
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {str(int(lvl)): self.matrix[i].tolist() for i, lvl in enumerate(self.levels)}
+
+    @classmethod
+    def from_payload(cls, data: str, version: int = 0) -> "CentroidSet":
+        """
+        Redis에 저장된 문자열을 읽습니다.
+        - 바이너리 형식: {"levels": [...], "dtype": ..., "shape": [L, D], "data": base64}
+        - JSON 형식(fallback): {"1": [...], "2": [...], ...}
+        """
+        obj = json.loads(data)
+        if isinstance(obj, dict) and "data" in obj and "levels" in obj:
+            matrix = decode_array(obj["dtype"], obj["shape"], obj["data"])
+            return cls(
+                matrix=np.ascontiguousarray(matrix, dtype=np.float32),
+                levels=np.array(obj["levels"], dtype=np.int64),
+                version=version,
+            )
+        return cls.from_dict(obj, version)
+
+    def to_payload(self, storage_format: str = "json") -> str:
+        """storage_format: json / float32 / float16"""
+        if storage_format == "json":
+            return json.dumps(self.to_dict())
+        body = encode_array(self.matrix, storage_format)
+        body["levels"] = [int(lvl) for lvl in self.levels]
+        return json.dumps(body)
+
+    def similarities(self, vectors: np.ndarray) -> np.ndarray:
+        """(N, D) 벡터 묶음과 모든 Centroid 간의 코사인 유사도 (N, L)"""
+        vecs = np.asarray(vectors, dtype=np.float32)
+        if vecs.ndim == 1:
+            vecs = vecs[np.newaxis, :]
+
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        safe_norms = np.where(norms > 0, norms, 1.0)
+        sims = (vecs / safe_norms) @ self.matrix.T
+
+        # 길이 0인 Centroid는 선택되지 않도록 제외
+        dead = ~np.any(self.matrix, axis=1)
+        if dead.any():
+            sims[:, dead] = -np.inf
+        return sims
+
+    def score_batch(self, vectors: Sequence, top_k: int = 1) -> "LevelScores":
+        """
+        (N, D) 벡터 묶음을 한 번의 matmul 로 채점합니다.
+        - levels / margins: 1위 레벨과 margin(1위 - 2위 유사도)
+        - top_levels / top_similarities: 유사도 상위 top_k 개 (N, k), 내림차순
+        레벨을 정할 수 없는 벡터(0벡터, Centroid 없음)는 DEFAULT_LEVEL, margin/유사도는 NaN 입니다.
+        """
+        vecs = np.asarray(vectors, dtype=np.float32)
+        if vecs.ndim == 1:
+            vecs = vecs[np.newaxis, :]
+
+        n, n_levels = len(vecs), len(self.levels)
+        k = max(0, min(top_k, n_levels))
+        levels = np.full(n, DEFAULT_LEVEL, dtype=np.int64)
+        margins = np.full(n, np.nan, dtype=np.float32)
+        if self.is_empty or n == 0:
+            return LevelScores(levels, margins, np.zeros((n, 0), dtype=np.int64), np.zeros((n, 0), dtype=np.float32))
+
+        sims = self.similarities(vecs)
+
+        # margin 계산에 2위까지 필요. 전체 정렬 대신 상위 m 개만 골라서 정렬
+        m = min(max(k, 2), n_levels)
+        if m < n_levels:
+            cand = np.argpartition(-sims, m - 1, axis=1)[:, :m]
+        else:
+            cand = np.broadcast_to(np.arange(n_levels), (n, n_levels))
+        cand_sims = np.take_along_axis(sims, cand, axis=1)
+        # 유사도 내림차순, 동점이면 앞쪽 Centroid 우선 (argmax 와 동일)
+        order = np.lexsort((cand, -cand_sims))
+        ranked = np.take_along_axis(cand, order, axis=1)
+        ranked_sims = np.take_along_axis(cand_sims, order, axis=1)
+
+        best_sim = ranked_sims[:, 0]
+        valid = np.any(vecs, axis=1) & np.isfinite(best_sim)
+        levels[valid] = self.levels[ranked[valid, 0]]
+
+        if m > 1:
+            second_sim = ranked_sims[:, 1]
+            # 비교 대상이 없으면 유사도 차이의 최대값(2)으로 간주
+            margin = np.where(np.isfinite(second_sim), best_sim - second_sim, 2.0)
+        else:
+            margin = np.full(n, 2.0, dtype=np.float32)
+        margins[valid] = margin[valid]
+
+        top_similarities = ranked_sims[:, :k].astype(np.float32)
+        top_similarities[~valid] = np.nan
+        return LevelScores(levels, margins, self.levels[ranked[:, :k]], top_similarities)
+
+    def score(self, vectors: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+        """(levels, margins) 만 필요한 경우 (웹훅 / 재계산)"""
+        scores = self.score_batch(vectors)
+        return scores.levels, scores.margins
+
+    def assign(self, vectors: Sequence) -> np.ndarray:
+        """(N, D) 벡터 묶음의 레벨을 한 번의 matmul로 계산합니다."""
+        return self.score(vectors)[0]
+
+    def bounds(self, margins: np.ndarray) -> List[Optional[float]]:
+        """
+        Qdrant payload 에 저장할 재계산 bound (= margin + 채점 시점 drift).
+        단위벡터 x 와 Centroid c 에 대해 |x·c' - x·c| <= ||c' - c|| 이므로,
+        이후 Centroid 들이 움직인 총량(drift 증가분)이 margin 보다 작으면
+        1위 레벨이 바뀔 수 없습니다. 즉 bound > 현재 drift 인 포스트는 재계산 불필요.
+        """
+        return [None if np.isnan(m) else float(m) + self.drift for m in margins]
+
+
+class CentroidCache:
+    """
+    Redis의 system:centroids 를 프로세스 메모리에 캐싱합니다.
+    save_centroids 가 VERSION_KEY 를 올리고 UPDATE_CHANNEL 로 알리면
+    구독 태스크가 새 version 을 받아 다시 읽어옵니다. (핫패스에서는 Redis 호출 없음)
+    """
+
+    def __init__(self):
+        self._current: Optional[CentroidSet] = None
+        self._lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    def peek(self) -> Optional[CentroidSet]:
+        return self._current
+
+    def set_local(self, centroid_set: CentroidSet):
+        """이 프로세스에서 직접 저장한 경우 구독 메시지를 기다리지 않고 바로 교체"""
+        current = self._current
+        if current is None or centroid_set.version >= current.version:
+            self._current = centroid_set
+
+    async def get(self) -> CentroidSet:
+        current = self._current
+        if current is not None:
+            return current
+        return await self.refresh()
+
+    async def refresh(self, min_version: int = 0) -> CentroidSet:
+        async with self._lock:
+            current = self._current
+            if current is not None and min_version and current.version >= min_version:
+                return current
+
+            data, version, drift = await redis_client.mget(CENTROIDS_KEY, VERSION_KEY, DRIFT_KEY)
+            version = int(version or 0)
+            if not data:
+                logger.warning("Redis에 Centroid 데이터가 없습니다! 기본 레벨을 사용합니다.")
+                centroid_set = CentroidSet.empty(version)
+            else:
+                centroid_set = CentroidSet.from_payload(data, version)
+            centroid_set = replace(centroid_set, drift=float(drift or 0.0))
+
+            self._current = centroid_set
+            logger.info(f"Centroid 캐시 갱신 (version={version}, levels={len(centroid_set.levels)})")
+            return centroid_set
+
+    def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        logger.info(f"Centroid 변경 구독 시작: {UPDATE_CHANNEL}")
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(UPDATE_CHANNEL)
+                # (재)구독 직후에는 놓친 변경이 있을 수 있으므로 한 번 다시 읽음
+                await self.refresh()
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        version = int(message.get("data") or 0)
+                    except ValueError:
+                        version = 0
+                    await self.refresh(min_version=version)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Centroid 구독 에러, 재연결합니다: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+centroid_cache = CentroidCache()
@@ -2,46 +2,118 @@ import json
 import numpy as np
 import logging
 import asyncio
-from typing import List, Dict, Optional
-from sqlalchemy.orm import Session
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
+import time
+import random
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import replace
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+from redis.exceptions import WatchError
+from sqlalchemy import text, bindparam
 from qdrant_client.http import models
 
 from app.core.config import settings
-from app.core.connections import redis_client
-from app.db.session import SessionLocal
-from app.models.post import Post
+from app.core.connections import redis_client, qdrant_client
+from app.db.session import engine
+from app.db.queries import level_update_statements
 
 from app.services.wandb_service import wandb_service
+from app.services.embedding_mirror import embedding_mirror, TOMBSTONE_LEVEL
+from app.services.centroid_cache import (
+    centroid_cache, CentroidSet, CENTROIDS_KEY, VERSION_KEY, UPDATE_CHANNEL,
+    DRIFT_KEY, DRIFT_INVALIDATE_ALL,
+)
 
 logger = logging.getLogger(__name__)
 
 class CentroidService:
-    REDIS_KEY = "system:centroids"
+    REDIS_KEY = CENTROIDS_KEY
     
     # 하이퍼파라미터 (기존 설정 유지)
     LEARNING_RATE = 0.01   
     REPULSION_RATE = 0.02  
     SIMILARITY_THRESHOLD = 0.90
 
-    def __init__(self):
-        # Qdrant 클라이언트는 동기 방식으로 사용 (데이터 처리를 위해)
-        self.qdrant = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
-
-    async def get_centroids(self) -> Dict[str, List[float]]:
-        """Redis에서 Centroid 정보를 가져옵니다."""
-        data = await redis_client.get(self.REDIS_KEY)
-        if not data:
-            logger.warning("Redis에 Centroid 데이터가 없습니다.")
-            return {}
-        return json.loads(data)
+    # 증분 재계산 시 float32 오차 여유분
+    BOUND_EPSILON = 1e-4
 
-    async def save_centroids(self, centroids: Dict[str, List[float]]):
-        """Redis와 Qdrant에 변경된 Centroid 정보를 저장합니다."""
-        
-        # 1. Redis 저장
-        await redis_client.set(self.REDIS_KEY, json.dumps(centroids))
+    # Centroid 저장 충돌(WATCH 실패) 시 최대 재시도 횟수
+    CAS_MAX_RETRIES = 20
+
+    def __init__(self):
+        # Qdrant 클라이언트는 동기 방식으로 사용 (데이터 처리를 위해, 프로세스 공용 연결)
+        self.qdrant = qdrant_client
+
+        # 진행 중인 재계산 (새 피드백이 오면 취소 후 재시작)
+        self._recalc_task: Optional[asyncio.Task] = None
+        self._recalc_cancel = threading.Event()
+        # 취소 -> 대기 -> 새 태스크 생성을 한 번에 한 호출만 (FEEDBACK_CONSUMERS > 1 이면 동시에 들어옴)
+        self._recalc_lock = asyncio.Lock()
+
+        # 병렬 재계산용 프로세스 풀 (RECALC_WORKERS > 1 일 때 생성)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_pool_size = 0
+        self._manager = None
+
+    async def get_centroids(self) -> CentroidSet:
+        """Redis에서 최신 Centroid 정보를 가져옵니다. (메모리 캐시도 함께 갱신)"""
+        return await centroid_cache.refresh()
+
+    async def update_centroids(
+        self, mutate: Callable[[CentroidSet], Awaitable[Optional[CentroidSet]]]
+    ) -> Optional[CentroidSet]:
+        """
+        Redis의 Centroid를 낙관적 동시성 제어(WATCH/MULTI)로 갱신합니다.
+        - system:centroids / version 키를 WATCH 한 상태에서 읽고 mutate 로 새 값을 계산
+        - 그 사이 다른 워커/레플리카가 저장했다면 WatchError -> 최신 값으로 다시 계산 (재시도)
+        - mutate 가 None 을 반환하면 저장하지 않습니다.
+        성공 시 저장된 CentroidSet(새 version/drift 포함)을 반환합니다.
+        """
+        for attempt in range(1, self.CAS_MAX_RETRIES + 1):
+            async with redis_client.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(self.REDIS_KEY, VERSION_KEY)
+                    data, version, drift = await pipe.mget(self.REDIS_KEY, VERSION_KEY, DRIFT_KEY)
+                    current = CentroidSet.empty(int(version or 0))
+                    if data:
+                        current = CentroidSet.from_payload(data, int(version or 0))
+                    current = replace(current, drift=float(drift or 0.0))
+
+                    updated = await mutate(current)
+                    if updated is None:
+                        await pipe.unwatch()
+                        return None
+
+                    # Redis 저장 + version 증가 + drift 누적 (원자적으로)
+                    pipe.multi()
+                    pipe.set(self.REDIS_KEY, updated.to_payload(settings.CENTROID_STORAGE_FORMAT))
+                    pipe.incr(VERSION_KEY)
+                    pipe.incrbyfloat(DRIFT_KEY, self._drift_between(current, updated))
+                    _, new_version, new_drift = await pipe.execute()
+
+                except WatchError:
+                    logger.info(f"Centroid 동시 수정 감지, 최신 값으로 재시도합니다. ({attempt}/{self.CAS_MAX_RETRIES})")
+                    await asyncio.sleep(random.uniform(0, 0.05 * attempt))
+                    continue
+
+            saved = replace(updated, version=int(new_version), drift=float(new_drift))
+            await self._publish_centroids(saved)
+            return saved
+
+        raise RuntimeError(f"Centroid 저장 충돌이 {self.CAS_MAX_RETRIES}회 연속 발생했습니다.")
+
+    async def save_centroids(self, centroid_set: CentroidSet) -> CentroidSet:
+        """Redis와 Qdrant에 Centroid 정보를 저장합니다. (현재 값과 무관하게 덮어쓰기)"""
+        async def overwrite(_current: CentroidSet) -> CentroidSet:
+            return centroid_set
+        return await self.update_centroids(overwrite)
+
+    async def _publish_centroids(self, saved: CentroidSet):
+        """저장 이후 처리: 변경 알림(다른 프로세스의 캐시 무효화), 로컬 캐시 교체, 시각화용 저장"""
+        await redis_client.publish(UPDATE_CHANNEL, saved.version)
+        centroid_cache.set_local(saved)
+        centroids = saved.to_dict()
         
         # 2. Qdrant 저장 (시각화용)
         try:
@@ -66,10 +138,10 @@ class CentroidService:
                     int(level)              # level
                 ))
             
-            # Qdrant 실행
-            self.qdrant.upsert(collection_name="santa_centroids", points=qdrant_points)
+            # Qdrant 실행 (동기 클라이언트이므로 이벤트 루프 밖에서)
+            await asyncio.to_thread(self.qdrant.upsert, collection_name="santa_centroids", points=qdrant_points)
             
-            # [수정됨] WandB 일괄 전송!
+            # [수정됨] WandB 일괄 전송! (백그라운드 큐에 넣기만 함)
             wandb_service.log_batch(wandb_items)
             
             logger.info("Redis, Qdrant, WandB 업데이트 완료")
@@ -77,204 +149,511 @@ class CentroidService:
         except Exception as e:
             logger.error(f"저장 중 에러 발생: {e}")
 
-    def _normalize(self, vector: List[float]) -> np.ndarray:
+    def _normalize(self, vector) -> np.ndarray:
         """벡터 정규화 (L2 Norm)"""
-        np_vec = np.array(vector)
+        np_vec = np.asarray(vector, dtype=np.float64)
         norm = np.linalg.norm(np_vec)
         if norm == 0:
             return np_vec
         return np_vec / norm
 
-    def determine_level(self, vector: List[float], centroids: Dict[str, List[float]]) -> int:
+    def _drift_between(self, previous: Optional[CentroidSet], current: CentroidSet) -> float:
+        """모든 Centroid 이동 거리(L2)의 합. 비교할 수 없으면 전체 무효화 값."""
+        if (
+            previous is None
+            or previous.matrix.shape != current.matrix.shape
+            or not np.array_equal(previous.levels, current.levels)
+        ):
+            return DRIFT_INVALIDATE_ALL
+        diff = current.matrix.astype(np.float64) - previous.matrix.astype(np.float64)
+        return float(np.linalg.norm(diff, axis=1).sum())
+
+    def determine_level(self, vector: List[float], centroid_set: CentroidSet) -> int:
         """
         벡터와 Centroid 간의 코사인 유사도를 계산하여 가장 가까운 레벨을 반환합니다.
+        (웹훅 / 재계산 / score-levels API 와 같은 CentroidSet.score_batch 사용)
         """
-        vec_np = self._normalize(vector)
-        
-        max_sim = -2.0 
-        best_level = 5 # 기본값
-
-        for level_str, cent_vec in centroids.items():
-            cent_np = np.array(cent_vec)
-            # 코사인 유사도: dot product (이미 정규화되어 있다고 가정)
-            similarity = np.dot(vec_np, cent_np)
-            
-            if similarity > max_sim:
-                max_sim = similarity
-                best_level = int(level_str)
-        
-        return best_level
+        return int(centroid_set.score_batch(vector).levels[0])
 
     async def process_feedback_job(self, feedback_data: dict):
-        post_id = feedback_data.get("job_id")
-        correct_level = feedback_data.get("level")
+        await self.process_feedback_batch([feedback_data])
 
-        if not post_id or not correct_level:
-            logger.error("잘못된 피드백 데이터입니다.")
-            return
-
-        # 1. 해당 Post의 벡터 가져오기 (Qdrant)
-        vector = self._fetch_vector_from_qdrant(post_id)
-        if vector is None:
-            logger.error(f"Post {post_id}의 벡터를 찾을 수 없어 피드백을 건너뜁니다.")
-            return
+    async def process_feedback_batch(self, feedbacks: List[dict]):
+        """
+        큐에 쌓여 있던 피드백 묶음을 한 번에 반영합니다.
+        - 벡터는 한 번의 retrieve 로 조회
+        - Centroid 조정은 메모리에서 순서대로 적용하고 저장은 한 번만
+        - 재계산은 하나만 돌리며, 진행 중인 재계산은 취소하고 최신 Centroid로 다시 시작
+        """
+        valid = []
+        for feedback_data in feedbacks:
+            post_id = feedback_data.get("job_id")
+            correct_level = feedback_data.get("level")
+            if not post_id or not correct_level:
+                logger.error(f"잘못된 피드백 데이터입니다: {feedback_data}")
+                continue
+            valid.append((int(post_id), int(correct_level)))
 
-        # 2. 현재 Centroid 가져오기
-        centroids = await self.get_centroids()
-        if not centroids:
-            logger.error("초기 Centroids가 없습니다.")
+        if not valid:
             return
 
-        # 3. Centroid 조정 (학습 로직 적용)
-        # 현재 레벨 계산 (비교용)
-        current_calculated_level = self.determine_level(vector, centroids)
-        
-        updated_centroids = await self._adjust_centroids_logic(
-            centroids, vector, correct_level, current_calculated_level
-        )
+        # 1. 해당 Post들의 벡터 가져오기 (Qdrant)
+        vectors = await asyncio.to_thread(self._fetch_vectors_from_qdrant, [pid for pid, _ in valid])
+
+        # 2~4. 현재 Centroid 위에 조정을 적용하고 저장 (충돌 시 최신 값으로 다시 적용)
+        applied = 0
+
+        async def apply_feedbacks(centroid_set: CentroidSet) -> Optional[CentroidSet]:
+            nonlocal applied
+            if centroid_set.is_empty:
+                logger.error("초기 Centroids가 없습니다.")
+                return None
+
+            # Centroid 조정 (학습 로직을 피드백 순서대로 메모리에서 적용)
+            updated_centroids = centroid_set
+            applied = 0
+            for post_id, correct_level in valid:
+                vector = vectors.get(post_id)
+                if vector is None:
+                    logger.error(f"Post {post_id}의 벡터를 찾을 수 없어 피드백을 건너뜁니다.")
+                    continue
+
+                # 현재 레벨 계산 (비교용)
+                current_calculated_level = self.determine_level(vector, updated_centroids)
+                updated_centroids = await self._adjust_centroids_logic(
+                    updated_centroids, vector, correct_level, current_calculated_level
+                )
+                applied += 1
 
-        # 4. Redis에 업데이트
-        await self.save_centroids(updated_centroids)
+            return updated_centroids if applied else None
 
-        # 5. RDS의 모든 Post Level 재계산 및 업데이트 (Heavy Task)
-        # 동기 작업이므로 비동기 루프를 차단하지 않도록 run_in_executor 사용 권장
+        updated_centroids = await self.update_centroids(apply_feedbacks)
+        if updated_centroids is None:
+            return
+        logger.info(f"피드백 {applied}건 반영 완료 (version={updated_centroids.version})")
+
+        # 5. RDS의 Post Level 재계산 (Heavy Task) - 백그라운드로 실행, 이전 재계산은 대체
+        await self.schedule_recalculation(updated_centroids)
+
+    async def schedule_recalculation(self, centroid_set: CentroidSet):
+        """진행 중인 재계산이 있으면 취소(현재 페이지까지 처리 후 중단)하고 새 Centroid로 다시 시작"""
+        async with self._recalc_lock:
+            if self._recalc_task is not None and not self._recalc_task.done():
+                logger.info("진행 중인 재계산을 취소하고 최신 Centroid로 다시 시작합니다.")
+                self._recalc_cancel.set()
+                await asyncio.wait([self._recalc_task])
+
+            self._recalc_cancel = threading.Event()
+            self._recalc_task = asyncio.create_task(self._run_recalculation(centroid_set, self._recalc_cancel))
+
+    async def cancel_recalculation(self):
+        """진행 중인 재계산을 멈추고 끝날 때까지 대기 (종료 시 연결을 닫기 전에 호출)"""
+        async with self._recalc_lock:
+            if self._recalc_task is not None and not self._recalc_task.done():
+                logger.info("진행 중인 재계산을 중단합니다.")
+                self._recalc_cancel.set()
+                await asyncio.wait([self._recalc_task])
+
+    async def _run_recalculation(self, centroid_set: CentroidSet, cancel: threading.Event):
+        # 동기 작업이므로 비동기 루프를 차단하지 않도록 run_in_executor 사용
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, self._recalculate_all_posts_levels, updated_centroids)
+        try:
+            await loop.run_in_executor(None, self._recalculate_all_posts_levels, centroid_set, cancel)
+        except Exception as e:
+            logger.error(f"재계산 태스크 에러: {e}")
 
     # ---------------------------------------------------------
     # [내부 로직] - 학습 및 데이터 처리
     # ---------------------------------------------------------
-    async def _adjust_centroids_logic(self, centroids, vector, correct_level, old_level):
+    async def _adjust_centroids_logic(self, centroid_set: CentroidSet, vector, correct_level, old_level) -> CentroidSet:
         vec_input = self._normalize(vector)
-        target_key = str(correct_level)
-        old_key = str(old_level)
+        # 캐시된 행렬은 읽기 전용으로 공유되므로 복사본(float64)에서 계산
+        matrix = centroid_set.matrix.astype(np.float64)
+        row_of = {int(lvl): i for i, lvl in enumerate(centroid_set.levels)}
+        target_idx = row_of.get(int(correct_level))
+        old_idx = row_of.get(int(old_level))
 
         # 1. 정답 레벨 당기기 (Attraction)
-        if target_key in centroids:
-            target_vec = np.array(centroids[target_key])
+        if target_idx is not None:
+            target_vec = matrix[target_idx]
             # 공식: New = Old + LR * (Input - Old)
             target_vec = target_vec + self.LEARNING_RATE * (vec_input - target_vec)
-            centroids[target_key] = self._normalize(target_vec).tolist()
+            matrix[target_idx] = self._normalize(target_vec)
 
         # 2. 기존(오답) 레벨 밀어내기 (Unlearning)
         # 사용자가 지정한 레벨과 기계가 예측한 레벨이 다를 경우에만 수행
-        if old_key in centroids and old_level != correct_level:
-            origin_vec = np.array(centroids[old_key])
+        if old_idx is not None and old_level != correct_level:
+            origin_vec = matrix[old_idx]
             # 공식: New = Old - LR * (Input - Old)
             origin_vec = origin_vec - self.LEARNING_RATE * (vec_input - origin_vec)
-            centroids[old_key] = self._normalize(origin_vec).tolist()
+            matrix[old_idx] = self._normalize(origin_vec)
 
         # 3. 군집 간 반발력 적용 (Cluster Repulsion)
         # 정답 레벨이 이동함에 따라 너무 가까워진 다른 레벨들을 밀어냄
-        centroids = self._apply_repulsion(centroids, target_key)
-        
-        return centroids
+        matrix = self._apply_repulsion(matrix, target_idx)
 
-    def _apply_repulsion(self, centroids, target_key):
-        if target_key not in centroids:
-            return centroids
+        return CentroidSet(
+            matrix=np.ascontiguousarray(matrix, dtype=np.float32),
+            levels=centroid_set.levels,
+            version=centroid_set.version,
+            drift=centroid_set.drift,
+        )
+
+    def _apply_repulsion(self, matrix: np.ndarray, target_idx: Optional[int]) -> np.ndarray:
+        if target_idx is None:
+            return matrix
 
-        target_vec = np.array(centroids[target_key])
+        target_vec = matrix[target_idx]
+        # 모든 이웃과의 유사도를 한 번에 계산
+        similarities = matrix @ target_vec
 
-        for lvl, vec in centroids.items():
-            if lvl == target_key:
+        for idx in np.nonzero(similarities > self.SIMILARITY_THRESHOLD)[0]:
+            if idx == target_idx:
                 continue
-            
-            neighbor_vec = np.array(vec)
-            similarity = np.dot(target_vec, neighbor_vec)
 
-            # 유사도가 임계값보다 높으면 서로 밀어냄
-            if similarity > self.SIMILARITY_THRESHOLD:
-                # 밀어낼 방향 벡터
-                push_dir = neighbor_vec - target_vec
-                
-                # 완전히 겹칠 경우 랜덤 방향으로
-                if np.linalg.norm(push_dir) == 0:
-                    push_dir = np.random.rand(len(target_vec)) - 0.5
+            # 밀어낼 방향 벡터
+            push_dir = matrix[idx] - target_vec
+
+            # 완전히 겹칠 경우 랜덤 방향으로
+            if np.linalg.norm(push_dir) == 0:
+                push_dir = np.random.rand(len(target_vec)) - 0.5
 
-                # Repulsion 적용
-                neighbor_vec = neighbor_vec + (self.REPULSION_RATE * push_dir)
-                centroids[lvl] = self._normalize(neighbor_vec).tolist()
+            # Repulsion 적용
+            matrix[idx] = self._normalize(matrix[idx] + (self.REPULSION_RATE * push_dir))
                 
-        return centroids
+        return matrix
 
-    def _fetch_vector_from_qdrant(self, post_id: int) -> Optional[List[float]]:
+    def _fetch_vectors_from_qdrant(self, post_ids: List[int]) -> Dict[int, List[float]]:
         try:
             points = self.qdrant.retrieve(
                 collection_name="santa_images",
-                ids=[post_id],
+                ids=post_ids,
                 with_vectors=True
             )
-            if points:
-                return points[0].vector
-            return None
+            return {int(point.id): point.vector for point in points}
         except Exception as e:
-            logger.error(f"Qdrant 벡터 조회 실패 (ID: {post_id}): {e}")
-            return None
+            logger.error(f"Qdrant 벡터 조회 실패 (IDs: {post_ids}): {e}")
+            return {}
+
+    def _recalculation_filter(self, centroid_set: CentroidSet, incremental: bool) -> models.Filter:
+        """
+        재계산 대상 필터.
+        - 시각화용 Centroid 포인트(type=centroid)는 항상 제외
+        - 증분 모드: bound <= 현재 drift 인 포스트(레벨이 바뀔 수 있는 포스트)와
+          bound 가 아직 없는 포스트만 대상
+        """
+        must_not = [models.FieldCondition(key="type", match=models.MatchValue(value="centroid"))]
+        if not incremental:
+            return models.Filter(must_not=must_not)
+
+        return models.Filter(
+            must_not=must_not,
+            should=[
+                models.FieldCondition(
+                    key="bound",
+                    range=models.Range(lte=centroid_set.drift + self.BOUND_EPSILON)
+                ),
+                models.IsEmptyCondition(is_empty=models.PayloadField(key="bound")),
+            ],
+        )
 
-    def _recalculate_all_posts_levels(self, centroids: dict):
+    def _recalculate_all_posts_levels(self, centroid_set: CentroidSet, cancel: Optional[threading.Event] = None):
         """
         [Heavy Task - Optimized] 
-        Scroll API를 사용하여 배치 단위로 처리 (성능 최적화)
+        Scroll API로 페이지 단위로 가져와서
+        - 페이지 전체를 (batch x D) @ (D x L) 한 번으로 채점
+        - 기존 레벨은 IN (...) 한 번으로 조회 (또는 payload 레벨을 신뢰)
+        - 바뀐 행만 CASE 일괄 UPDATE 로 반영
+        RECALC_MODE=incremental 이면 레벨이 바뀔 수 있는 포스트만 가져옵니다.
+        RECALC_WORKERS > 1 이면 post_id 구간을 나눠 여러 프로세스에서 병렬로 처리합니다.
+        MIRROR_ENABLED 면 미러 위에서 처리합니다. (미러가 MIRROR_RECALC_MAX_STALENESS 보다 오래됐으면 먼저 맞춤)
         """
-        logger.info("전체 RDS Post Level 재계산 시작 (Batch Processing)...")
-        db: Session = SessionLocal()
+        workers = settings.RECALC_WORKERS
+        logger.info(f"RDS Post Level 재계산 시작 (Batch Processing, mode={settings.RECALC_MODE}, workers={workers})...")
+        started = time.perf_counter()
+
+        try:
+            if settings.MIRROR_ENABLED:
+                # 로컬 memmap 미러 위에서 재계산 (벡터 스크롤 / DB 조회 없음)
+                # 웹훅은 다른 프로세스(API)의 미러에만 추가되므로, 마지막 정합성 맞춤이 오래됐을 때만 먼저 맞춤
+                # (평소에는 run_mirror_reconciliation 이 주기적으로 맞춤)
+                embedding_mirror.reconcile_if_stale(self.qdrant, settings.MIRROR_RECALC_MAX_STALENESS)
+                processed_count, total_updates = self._recalculate_from_mirror(centroid_set, cancel)
+            elif workers > 1:
+                processed_count, total_updates = self._recalculate_parallel(centroid_set, cancel, workers)
+            else:
+                processed_count, total_updates = self._recalculate_range(centroid_set, cancel)
+
+            elapsed = time.perf_counter() - started
+            state = "취소" if cancel is not None and cancel.is_set() else "완료"
+            logger.info(
+                f"재계산 {state}. {processed_count}개 검사, 총 {total_updates}개의 게시물 레벨이 변경되었습니다. "
+                f"({elapsed:.1f}s, {processed_count / max(elapsed, 1e-9):.0f} posts/sec, version={centroid_set.version})"
+            )
+
+        except Exception as e:
+            logger.error(f"RDS 업데이트 중 오류: {e}")
+
+    def _recalculate_range(
+        self,
+        centroid_set: CentroidSet,
+        cancel=None,
+        start_id: Optional[int] = None,
+        end_id: Optional[int] = None,
+    ) -> Tuple[int, int]:
+        """
+        [start_id, end_id) 구간의 포인트를 재계산합니다. (None 이면 끝까지)
+        Qdrant scroll 은 ID 순서로 진행되므로 offset=start_id 에서 시작해 end_id 에서 멈춥니다.
+        반환: (검사 건수, 변경 건수)
+        """
+        incremental = settings.RECALC_MODE == "incremental"
+        scroll_filter = self._recalculation_filter(centroid_set, incremental)
         total_updates = 0
         processed_count = 0
+        started = time.perf_counter()
         
         # Scroll 커서 초기화
-        next_offset = None
-        batch_size = 100  # 한 번에 가져올 데이터 양
+        next_offset = start_id
+        batch_size = settings.RECALC_PAGE_SIZE  # 한 번에 가져올 데이터 양
 
-        try:
+        with engine.connect() as conn:
             while True:
+                # 0. 더 최신 Centroid 로 대체된 경우 중단 (이미 반영한 페이지는 유지)
+                if cancel is not None and cancel.is_set():
+                    break
+
                 # 1. Qdrant에서 배치 단위로 벡터 가져오기
                 points, next_offset = self.qdrant.scroll(
                     collection_name="santa_images",
+                    scroll_filter=scroll_filter,
                     limit=batch_size,
                     offset=next_offset,
                     with_vectors=True, # 벡터 필수
-                    with_payload=False # Payload는 불필요
+                    with_payload=["level"] if settings.RECALC_TRUST_PAYLOAD_LEVEL else False
                 )
 
+                # 담당 구간을 넘어선 포인트는 다음 샤드 몫
+                if end_id is not None:
+                    in_range = [p for p in points if not isinstance(p.id, int) or p.id < end_id]
+                    if len(in_range) < len(points):
+                        points, next_offset = in_range, None
+
                 if not points:
                     break
 
-                # 2. 가져온 배치 데이터에 대해 레벨 계산 및 DB 업데이트
-                for point in points:
-                    try:
-                        post_id = int(point.id) # Qdrant ID = Post ID
-                        new_level = self.determine_level(point.vector, centroids)
-
-                        # RDS 업데이트
-                        # (주의: 여기서도 매번 SELECT/UPDATE 하면 느릴 수 있으나, 
-                        #  SQLAlchemy 캐싱 덕분에 1건씩 처리보다 훨씬 빠릅니다.
-                        #  더 최적화하려면 bulk_update_mappings를 써야 합니다.)
-                        post = db.query(Post).filter(Post.post_id == post_id).first()
-                        
-                        if post and post.level != new_level:
-                            post.level = new_level
-                            total_updates += 1
-                            
-                    except ValueError:
-                        continue # ID가 숫자가 아닌 경우 등 예외 처리
-
-                # 3. 배치 단위 커밋 (트랜잭션 부하 조절)
-                db.commit()
+                # 2. 페이지 단위 채점 + 변경분 반영 (배치 단위 커밋)
+                total_updates += self._recalculate_page(conn, points, centroid_set)
+                conn.commit()
                 processed_count += len(points)
-                
+
                 # 로그 (진행 상황)
-                if processed_count % 1000 == 0:
-                    logger.info(f"재계산 진행 중: {processed_count}개 처리 완료...")
+                if processed_count % 1000 < len(points):
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"재계산 진행 중: {processed_count}개 처리 완료... ({processed_count / elapsed:.0f} posts/sec)")
 
                 # 다음 페이지가 없으면 루프 종료
                 if next_offset is None:
                     break
 
-            logger.info(f"재계산 완료. 총 {total_updates}개의 게시물 레벨이 변경되었습니다.")
+        return processed_count, total_updates
 
-        except Exception as e:
-            db.rollback()
-            logger.error(f"RDS 업데이트 중 오류: {e}")
-        finally:
-            db.close()
\ No newline at end of file
+    def _recalculate_from_mirror(self, centroid_set: CentroidSet, cancel=None) -> Tuple[int, int]:
+        """
+        미러의 벡터 행렬을 청크 단위로 채점하고, 미러의 레벨 배열과 비교해서
+        바뀐 포스트만 RDS 에 반영합니다.
+        미러에 bound 도 들고 있으므로 _recalculation_filter 와 같은 조건(bound <= drift 또는 없음)을
+        로컬에서 적용합니다. (incremental 이면 해당 행만 채점)
+        Qdrant payload (level + bound) 는 레벨이 바뀌었거나 bound 가 만료된 행만 갱신합니다.
+        """
+        incremental = settings.RECALC_MODE == "incremental"
+        limit = centroid_set.drift + self.BOUND_EPSILON
+        total_updates = 0
+        processed_count = 0
+
+        with engine.connect() as conn:
+            for _, vectors, post_ids, levels, bounds in embedding_mirror.iter_chunks():
+                if cancel is not None and cancel.is_set():
+                    break
+
+                alive = levels != TOMBSTONE_LEVEL
+                # NaN(bound 없음) 도 만료로 취급
+                expired = alive & ~(bounds > limit)
+                targets = expired if incremental else alive
+                if not targets.any():
+                    continue
+                new_levels, margins = centroid_set.score(vectors[targets])
+                new_bounds = centroid_set.bounds(margins)
+                ids = post_ids[targets].tolist()
+                new_levels = new_levels.tolist()
+                diff = np.asarray(new_levels) != levels[targets]
+                write = diff | expired[targets]
+                processed_count += len(ids)
+
+                changed = [(pid, lvl) for pid, lvl, d in zip(ids, new_levels, diff) if d]
+                if changed:
+                    for stmt, params in level_update_statements(changed):
+                        conn.execute(stmt, params)
+                    conn.commit()
+
+                # Qdrant Payload 는 _recalculate_page 와 같은 (레벨 + 새 bound) 형태로, 필요한 행만 갱신
+                # → 미러를 끈 뒤에도 증분 필터(bound <= drift)가 올바르게 동작
+                written = [
+                    (pid, lvl, bound)
+                    for pid, lvl, bound, w in zip(ids, new_levels, new_bounds, write) if w
+                ]
+                if not written:
+                    continue
+                ops = payload_operations(*zip(*written))
+                for start in range(0, len(ops), settings.RECALC_PAGE_SIZE):
+                    self.qdrant.batch_update_points(
+                        collection_name="santa_images",
+                        update_operations=ops[start:start + settings.RECALC_PAGE_SIZE],
+                    )
+                embedding_mirror.set_scores(*zip(*written))
+                total_updates += len(changed)
+
+        embedding_mirror.flush()
+        return processed_count, total_updates
+
+    def _recalculate_parallel(self, centroid_set: CentroidSet, cancel, workers: int) -> Tuple[int, int]:
+        """post_id 구간을 workers 개로 나눠 프로세스 풀에서 처리하고 결과를 합산합니다."""
+        with engine.connect() as conn:
+            min_id, max_id = conn.execute(text("SELECT MIN(post_id), MAX(post_id) FROM posts")).one()
+        if min_id is None:
+            return 0, 0
+
+        # 구간 나누기: [경계_i, 경계_i+1), 마지막 구간은 끝까지 (RDS 이후에 들어온 포인트 포함)
+        step = max(1, (int(max_id) - int(min_id) + workers) // workers)
+        edges = [int(min_id) + i * step for i in range(workers)]
+        shards = [(edges[i], edges[i + 1] if i + 1 < len(edges) else None) for i in range(len(edges))]
+        # 첫 구간은 처음부터 (min_id 보다 작은 ID 포함)
+        shards[0] = (None, shards[0][1])
+
+        pool, manager = self._get_process_pool(workers)
+        shard_cancel = manager.Event()
+        futures = [
+            pool.submit(_recalculate_shard, centroid_set, start_id, end_id, shard_cancel)
+            for start_id, end_id in shards
+        ]
+
+        # 부모 쪽 취소 신호를 자식 프로세스로 전달하면서 대기
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.5)
+            if cancel is not None and cancel.is_set():
+                shard_cancel.set()
+
+        processed_count = 0
+        total_updates = 0
+        for (start_id, end_id), future in zip(shards, futures):
+            try:
+                processed, changed = future.result()
+                processed_count += processed
+                total_updates += changed
+            except Exception as e:
+                logger.error(f"재계산 샤드 실패 [{start_id}, {end_id}): {e}")
+        return processed_count, total_updates
+
+    def _get_process_pool(self, workers: int):
+        # 매 재계산마다 프로세스를 띄우지 않도록 재사용 (spawn: 자식이 자체 Qdrant/DB 연결 생성)
+        if self._process_pool is None or self._process_pool_size != workers:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+            ctx = multiprocessing.get_context("spawn")
+            self._process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+            self._process_pool_size = workers
+            if self._manager is None:
+                self._manager = ctx.Manager()
+        return self._process_pool, self._manager
+
+    def close(self):
+        """재계산 프로세스 풀 / Manager 종료 (cancel_recalculation 이후, 종료 시 호출)"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
+            self._process_pool_size = 0
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def _recalculate_page(self, conn, points: list, centroid_set: CentroidSet) -> int:
+        """스크롤 한 페이지를 채점하고 바뀐 레벨만 RDS/Qdrant 에 반영합니다. 변경 건수를 반환."""
+        post_ids = []
+        vectors = []
+        for point in points:
+            try:
+                post_ids.append(int(point.id)) # Qdrant ID = Post ID
+                vectors.append(point.vector)
+            except (TypeError, ValueError):
+                continue # ID가 숫자가 아닌 경우 등 예외 처리
+
+        if not post_ids:
+            return 0
+
+        # 1. 페이지 전체의 레벨 / bound 를 한 번에 계산
+        levels, margins = centroid_set.score(np.asarray(vectors, dtype=np.float32))
+        bounds = centroid_set.bounds(margins)
+
+        # 2. 기존 레벨 조회 (N+1 SELECT 대신 한 번에)
+        if settings.RECALC_TRUST_PAYLOAD_LEVEL:
+            current = {
+                int(point.id): (point.payload or {}).get("level")
+                for point in points
+            }
+        else:
+            rows = conn.execute(
+                text("SELECT post_id, post_level FROM posts WHERE post_id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": post_ids},
+            )
+            current = {int(pid): lvl for pid, lvl in rows}
+
+        changed = []
+        for post_id, new_level in zip(post_ids, levels):
+            new_level = int(new_level)
+            old_level = current.get(post_id)
+            level_changed = old_level is None or int(old_level) != new_level
+
+            # RDS 에 있는 포스트 중 바뀐 것만 UPDATE
+            if level_changed and (settings.RECALC_TRUST_PAYLOAD_LEVEL or post_id in current):
+                changed.append((post_id, new_level))
+
+        # Qdrant Payload (레벨 + 새 bound) 갱신
+        payload_ops = payload_operations(post_ids, levels, bounds)
+
+        # 3. 변경분만 일괄 UPDATE
+        for stmt, params in level_update_statements(changed):
+            conn.execute(stmt, params)
+
+        if payload_ops:
+            self.qdrant.batch_update_points(collection_name="santa_images", update_operations=payload_ops)
+
+        return len(changed)
+
+
+def payload_operations(post_ids, levels, bounds) -> list:
+    """포스트별 Qdrant payload (level + bound) 갱신 연산. bound 가 None 이면 level 만 기록합니다."""
+    ops = []
+    for post_id, level, bound in zip(post_ids, levels, bounds):
+        payload = {"level": int(level)}
+        if bound is not None:
+            payload["bound"] = bound
+        ops.append(
+            models.SetPayloadOperation(
+                set_payload=models.SetPayload(payload=payload, points=[int(post_id)])
+            )
+        )
+    return ops
+
+
+# ---------------------------------------------------------
+# [병렬 재계산] 프로세스 풀에서 실행되는 샤드 작업
+# ---------------------------------------------------------
+_shard_service: Optional[CentroidService] = None
+
+def _recalculate_shard(centroid_set: CentroidSet, start_id, end_id, cancel) -> Tuple[int, int]:
+    """자식 프로세스마다 CentroidService(자체 Qdrant 클라이언트 / DB 엔진)를 한 번만 만들어 재사용"""
+    global _shard_service
+    if _shard_service is None:
+        _shard_service = CentroidService()
+    return _shard_service._recalculate_range(centroid_set, cancel, start_id, end_id)
@@ -0,0 +1,28 @@
+# app/services/centroid_store.py
+# system:centroids 관련 Redis 키와, Centroid 전체를 덮어쓰는 동기 저장 함수
+# 앱 설정 / 연결을 import 하지 않으므로 Modal 배치 작업(modal_batch.py)과 스크립트에서도 그대로 사용합니다.
+import redis
+
+CENTROIDS_KEY = "system:centroids"
+VERSION_KEY = "system:centroids:version"       # save 시마다 INCR
+UPDATE_CHANNEL = "system:centroids:updated"    # 새 version 을 publish
+DRIFT_KEY = "system:centroids:drift"           # Centroid 누적 이동량 (INCRBYFLOAT)
+
+# 단위벡터 간 유사도 차이는 최대 2 이므로, 이보다 큰 drift 를 더하면 모든 bound 가 무효화됨
+DRIFT_INVALIDATE_ALL = 4.0
+
+
+def overwrite_centroids(client: redis.Redis, payload: str) -> int:
+    """
+    Centroid 를 통째로 교체합니다. (초기 주입 / 배치 재산출)
+    CentroidService.update_centroids 와 같이 SET + INCR(version) + INCRBYFLOAT(drift) 를 한 번의 MULTI 로 실행해서,
+    새 Centroid 를 예전 drift 와 함께 읽는 재계산이 없도록 합니다. 새 version 은 EXEC 이후에 publish.
+    """
+    with client.pipeline(transaction=True) as pipe:
+        pipe.set(CENTROIDS_KEY, payload)
+        pipe.incr(VERSION_KEY)
+        # 서버들의 증분 재계산 bound 전체 무효화
+        pipe.incrbyfloat(DRIFT_KEY, DRIFT_INVALIDATE_ALL)
+        _, version, _ = pipe.execute()
+    client.publish(UPDATE_CHANNEL, version)
+    return int(version)
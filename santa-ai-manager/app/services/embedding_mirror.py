@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.core.config import settings
+from app.core.connections import qdrant_client
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIM = 1152
+TOMBSTONE_LEVEL = -1   # Qdrant 에서 사라진 포스트 (append-only 이므로 행은 남겨둠)
+MARKER_FIELD = "embedded_at"   # 벡터를 쓸 때마다 바뀌는 payload 값 (ingest_service.build_payload)
+
+
+class EmbeddingMirror:
+    """
+    santa_images 의 로컬 미러 (append-only, numpy.memmap).
+    - vectors.f32: (capacity, D) float32 벡터 행렬
+    - post_ids.i64: (capacity,) 각 행의 post_id
+    - levels.i16: (capacity,) 각 행의 현재 레벨
+    - markers.i64: (capacity,) 각 행 벡터의 embedded_at (Qdrant 와 다르면 벡터를 다시 받음)
+    - bounds.f64: (capacity,) 각 행의 재계산 bound (NaN 이면 없음, CentroidSet.bounds 참고)
+    - meta.json: 유효한 행 수(count)
+    재계산 / 통계 / Centroid 재산출을 Qdrant 를 거치지 않고
+    memmap 위의 행렬 연산으로 처리하기 위해 사용합니다.
+    """
+
+    INITIAL_CAPACITY = 4096
+    SCAN_CHUNK = 65536   # 벌크 연산 시 한 번에 올리는 행 수 (메모리 상한)
+
+    def __init__(self, path: str, dim: int = VECTOR_DIM):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._count = 0
+        self._capacity = 0
+        self._index: Dict[int, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._post_ids: Optional[np.memmap] = None
+        self._levels: Optional[np.memmap] = None
+        self._markers: Optional[np.memmap] = None
+        self._bounds: Optional[np.memmap] = None
+        # 마지막 정합성 맞춤 시각 (time.monotonic, 한 번도 안 했으면 None) / 동시에 두 번 돌지 않도록
+        self.last_reconciled: Optional[float] = None
+        self._reconcile_lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # 파일 관리
+    # ---------------------------------------------------------
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def open(self):
+        with self._lock:
+            if self._vectors is not None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+
+            meta = {}
+            if os.path.exists(self._file("meta.json")):
+                with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            if meta.get("dim", self.dim) != self.dim:
+                raise ValueError(f"미러 차원({meta.get('dim')})이 설정({self.dim})과 다릅니다.")
+
+            self._count = int(meta.get("count", 0))
+            self._map(max(int(meta.get("capacity", 0)), self.INITIAL_CAPACITY, self._count))
+            self._index = {int(pid): row for row, pid in enumerate(self._post_ids[:self._count])}
+            logger.info(f"임베딩 미러 로드: {self.path} ({self._count}건)")
+
+    def _map(self, capacity: int):
+        for name, dtype, width in (
+            ("vectors.f32", np.float32, self.dim),
+            ("post_ids.i64", np.int64, 1),
+            ("levels.i16", np.int16, 1),
+            ("markers.i64", np.int64, 1),
+            ("bounds.f64", np.float64, 1),
+        ):
+            size = capacity * width * np.dtype(dtype).itemsize
+            with open(self._file(name), "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+
+        self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._post_ids = np.memmap(self._file("post_ids.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self._levels = np.memmap(self._file("levels.i16"), dtype=np.int16, mode="r+", shape=(capacity,))
+        self._markers = np.memmap(self._file("markers.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self._bounds = np.memmap(self._file("bounds.f64"), dtype=np.float64, mode="r+", shape=(capacity,))
+        self._capacity = capacity
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self.flush()
+        # 기존 view 를 들고 있는 reader 는 그대로 유효 (파일은 늘어나기만 함)
+        self._map(capacity)
+
+    def flush(self):
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            self._post_ids.flush()
+            self._levels.flush()
+            self._markers.flush()
+            self._bounds.flush()
+            tmp = self._file("meta.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"count": self._count, "capacity": self._capacity, "dim": self.dim}, f)
+            os.replace(tmp, self._file("meta.json"))
+
+    def close(self):
+        """flush 후 memmap 을 놓습니다. (종료 시 재계산 / 웹훅 저장이 모두 멈춘 뒤 호출)"""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self.flush()
+            self._vectors = self._post_ids = self._levels = self._markers = self._bounds = None
+            self._index = {}
+            self._count = 0
+            self._capacity = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ---------------------------------------------------------
+    # 증분 반영 (웹훅 / 재계산 결과)
+    # ---------------------------------------------------------
+    def upsert(
+        self,
+        post_ids: Sequence[int],
+        vectors: np.ndarray,
+        levels: Sequence[int],
+        markers: Optional[Sequence[int]] = None,
+        bounds: Optional[Sequence[Optional[float]]] = None,
+    ):
+        """
+        이미 있는 post_id 는 제자리 갱신, 없으면 끝에 추가합니다.
+        markers 는 payload 의 embedded_at, bounds 는 payload 의 bound (None 이면 없음).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if markers is None:
+            markers = [0] * len(post_ids)
+        if bounds is None:
+            bounds = [None] * len(post_ids)
+        with self._lock:
+            self.open()
+            new_ids = [int(pid) for pid in post_ids if int(pid) not in self._index]
+            if self._count + len(new_ids) > self._capacity:
+                self._grow(self._count + len(new_ids))
+
+            for pid, vec, lvl, marker, bound in zip(post_ids, vectors, levels, markers, bounds):
+                pid = int(pid)
+                row = self._index.get(pid)
+                if row is None:
+                    row = self._count
+                    self._index[pid] = row
+                    self._post_ids[row] = pid
+                    self._count += 1
+                self._vectors[row] = vec
+                self._levels[row] = int(lvl)
+                self._markers[row] = int(marker)
+                self._bounds[row] = np.nan if bound is None else float(bound)
+
+    def set_scores(self, post_ids: Sequence[int], levels: Sequence[int], bounds: Sequence[Optional[float]]):
+        """재계산 결과 (레벨 + bound) 를 기존 행에 반영합니다."""
+        with self._lock:
+            for pid, lvl, bound in zip(post_ids, levels, bounds):
+                row = self._index.get(int(pid))
+                if row is not None:
+                    self._levels[row] = int(lvl)
+                    self._bounds[row] = np.nan if bound is None else float(bound)
+
+    # ---------------------------------------------------------
+    # 벌크 연산 (zero-copy view 위에서 청크 단위 matmul)
+    # ---------------------------------------------------------
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """현재 유효 행의 (vectors, post_ids, levels) view. 복사하지 않습니다."""
+        with self._lock:
+            self.open()
+            n = self._count
+            return self._vectors[:n], self._post_ids[:n], self._levels[:n]
+
+    def bounds(self) -> np.ndarray:
+        """현재 유효 행의 bound view (snapshot 과 같은 행 순서)."""
+        with self._lock:
+            self.open()
+            return self._bounds[:self._count]
+
+    def iter_chunks(self) -> Iterator[Tuple[slice, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """(slice, vectors, post_ids, levels, bounds) 를 SCAN_CHUNK 행씩 돌려줍니다."""
+        with self._lock:
+            vectors, post_ids, levels = self.snapshot()
+            bounds = self.bounds()
+        for start in range(0, len(post_ids), self.SCAN_CHUNK):
+            sl = slice(start, start + self.SCAN_CHUNK)
+            yield sl, vectors[sl], post_ids[sl], levels[sl], bounds[sl]
+
+    # ---------------------------------------------------------
+    # Qdrant 와의 정합성 맞추기
+    # ---------------------------------------------------------
+    def reconcile_if_stale(self, qdrant: QdrantClient, max_age: float) -> Optional[dict]:
+        """마지막 정합성 맞춤이 max_age 초보다 오래됐으면 (또는 한 번도 안 했으면) 맞춥니다."""
+        with self._reconcile_lock:
+            if self.last_reconciled is not None and time.monotonic() - self.last_reconciled < max_age:
+                return None
+            return self._reconcile(qdrant)
+
+    def reconcile(self, qdrant: QdrantClient, collection_name: str = "santa_images", page_size: int = 1000) -> dict:
+        """
+        1) 벡터 없이 ID/레벨/bound/embedded_at 만 스크롤해서 레벨과 bound 를 맞추고
+        2) 미러에 없는 포인트, embedded_at 이 바뀐(다시 임베딩된) 포인트,
+           TOMBSTONE 이었다가 다시 들어온 포인트만 벡터를 가져와 덮어쓰고
+        3) Qdrant 에서 사라진 포인트는 TOMBSTONE 처리합니다.
+        """
+        with self._reconcile_lock:
+            return self._reconcile(qdrant, collection_name, page_size)
+
+    def _reconcile(self, qdrant: QdrantClient, collection_name: str = "santa_images", page_size: int = 1000) -> dict:
+        self.open()
+        started = time.monotonic()
+        seen = set()
+        missing = []
+        stale = []
+        level_fix = 0
+        exclude_centroids = models.Filter(
+            must_not=[models.FieldCondition(key="type", match=models.MatchValue(value="centroid"))]
+        )
+
+        next_offset = None
+        while True:
+            points, next_offset = qdrant.scroll(
+                collection_name=collection_name,
+                scroll_filter=exclude_centroids,
+                limit=page_size,
+                offset=next_offset,
+                with_vectors=False,
+                with_payload=["level", "bound", MARKER_FIELD],
+            )
+            ids, lvls, bnds = [], [], []
+            for point in points:
+                try:
+                    pid = int(point.id)
+                except (TypeError, ValueError):
+                    continue
+                seen.add(pid)
+                payload = point.payload or {}
+                level = payload.get("level")
+                row = self._index.get(pid)
+                if row is None:
+                    missing.append(pid)
+                elif (
+                    int(payload.get(MARKER_FIELD) or 0) != int(self._markers[row])
+                    or self._levels[row] == TOMBSTONE_LEVEL
+                ):
+                    stale.append(pid)
+                elif level is not None:
+                    bound = payload.get("bound")
+                    ids.append(pid)
+                    lvls.append(int(level))
+                    bnds.append(np.nan if bound is None else float(bound))
+            if ids:
+                with self._lock:
+                    rows = [self._index[pid] for pid in ids]
+                    diff = self._levels[rows] != np.asarray(lvls, dtype=np.int16)
+                    level_fix += int(diff.sum())
+                    self._levels[rows] = lvls
+                    self._bounds[rows] = bnds
+            if next_offset is None:
+                break
+
+        fetch = missing + stale
+        for start in range(0, len(fetch), page_size):
+            batch = qdrant.retrieve(
+                collection_name=collection_name,
+                ids=fetch[start:start + page_size],
+                with_vectors=True,
+                with_payload=["level", "bound", MARKER_FIELD],
+            )
+            if batch:
+                self.upsert(
+                    [int(p.id) for p in batch],
+                    np.asarray([p.vector for p in batch], dtype=np.float32),
+                    [int((p.payload or {}).get("level", 0)) for p in batch],
+                    [int((p.payload or {}).get(MARKER_FIELD) or 0) for p in batch],
+                    [(p.payload or {}).get("bound") for p in batch],
+                )
+
+        with self._lock:
+            gone = [row for pid, row in self._index.items() if pid not in seen]
+            if gone:
+                self._levels[gone] = TOMBSTONE_LEVEL
+
+        self.flush()
+        self.last_reconciled = started
+        report = {
+            "count": self._count, "added": len(missing), "refreshed": len(stale),
+            "level_fixed": level_fix, "removed": len(gone),
+        }
+        logger.info(f"임베딩 미러 정합성 맞춤 완료: {report}")
+        return report
+
+
+embedding_mirror = EmbeddingMirror(settings.MIRROR_DIR)
+
+
+async def run_mirror_reconciliation():
+    """MIRROR_RECONCILE_INTERVAL 초마다 Qdrant 와 미러를 맞춥니다. (lifespan 에서 실행)"""
+    while True:
+        # 취소돼도 스레드는 멈추지 않으므로, 실행 중인 정합성 맞춤이 끝날 때까지 기다린 뒤 취소를 전파
+        # (종료 시 flush / 연결 닫기와 memmap 쓰기가 겹치지 않도록)
+        running = asyncio.ensure_future(asyncio.to_thread(embedding_mirror.reconcile, qdrant_client))
+        try:
+            await asyncio.shield(running)
+        except asyncio.CancelledError:
+            await asyncio.gather(running, return_exceptions=True)
+            raise
+        except Exception as e:
+            logger.error(f"임베딩 미러 정합성 맞춤 실패: {e}")
+        await asyncio.sleep(settings.MIRROR_RECONCILE_INTERVAL)
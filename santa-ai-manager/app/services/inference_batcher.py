@@ -0,0 +1,126 @@
+# app/services/inference_batcher.py
+import time
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.modal_service import get_modal_function, inference_kwargs
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """
+    큐에서 꺼낸 추론 작업을 모아서 Modal run_inference_batch 한 번으로 보냅니다. (opt-in)
+    - 최대 max_items 건 또는 첫 건 이후 max_delay_ms 가 지나면 spawn
+    - 결과는 Modal 쪽에서 /internal/inference-results (일괄 웹훅) 으로 한 번에 전송
+    - submit 은 해당 건이 포함된 배치의 spawn 성공 여부를 반환합니다 (건별 ACK 용)
+    - resolve_function 을 바꾸면 Modal 없이 stub 함수로 테스트할 수 있음
+    """
+
+    FUNCTION_NAME = "run_inference_batch"
+
+    def __init__(
+        self,
+        max_items: int,
+        max_delay_ms: int,
+        resolve_function: Callable[[str], object] = get_modal_function,
+    ):
+        self.max_items = max(1, max_items)
+        self.max_delay = max_delay_ms / 1000
+        self.resolve_function = resolve_function
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+        # 모니터링용 카운터
+        self.batches = 0
+        self.jobs = 0
+        self.failed_batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize(),
+        }
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"추론 배처 시작 (max_items={self.max_items}, max_delay={self.max_delay}s)")
+
+    async def submit(self, job_info: dict) -> bool:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job_info, future))
+        return await future
+
+    async def stop(self):
+        """남은 작업을 모두 spawn 한 뒤 종료합니다."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        jobs = [
+            {
+                "job_id": job_info.get("job_id"),
+                "image_urls": job_info.get("image_urls"),
+                "content": job_info.get("content"),
+            }
+            for job_info, _ in batch
+        ]
+        try:
+            f = self.resolve_function(self.FUNCTION_NAME)
+            await asyncio.to_thread(f.spawn, jobs=jobs, **inference_kwargs("/internal/inference-results"))
+            self.batches += 1
+            self.jobs += len(jobs)
+            logger.info(f"Modal 배치 작업 요청 성공 ({len(jobs)}건)")
+            ok = True
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Modal 배치 호출 중 에러 발생 ({len(jobs)}건): {e}")
+            ok = False
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(ok)
+
+
+inference_batcher = InferenceBatcher(
+    max_items=settings.INFERENCE_BATCH_SIZE,
+    max_delay_ms=settings.INFERENCE_BATCH_MAX_DELAY_MS,
+)
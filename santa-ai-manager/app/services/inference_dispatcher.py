@@ -0,0 +1,106 @@
+# app/services/inference_dispatcher.py
+# 추론 요청(Modal spawn) 동시 실행 수 제한 + 태스크 추적
+# - 슬롯이 모두 차면 reserve() 가 대기하므로 워커가 큐에서 더 꺼내지 않음 (backpressure)
+# - 실행 중인 태스크 참조를 들고 있다가 종료 시 drain() 으로 마무리
+import time
+import asyncio
+import logging
+from typing import Coroutine, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceDispatcher:
+    def __init__(self, max_in_flight: int = 32):
+        self.max_in_flight = max(1, max_in_flight)
+        self._used = 0      # 예약된 슬롯 (읽는 중 + 실행 중)
+        self._freed = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 모니터링용 카운터
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.saturated_waits = 0
+        self.saturated_seconds = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "reserved": self._used,
+            "max_in_flight": self.max_in_flight,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "saturated_waits": self.saturated_waits,
+            "saturated_seconds": round(self.saturated_seconds, 3),
+        }
+
+    # ---------------------------------------------------------
+    # 슬롯 예약 / 반환
+    # ---------------------------------------------------------
+    async def reserve(self, max_slots: int) -> int:
+        """빈 슬롯이 생길 때까지 기다렸다가 최대 max_slots 개를 예약하고 개수를 반환합니다."""
+        if self._used >= self.max_in_flight:
+            self.saturated_waits += 1
+            started = time.monotonic()
+            while self._used >= self.max_in_flight:
+                self._freed.clear()
+                await self._freed.wait()
+            self.saturated_seconds += time.monotonic() - started
+
+        # 검사와 증가 사이에 await 가 없으므로 여러 consumer 가 있어도 초과 예약되지 않음
+        slots = min(max_slots, self.max_in_flight - self._used)
+        self._used += slots
+        return slots
+
+    def release(self, slots: int = 1):
+        if slots <= 0:
+            return
+        self._used -= slots
+        self._freed.set()
+
+    # ---------------------------------------------------------
+    # 실행 / 종료
+    # ---------------------------------------------------------
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        """reserve() 로 확보한 슬롯 1개를 사용해 실행합니다. 끝나면 슬롯 반환"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        self.started += 1
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self.release(1)
+        if task.cancelled():
+            self.failed += 1
+        elif task.exception() is not None:
+            self.failed += 1
+            logger.error(f"[Inference] 디스패치 태스크 에러: {task.exception()}")
+        else:
+            self.completed += 1
+
+    async def drain(self, timeout: float = 30.0):
+        """실행 중인 요청이 끝나길 기다리고, timeout 이 지나면 취소합니다. (lifespan 종료 시)"""
+        if not self._tasks:
+            return
+        logger.info(f"[Inference] 실행 중인 요청 {len(self._tasks)}건 마무리 대기...")
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            # stream 백엔드라면 ACK 되지 않은 항목은 다른 워커가 회수
+            logger.warning(f"[Inference] {len(pending)}건을 마무리하지 못하고 취소합니다.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+inference_dispatcher = InferenceDispatcher(settings.INFERENCE_MAX_IN_FLIGHT)
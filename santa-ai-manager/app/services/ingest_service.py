@@ -0,0 +1,89 @@
+import time
+import asyncio
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client.http import models
+
+from app.core.config import settings
+
+from app.core.connections import async_qdrant_client
+from app.db.session import async_engine
+from app.db.queries import level_update_statements
+from app.services.embedding_mirror import embedding_mirror, MARKER_FIELD
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "santa_images"
+VECTOR_DIM = 1152
+
+# (post_id, vector, level, bound)  - bound 는 CentroidSet.bounds 참고 (None 이면 생략)
+IngestEntry = Tuple[int, Sequence[float], int, Optional[float]]
+
+
+def build_payload(post_id: int, level: int, bound: Optional[float], marker: int) -> dict:
+    # marker(embedded_at): 벡터를 다시 쓸 때마다 바뀌므로 다른 프로세스의 미러가 갱신 대상을 알 수 있음
+    payload = {"post_id": post_id, "level": level, MARKER_FIELD: marker}
+    if bound is not None:
+        payload["bound"] = bound
+    return payload
+
+
+async def persist_results(entries: List[IngestEntry]) -> bool:
+    """
+    추론 결과 묶음을 저장합니다.
+    - Qdrant: 레벨까지 담은 한 번의 멀티 포인트 upsert (set_payload 왕복 없음)
+    - MySQL: CASE 문 기반의 일괄 UPDATE, 한 번의 커밋
+    Qdrant 실패는 로그만 남기고 RDS 업데이트는 계속 진행합니다. (기존 동작 유지)
+    MySQL 실패는 예외로 올려보냅니다.
+    반환값: Qdrant 저장 성공 여부
+    """
+    if not entries:
+        return True
+
+    vector_stored = True
+    marker = time.time_ns()
+
+    # A. Qdrant에 벡터 + 레벨 저장
+    try:
+        await async_qdrant_client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[
+                models.PointStruct(
+                    id=post_id,
+                    vector=vector.tolist() if hasattr(vector, "tolist") else list(vector),
+                    payload=build_payload(post_id, level, bound, marker)
+                )
+                for post_id, vector, level, bound in entries
+            ]
+        )
+        logger.info(f"Qdrant 저장 완료 ({len(entries)}건)")
+    except Exception as q_err:
+        logger.error(f"Qdrant 저장 실패: {q_err}")
+        vector_stored = False
+
+    # B. MySQL 일괄 업데이트
+    async with async_engine.connect() as conn:
+        for stmt, params in level_update_statements((entry[0], entry[2]) for entry in entries):
+            await conn.execute(stmt, params)
+        await conn.commit()
+
+    logger.info(f"RDS 업데이트 완료 ({len(entries)}건)")
+
+    # C. 로컬 임베딩 미러에 추가
+    if settings.MIRROR_ENABLED:
+        try:
+            # memmap 확장(파일 복사)이 이벤트 루프를 막지 않도록 스레드에서 실행
+            await asyncio.to_thread(
+                embedding_mirror.upsert,
+                [entry[0] for entry in entries],
+                np.asarray([entry[1] for entry in entries], dtype=np.float32),
+                [entry[2] for entry in entries],
+                [marker] * len(entries),
+                [entry[3] for entry in entries],
+            )
+        except Exception as m_err:
+            # Qdrant 에 저장됐다면 embedded_at 이 미러와 달라지므로 다음 정합성 맞춤 때 벡터를 다시 받음
+            logger.error(f"임베딩 미러 반영 실패 (다음 정합성 맞춤 때 복구됨): {m_err}")
+    return vector_stored
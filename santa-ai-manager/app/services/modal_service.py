@@ -1,24 +1,52 @@
 # app/services/modal_service.py
 import modal
+import asyncio
 import logging
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-async def trigger_inference(job_info):
+MODAL_APP_NAME = "santa"
+
+# from_name 조회는 네트워크 왕복이 있으므로 함수 이름별로 한 번만
+_functions = {}
+
+def get_modal_function(name: str):
+    """Modal 앱 'santa' 에 등록된 함수 핸들 (프로세스 내 캐시)"""
+    f = _functions.get(name)
+    if f is None:
+        f = modal.Function.from_name(MODAL_APP_NAME, name)
+        _functions[name] = f
+    return f
+
+def inference_kwargs(callback_path: str) -> dict:
+    """run_inference / run_inference_batch 공통 인자"""
+    kwargs = dict(
+        callback_url=f"{settings.CALLBACK_BASE_URL}{callback_path}",
+        secret_token=settings.SANTA_SECRET_TOKEN
+    )
+    # 바이너리 벡터 전송 (json 이면 기존 배포본과 호환되도록 인자 자체를 생략)
+    if settings.VECTOR_WIRE_ENCODING != "json":
+        kwargs["vector_encoding"] = settings.VECTOR_WIRE_ENCODING
+    return kwargs
+
+async def trigger_inference(job_info) -> bool:
+    """Modal 작업 요청. 성공 여부 반환 (stream 백엔드에서는 성공한 경우만 ACK)"""
     try:
         # Modal 앱 이름 'santa'에 등록된 'run_inference' 함수 로드
-        f = modal.Function.from_name("santa", "run_inference")
-        
-        # 비동기로 실행을 던짐
-        f.spawn(
+        f = get_modal_function("run_inference")
+
+        # 비동기로 실행을 던짐 (spawn 자체는 블로킹 호출이라 스레드에서)
+        await asyncio.to_thread(
+            f.spawn,
             image_urls=job_info.get("image_urls"),
             content=job_info.get("content"),
             job_id=job_info.get("job_id"),
-            callback_url=f"{settings.CALLBACK_BASE_URL}/internal/inference-result",
-            secret_token=settings.SANTA_SECRET_TOKEN
+            **inference_kwargs("/internal/inference-result"),
         )
         logger.info(f"Modal 작업 요청 성공: {job_info.get('job_id')}")
-        
+        return True
+
     except Exception as e:
-        logger.error(f"Modal 호출 중 에러 발생: {e}")
\ No newline at end of file
+        logger.error(f"Modal 호출 중 에러 발생: {e}")
+        return False
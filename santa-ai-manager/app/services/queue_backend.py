@@ -0,0 +1,244 @@
+# app/services/queue_backend.py
+# 작업 큐 백엔드 (QUEUE_BACKEND 로 선택)
+# - list: 기존 LPUSH / BLPOP. 꺼낸 직후 죽으면 작업 유실, ack 없음
+# - stream: Redis Streams + Consumer Group. 처리 완료 후 XACK, 멈춘 항목은 XAUTOCLAIM 으로 회수
+import json
+import time
+import socket
+import logging
+from typing import List, NamedTuple, Optional
+
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueueMessage(NamedTuple):
+    id: Optional[str]     # stream entry id (list 백엔드는 None)
+    data: dict
+
+
+def _decode(raw: str) -> Optional[dict]:
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class ListQueue:
+    """기존 방식: BLPOP 으로 1건을 기다린 뒤 쌓여 있는 만큼 LPOP 으로 더 꺼냅니다."""
+
+    def __init__(self, redis, name: str):
+        self.redis = redis
+        self.name = name
+
+    async def read(self, count: int, block_ms: int) -> List[QueueMessage]:
+        job = await self.redis.blpop(self.name, timeout=max(block_ms / 1000, 0.001))
+        if not job:
+            return []
+        raw_jobs = [job[1]]
+        while len(raw_jobs) < count:
+            more = await self.redis.lpop(self.name, count - len(raw_jobs))
+            if not more:
+                break
+            raw_jobs.extend(more)
+
+        messages = []
+        for raw in raw_jobs:
+            data = _decode(raw)
+            if data is None:
+                logger.error(f"[{self.name}] 잘못된 작업을 버립니다: {raw!r}")
+                continue
+            messages.append(QueueMessage(None, data))
+        return messages
+
+    async def ack(self, ids: List[Optional[str]]):
+        pass
+
+    async def push(self, job: dict):
+        await self.redis.lpush(self.name, json.dumps(job))
+
+    async def stats(self) -> dict:
+        return {"backend": "list", "name": self.name, "length": await self.redis.llen(self.name)}
+
+
+class StreamQueue:
+    """
+    Redis Streams Consumer Group.
+    1) 시작 시 자기 이름으로 pending 인 항목(이전 프로세스가 처리 못 한 것)부터 한 번씩 다시 읽고
+    2) 주기적으로 XAUTOCLAIM 으로 다른 consumer 가 오래 들고 있는 항목을 가져오며
+    3) 그 외에는 XREADGROUP ">" 로 새 항목을 block 대기합니다.
+    max_deliveries 를 넘긴 항목은 <stream>:dead 로 옮기고 ACK 합니다.
+    """
+
+    def __init__(
+        self,
+        redis,
+        stream: str,
+        group: str,
+        consumer: str,
+        claim_idle_ms: int = 60000,
+        max_deliveries: int = 5,
+        maxlen: Optional[int] = None,
+    ):
+        self.redis = redis
+        self.stream = stream
+        self.name = stream
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.maxlen = maxlen
+        self.dead_stream = f"{stream}:dead"
+
+        self._group_ready = False
+        self._recovering = True
+        self._recover_cursor = "0"
+        self._claim_cursor = "0-0"
+        self._next_claim = 0.0
+
+        # 모니터링용 카운터
+        self.claimed = 0
+        self.dead = 0
+
+    async def ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info(f"Consumer Group 생성: {self.stream} / {self.group}")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def read(self, count: int, block_ms: int) -> List[QueueMessage]:
+        await self.ensure_group()
+
+        if self._recovering:
+            # 이 consumer 에게 배달됐지만 아직 ACK 안 된 항목. ACK 는 처리 태스크에서 나중에 하므로
+            # 커서를 마지막 항목 뒤로 옮겨서 같은 항목을 다시 돌려주지 않음 (빈 응답이면 복구 끝)
+            entries = await self._xreadgroup(self._recover_cursor, count, None)
+            if entries:
+                self._recover_cursor = entries[-1][0]
+                return await self._accept(await self._drop_exhausted(entries))
+            self._recovering = False
+
+        now = time.monotonic()
+        if now >= self._next_claim:
+            self._next_claim = now + self.claim_idle_ms / 2000
+            claimed = await self._claim(count)
+            if claimed:
+                return claimed
+
+        entries = await self._xreadgroup(">", count, block_ms)
+        return await self._accept(entries)
+
+    async def ack(self, ids: List[Optional[str]]):
+        ids = [i for i in ids if i is not None]
+        if ids:
+            await self.redis.xack(self.stream, self.group, *ids)
+
+    async def push(self, job: dict):
+        await self.redis.xadd(self.stream, {"data": json.dumps(job)}, maxlen=self.maxlen, approximate=True)
+
+    async def stats(self) -> dict:
+        await self.ensure_group()
+        info = {"backend": "stream", "name": self.stream, "length": await self.redis.xlen(self.stream)}
+        for group in await self.redis.xinfo_groups(self.stream):
+            if group.get("name") == self.group:
+                info.update(pending=group.get("pending"), lag=group.get("lag"), consumers=group.get("consumers"))
+        info.update(claimed=self.claimed, dead=self.dead)
+        return info
+
+    # ---------------------------------------------------------
+    # 내부 처리
+    # ---------------------------------------------------------
+    async def _xreadgroup(self, stream_id: str, count: int, block_ms: Optional[int]):
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: stream_id}, count=count, block=block_ms
+        )
+        if not response:
+            return []
+        return response[0][1]
+
+    async def _claim(self, count: int) -> List[QueueMessage]:
+        response = await self.redis.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id=self._claim_cursor, count=count,
+        )
+        self._claim_cursor, entries = response[0], response[1]
+        if not entries:
+            return []
+
+        self.claimed += len(entries)
+        logger.warning(f"[{self.stream}] 멈춘 항목 {len(entries)}건을 회수했습니다.")
+        return await self._accept(await self._drop_exhausted(entries))
+
+    async def _drop_exhausted(self, entries) -> list:
+        """배달 횟수를 넘긴 항목은 더 시도하지 않음 (독성 메시지) - dead letter 로 옮기고 나머지만 반환"""
+        pending = await self.redis.xpending_range(
+            self.stream, self.group, min=entries[0][0], max=entries[-1][0],
+            count=len(entries) * 2, consumername=self.consumer,
+        )
+        deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+        alive = []
+        for entry_id, fields in entries:
+            if deliveries.get(entry_id, 0) > self.max_deliveries:
+                await self._dead_letter(entry_id, fields, "max deliveries exceeded")
+            else:
+                alive.append((entry_id, fields))
+        return alive
+
+    async def _accept(self, entries) -> List[QueueMessage]:
+        messages = []
+        for entry_id, fields in entries:
+            data = _decode((fields or {}).get("data"))
+            if data is None:
+                await self._dead_letter(entry_id, fields, "invalid payload")
+                continue
+            messages.append(QueueMessage(entry_id, data))
+        return messages
+
+    async def _dead_letter(self, entry_id: str, fields: Optional[dict], reason: str):
+        logger.error(f"[{self.stream}] {entry_id} 를 {self.dead_stream} 로 옮깁니다: {reason}")
+        await self.redis.xadd(
+            self.dead_stream,
+            {"id": entry_id, "reason": reason, "data": (fields or {}).get("data") or ""},
+            maxlen=self.maxlen, approximate=True,
+        )
+        await self.redis.xack(self.stream, self.group, entry_id)
+        self.dead += 1
+
+
+def create_queue(list_name: str, stream_name: str, consumer_suffix: str = "", redis=None):
+    """QUEUE_BACKEND 설정에 맞는 큐를 만듭니다. (consumer 이름 = QUEUE_CONSUMER_NAME 또는 호스트명 + suffix)"""
+    if redis is None:
+        from app.core.connections import redis_client
+        redis = redis_client
+
+    if settings.QUEUE_BACKEND == "stream":
+        consumer = (settings.QUEUE_CONSUMER_NAME or socket.gethostname()) + consumer_suffix
+        return StreamQueue(
+            redis,
+            stream_name,
+            settings.QUEUE_CONSUMER_GROUP,
+            consumer,
+            claim_idle_ms=settings.QUEUE_CLAIM_IDLE_MS,
+            max_deliveries=settings.QUEUE_MAX_DELIVERIES,
+            maxlen=settings.QUEUE_STREAM_MAXLEN,
+        )
+    if settings.QUEUE_BACKEND != "list":
+        raise ValueError(f"알 수 없는 QUEUE_BACKEND: {settings.QUEUE_BACKEND}")
+    return ListQueue(redis, list_name)
+
+
+def inference_queue(consumer_suffix: str = "", redis=None):
+    return create_queue(settings.REDIS_QUEUE_NAME, settings.REDIS_INFERENCE_STREAM, consumer_suffix, redis)
+
+
+def feedback_queue(consumer_suffix: str = "", redis=None):
+    return create_queue(settings.REDIS_FEEDBACK_QUEUE_NAME, settings.REDIS_FEEDBACK_STREAM, consumer_suffix, redis)
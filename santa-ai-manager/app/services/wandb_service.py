@@ -1,78 +1,209 @@
-import wandb
 import os
+import time
+import queue
 import logging
+import threading
+from typing import List, Optional
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-class WandBService:
-    def __init__(self):
-        self.project_name = os.getenv("WANDB_PROJECT", "santa-ai-manager")
+# (id, type, level, embedding) - WandB Table 한 행
+Row = tuple
+
+
+class WandBSink:
+    """실제 WandB 로 전송하는 sink. init / Table 생성 / 전송은 모두 백그라운드 스레드에서만 호출됩니다."""
+
+    def __init__(self, project_name: str):
+        self.project_name = project_name
         self.initialized = False
 
     def _ensure_init(self):
+        import wandb
         if wandb.run is None:
-            try:
-                if hasattr(settings, "WANDB_API_KEY") and settings.WANDB_API_KEY:
-                    wandb.login(key=settings.WANDB_API_KEY)
-                
-                wandb.init(
-                    project=self.project_name,
-                    job_type="production_monitoring",
-                    resume="allow"
-                )
-                self.initialized = True
-            except Exception as e:
-                logger.error(f"WandB 초기화 실패: {e}")
+            if settings.WANDB_API_KEY:
+                wandb.login(key=settings.WANDB_API_KEY)
 
-    def log_batch(self, items: list):
-        """Centroid 업데이트용 (기존 유지)"""
-        try:
-            self._ensure_init()
-            if not items: return
+            wandb.init(
+                project=self.project_name,
+                job_type="production_monitoring",
+                resume="allow"
+            )
+            self.initialized = True
 
-            table = wandb.Table(columns=["id", "type", "level", "embedding"])
-            for item in items:
-                vec, p_type, p_id, lvl = item
-                table.add_data(str(p_id), p_type, lvl, vec)
+    def log_rows(self, rows: List[Row]):
+        import wandb
+        self._ensure_init()
+        table = wandb.Table(columns=["id", "type", "level", "embedding"])
+        for row in rows:
+            table.add_data(*row)
+        wandb.log({"santa_vectors": table})
 
-            wandb.log({"santa_vectors": table})
-            logger.info(f"WandB Batch 로깅 완료 ({len(items)}건)")
+    def finish(self):
+        import wandb
+        if wandb.run:
+            wandb.finish()
 
-        except Exception as e:
-            logger.error(f"WandB Batch 로깅 실패: {e}")
 
-    # 👇 [신규] Post 1개와 현재 Centroid들을 묶어서 로깅
+class NullSink:
+    """네트워크 없이 동작하는 sink (WANDB_MODE=disabled, 테스트용). 받은 행 수만 셉니다."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def log_rows(self, rows: List[Row]):
+        self.rows += len(rows)
+
+    def finish(self):
+        pass
+
+
+class WandBService:
+    """
+    WandB 로깅을 요청/이벤트 루프 경로에서 분리한 백그라운드 파이프라인.
+    - log_* 는 bounded 큐에 넣기만 하고 즉시 반환 (가득 차면 버리고 dropped 카운트 증가)
+    - 전용 스레드가 flush_interval 마다 모인 항목을 하나의 Table 로 묶어 전송
+    """
+
+    def __init__(
+        self,
+        sink=None,
+        max_queue: int = 10000,
+        flush_interval: float = 10.0,
+        max_batch: int = 1000,
+    ):
+        self.project_name = os.getenv("WANDB_PROJECT", "santa-ai-manager")
+        if sink is None:
+            sink = NullSink() if settings.WANDB_MODE == "disabled" else WandBSink(self.project_name)
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        # close() 이후에는 스레드를 다시 띄우지 않고 버림 (종료 중 늦게 들어온 로그가 sink.finish 뒤에 전송되지 않도록)
+        self._closed = False
+
+        # 모니터링용 카운터
+        self.enqueued = 0
+        self.dropped = 0
+        self.logged = 0
+        self.failed = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "logged": self.logged,
+            "failed": self.failed,
+            "pending": self._queue.qsize(),
+        }
+
+    # ---------------------------------------------------------
+    # 공개 API (모두 non-blocking)
+    # ---------------------------------------------------------
+    def log_point(self, vector: list, point_type: str, point_id: str, level: int):
+        """웹훅 등에서 포인트 1개를 기록"""
+        self._enqueue((str(point_id), point_type, level, vector))
+
+    def log_batch(self, items: list):
+        """Centroid 업데이트용: (vector, type, id, level) 목록"""
+        for vec, p_type, p_id, lvl in items:
+            self._enqueue((str(p_id), p_type, lvl, vec))
+
     def log_inference(self, post_vector: list, post_id: str, post_level: int, centroids: dict):
+        """Post 1개와 현재 Centroid들을 함께 기록 (화면에서 비교용)"""
+        self._enqueue((str(post_id), "post", post_level, post_vector))
+        for level, vector in (centroids or {}).items():
+            self._enqueue((f"curr_centroid_lv{level}", "current_centroid", int(level), vector))
+
+    def _enqueue(self, row: Row):
+        if self._closed:
+            self.dropped += 1
+            return
+        self.start()
         try:
-            self._ensure_init()
-            
-            # 테이블 컬럼 정의
-            table = wandb.Table(columns=["id", "type", "level", "embedding"])
-
-            # 1. 주인공 (Post) 추가
-            table.add_data(
-                str(post_id), 
-                "post", 
-                post_level, 
-                post_vector
-            )
+            self._queue.put_nowait(row)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"WandB 큐가 가득 차서 항목을 버립니다. (누적 {self.dropped}건)")
+
+    # ---------------------------------------------------------
+    # 백그라운드 스레드
+    # ---------------------------------------------------------
+    def start(self):
+        self._closed = False
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="wandb-logger", daemon=True)
+            self._thread.start()
 
-            # 2. 조연 (Current Centroids) 함께 추가
-            # 이걸 같이 넣어줘야 화면에서 비교가 됩니다.
-            if centroids:
-                for level, vector in centroids.items():
-                    table.add_data(
-                        f"curr_centroid_lv{level}", # ID로 현재 상태임을 표시
-                        "current_centroid",         # Type을 다르게 주어 모양 구분 가능
-                        int(level),
-                        vector
-                    )
-
-            # 전송
-            wandb.log({"santa_vectors": table})
-            
+    def close(self, timeout: float = 30.0):
+        """남은 항목을 전송하고 스레드를 종료합니다. (lifespan 종료 / 스크립트 끝에서 호출)"""
+        self._closed = True
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.sink.finish()
+        except Exception as e:
+            logger.error(f"WandB 종료 실패: {e}")
+
+    def _run(self):
+        while True:
+            rows = self._collect()
+            if rows:
+                self._send(rows)
+            elif self._stop.is_set():
+                return
+
+    def _collect(self) -> List[Row]:
+        """flush_interval 동안 (또는 max_batch 가 찰 때까지) 모읍니다. 종료 중이면 남은 것을 바로 비웁니다."""
+        rows: List[Row] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.max_batch:
+            if self._stop.is_set():
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # 종료 신호를 늦지 않게 보도록 짧게 끊어서 대기
+                rows.append(self._queue.get(timeout=min(remaining, 0.5)))
+            except queue.Empty:
+                continue
+        return rows
+
+    def _send(self, rows: List[Row]):
+        try:
+            self.sink.log_rows(rows)
+            self.logged += len(rows)
+            logger.info(f"WandB Batch 로깅 완료 ({len(rows)}건)")
         except Exception as e:
-            logger.error(f"WandB Inference 로깅 실패: {e}")
+            self.failed += len(rows)
+            logger.error(f"WandB Batch 로깅 실패: {e}")
+
 
-wandb_service = WandBService()
\ No newline at end of file
+wandb_service = WandBService(
+    max_queue=settings.WANDB_QUEUE_SIZE,
+    flush_interval=settings.WANDB_FLUSH_INTERVAL,
+    max_batch=settings.WANDB_MAX_BATCH,
+)
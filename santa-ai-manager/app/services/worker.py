@@ -1,52 +1,112 @@
 # app/services/worker.py
 
 import asyncio
-import json
 import logging
 from app.core.config import settings
-from app.core.connections import redis_client
 from app.services.modal_service import trigger_inference
 from app.services.centroid_service import CentroidService
+from app.services.queue_backend import QueueMessage, inference_queue, feedback_queue
+from app.services.inference_dispatcher import inference_dispatcher
+from app.services.inference_batcher import inference_batcher
 
 logger = logging.getLogger(__name__)
 centroid_service = CentroidService()
 
-async def start_worker():
-    logger.info(f"Worker 시작: [Inference: {settings.REDIS_QUEUE_NAME}, Feedback: {settings.REDIS_FEEDBACK_QUEUE_NAME}]")
-    
+# 이 프로세스에서 소비 중인 큐 (/internal/worker-stats 용)
+active_queues = {"inference": [], "feedback": []}
+
+WORKER_ROLES = ("all", "inference", "feedback")
+
+async def start_worker(role: str = "all", consumer_prefix: str = ""):
+    """
+    role: all / inference / feedback
+    consumer_prefix: 한 호스트에서 여러 프로세스를 띄울 때 stream consumer 이름 구분용 (예: "-p0")
+    """
+    if role not in WORKER_ROLES:
+        raise ValueError(f"알 수 없는 워커 역할: {role} (가능: {', '.join(WORKER_ROLES)})")
+    n_inference = settings.INFERENCE_CONSUMERS if role in ("all", "inference") else 0
+    n_feedback = settings.FEEDBACK_CONSUMERS if role in ("all", "feedback") else 0
+    logger.info(
+        f"Worker 시작 ({settings.QUEUE_BACKEND}, role={role}): "
+        f"[Inference x{n_inference}, Feedback x{n_feedback}]"
+    )
+
+    # consumer 마다 큐 객체를 따로 만듦 (stream 백엔드에서는 consumer 이름이 달라짐)
+    active_queues["inference"] = [inference_queue(f"{consumer_prefix}-inference-{i}") for i in range(n_inference)]
+    active_queues["feedback"] = [feedback_queue(f"{consumer_prefix}-feedback-{i}") for i in range(n_feedback)]
     await asyncio.gather(
-        watch_inference_queue(),
-        watch_feedback_queue()
+        *(watch_inference_queue(queue) for queue in active_queues["inference"]),
+        *(watch_feedback_queue(queue) for queue in active_queues["feedback"]),
     )
 
-async def watch_inference_queue():
+async def worker_stats() -> dict:
+    """큐 길이 / pending 과 추론 동시 실행 수 (워커가 없는 프로세스면 큐 길이만)"""
+    queues = {}
+    for role, make in (("inference", inference_queue), ("feedback", feedback_queue)):
+        consumers = active_queues[role] or [make()]
+        queues[role] = [await queue.stats() for queue in consumers]
+    return {
+        "queues": queues,
+        "inference_dispatch": inference_dispatcher.stats,
+        "inference_batch": inference_batcher.stats,
+    }
+
+async def _dispatch_inference(queue, message: QueueMessage):
+    # Modal 요청에 성공한 경우만 ACK (실패하면 pending 으로 남아 XAUTOCLAIM 으로 재시도)
+    if settings.INFERENCE_BATCH_SIZE > 1:
+        ok = await inference_batcher.submit(message.data)
+    else:
+        ok = await trigger_inference(message.data)
+    if ok:
+        await queue.ack([message.id])
+
+async def watch_inference_queue(queue=None):
     """기존: 추론 요청 처리"""
+    queue = queue or inference_queue()
     logger.info("Inference Queue 감시 시작...")
     while True:
+        # 동시 실행 슬롯이 빌 때까지 대기 (다 차 있으면 큐에서 꺼내지 않음)
+        slots = await inference_dispatcher.reserve(settings.QUEUE_READ_COUNT)
+        messages = []
         try:
-            job = await redis_client.blpop(settings.REDIS_QUEUE_NAME, timeout=1)
-            if job:
-                job_info = json.loads(job[1])
-                logger.info(f"[Inference] 작업 수신: {job_info.get('job_id')}")
-                asyncio.create_task(trigger_inference(job_info))
+            messages = await queue.read(slots, settings.QUEUE_BLOCK_MS)
+            for message in messages:
+                logger.info(f"[Inference] 작업 수신: {message.data.get('job_id')}")
+                inference_dispatcher.spawn(_dispatch_inference(queue, message))
+            if not messages:
+                # block 을 흉내만 내는 fake redis 에서도 다른 태스크가 돌 수 있도록 양보
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"[Inference] 에러: {e}")
             await asyncio.sleep(1)
-        await asyncio.sleep(0.01)
+        finally:
+            # 실제로 실행한 만큼을 뺀 나머지 슬롯 반환
+            inference_dispatcher.release(slots - len(messages))
 
-async def watch_feedback_queue():
+async def watch_feedback_queue(queue=None):
     """신규: 피드백 반영 및 전체 레벨 재조정"""
+    queue = queue or feedback_queue()
     logger.info("Feedback Queue 감시 시작...")
     while True:
         try:
-            job = await redis_client.blpop(settings.REDIS_FEEDBACK_QUEUE_NAME, timeout=1)
-            if job:
-                feedback_info = json.loads(job[1])
+            # 지금 쌓여 있는 피드백을 모두 꺼내서 한 번에 반영
+            messages = await queue.read(settings.FEEDBACK_DRAIN_MAX, settings.QUEUE_BLOCK_MS)
+            if not messages:
+                await asyncio.sleep(0)
+                continue
+
+            feedbacks = [message.data for message in messages]
+            for feedback_info in feedbacks:
                 logger.info(f"[Feedback] 피드백 수신: Post {feedback_info.get('job_id')} -> Level {feedback_info.get('level')}")
-                
-                await centroid_service.process_feedback_job(feedback_info)
-                
+
+            await centroid_service.process_feedback_batch(feedbacks)
+            # 반영이 끝난 뒤에 ACK (중간에 죽으면 다른 consumer 가 회수)
+            await queue.ack([message.id for message in messages])
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"[Feedback] 에러: {e}")
             await asyncio.sleep(1)
-        await asyncio.sleep(0.01)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import time
+import asyncio
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.ingest_service import persist_results
+
+logger = logging.getLogger(__name__)
+
+# stop() 이 넣는 표식: max_delay 를 기다리지 않고 모인 항목을 바로 flush
+_FLUSH_NOW = object()
+
+
+class WriteBehindBuffer:
+    """
+    웹훅 결과를 모아서 한 번에 저장하는 write-behind 버퍼 (opt-in).
+    - 최대 max_items 건 또는 max_delay_ms 가 지나면 flush
+    - 버퍼는 max_pending 으로 제한되며, 가득 차면 submit 이 대기합니다 (backpressure)
+    - submit 은 해당 건이 실제로 저장(커밋)된 뒤에 반환됩니다 (건별 ack)
+    """
+
+    def __init__(self, max_items: int, max_delay_ms: int, max_pending: int):
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Write-behind 버퍼 시작 (max_items={self.max_items}, max_delay={self.max_delay}s)")
+
+    async def submit(self, post_id: int, vector: Sequence[float], level: int, bound: Optional[float] = None):
+        """저장이 끝날 때까지 기다립니다. 저장 실패 시 예외가 그대로 올라옵니다."""
+        if self._closing or not self.running:
+            raise RuntimeError("Write-behind 버퍼가 동작 중이 아닙니다.")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((post_id, vector, level, bound), future))
+        return await future
+
+    async def stop(self):
+        """새 요청을 막고, 남은 항목을 모두 flush 한 뒤 종료합니다. (lifespan 종료 시 호출)"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_FLUSH_NOW)
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Write-behind 버퍼 종료 (잔여 항목 flush 완료)")
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is _FLUSH_NOW:
+                self._queue.task_done()
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _FLUSH_NOW:
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        entries = [entry for entry, _ in batch]
+        try:
+            await persist_results(entries)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        except Exception as e:
+            logger.error(f"Write-behind flush 실패 ({len(batch)}건): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+
+write_behind = WriteBehindBuffer(
+    max_items=settings.WRITE_BEHIND_MAX_ITEMS,
+    max_delay_ms=settings.WRITE_BEHIND_MAX_DELAY_MS,
+    max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+)
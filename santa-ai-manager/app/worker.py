@@ -0,0 +1,109 @@
+# app/worker.py
+# API 와 분리된 독립 워커 (큐 소비 / 피드백 반영 / 재계산)
+#
+# 사용법:
+#   python -m app.worker                          # 1개 프로세스, 모든 역할
+#   python -m app.worker --processes 4 --role inference
+#   python -m app.worker --role feedback
+# API 쪽은 EMBEDDED_WORKER_ENABLED=false 로 두면 큐를 소비하지 않습니다.
+import os
+import signal
+import asyncio
+import logging
+import argparse
+import multiprocessing as mp
+
+from app.core.config import settings
+from app.core.connections import close_connections
+from app.services.worker import start_worker, centroid_service, WORKER_ROLES
+from app.services.centroid_cache import centroid_cache
+from app.services.wandb_service import wandb_service
+from app.services.embedding_mirror import embedding_mirror, run_mirror_reconciliation
+from app.services.inference_dispatcher import inference_dispatcher
+from app.services.inference_batcher import inference_batcher
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(role: str, index: int = 0):
+    """한 프로세스의 워커 수명주기 (FastAPI lifespan 과 같은 순서로 시작/정리)"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    centroid_cache.start()
+    # 미러는 재계산을 하는 역할에서만 사용. 웹훅을 받지 않으므로 Qdrant 와의 정합성 맞춤으로 채우고,
+    # --processes N 이면 meta.json / 행을 서로 덮어쓰지 않도록 프로세스마다 디렉터리를 따로 둠
+    mirror_task = None
+    if settings.MIRROR_ENABLED and role != "inference":
+        embedding_mirror.path = os.path.join(settings.MIRROR_DIR, f"worker-{index}")
+        embedding_mirror.open()
+        mirror_task = asyncio.create_task(run_mirror_reconciliation())
+    wandb_service.start()
+
+    worker_task = asyncio.create_task(start_worker(role, consumer_prefix=f"-p{index}"))
+    stop_task = asyncio.create_task(stop.wait())
+    await asyncio.wait([worker_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+    logger.info(f"워커 종료 중... (role={role}, process={index})")
+
+    # 더 꺼내지 않도록 소비 루프부터 멈추고, 실행 중인 작업을 마무리
+    stop_task.cancel()
+    worker_task.cancel()
+    await asyncio.gather(worker_task, stop_task, return_exceptions=True)
+    await inference_dispatcher.drain(settings.WORKER_DRAIN_TIMEOUT)
+    await inference_batcher.stop()
+    # 백그라운드 재계산이 닫힌 연결을 쓰지 않도록 먼저 중단
+    await centroid_service.cancel_recalculation()
+    await asyncio.to_thread(centroid_service.close)
+    if mirror_task is not None:
+        mirror_task.cancel()
+        await asyncio.gather(mirror_task, return_exceptions=True)
+        embedding_mirror.close()
+    await centroid_cache.stop()
+    await asyncio.to_thread(wandb_service.close)
+    await close_connections()
+
+
+def _process_main(role: str, index: int):
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [worker-{index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run_worker(role, index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Santa AI 독립 워커")
+    parser.add_argument("--processes", type=int, default=1, help="워커 프로세스 수")
+    parser.add_argument("--role", choices=WORKER_ROLES, default=settings.WORKER_ROLE)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _process_main(args.role, 0)
+        return
+
+    # 자식은 spawn 으로 띄워서 연결 / 스레드를 각자 새로 만듦
+    ctx = mp.get_context("spawn")
+    children = [
+        ctx.Process(target=_process_main, args=(args.role, i), name=f"santa-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for child in children:
+        child.start()
+
+    # 부모가 받은 종료 신호를 자식에게 전달 (자식은 각자 graceful 종료)
+    def _forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+
+    for child in children:
+        child.join()
+    failed = [c.name for c in children if c.exitcode not in (0, -signal.SIGTERM)]
+    if failed:
+        raise SystemExit(f"비정상 종료된 워커: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# embedding: SigLIP 임베딩 공용 패키지 (Modal 이미지에 add_local_python_source 로 포함)
+from embedding.engine import EmbeddingEngine, get_engine, fuse_vectors, DEFAULT_MODEL_NAME
+
+__all__ = ["EmbeddingEngine", "get_engine", "fuse_vectors", "DEFAULT_MODEL_NAME"]
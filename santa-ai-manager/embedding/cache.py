@@ -0,0 +1,394 @@
+# embedding/cache.py
+# 임베딩 캐시 (같은 이미지 URL / 같은 텍스트는 다시 인코딩하지 않음)
+# - 키: sha256(종류 + 모델 이름 + 가중치 버전 + URL 또는 텍스트)
+#   -> siglip_best.pth 가 바뀌면 weights_version 이 바뀌므로 이전 항목은 자동으로 무시되고 LRU 로 밀려남
+# - 값: float16 little-endian 바이트 (SigLIP 1152 차원 기준 항목당 2.3KB)
+# - 백엔드: EMBED_CACHE_BACKEND = disk | redis | off
+#
+# 사용법:
+#   python -m embedding.cache            # tiny 모델로 hit / miss / 가중치 교체 / LRU 제거 확인
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.environ.get("EMBED_CACHE_BACKEND", "disk")
+CACHE_DIR = os.environ.get("EMBED_CACHE_DIR", "/tmp/santa-embed-cache")
+CACHE_MAX_MB = int(os.environ.get("EMBED_CACHE_MAX_MB", 2048))            # disk
+CACHE_MAX_ITEMS = int(os.environ.get("EMBED_CACHE_MAX_ITEMS", 200000))    # redis
+CACHE_REDIS_PREFIX = os.environ.get("EMBED_CACHE_REDIS_PREFIX", "embed:cache")
+
+_DTYPE = np.dtype("<f2")
+
+
+# ---------------------------------------------------------
+# 백엔드 (bytes 저장소 + LRU)
+# ---------------------------------------------------------
+class DiskBackend:
+    """
+    디렉터리에 키별 파일로 저장합니다. 읽을 때 mtime 을 갱신하고,
+    전체 크기가 max_bytes 를 넘으면 mtime 이 오래된 파일부터 지웁니다. (90% 까지)
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> size (오래 안 쓴 순서)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        values = []
+        for key in keys:
+            try:
+                with open(self._path(key), "rb") as f:
+                    values.append(f.read())
+                os.utime(self._path(key))
+            except OSError:
+                values.append(None)
+                continue
+            with self._lock:
+                if key in self._index:
+                    self._index.move_to_end(key)
+        return values
+
+    def put_many(self, items: Dict[str, bytes]):
+        for key, value in items.items():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 다른 컨테이너가 같은 볼륨을 읽고 있을 수 있으므로 tmp 에 쓰고 rename
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+            with self._lock:
+                self._size += len(value) - self._index.pop(key, 0)
+                self._index[key] = len(value)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            victims = []
+            while self._index and self._size > self.max_bytes * 0.9:
+                key, size = self._index.popitem(last=False)
+                self._size -= size
+                victims.append(key)
+            self.evictions += len(victims)
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    @property
+    def stats(self) -> dict:
+        return {"backend": "disk", "items": len(self._index), "bytes": self._size, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """
+    Redis 에 <prefix>:<key> 로 저장하고, <prefix>:lru (sorted set, score=마지막 사용 시각) 로
+    max_items 개를 넘으면 오래 안 쓴 항목부터 지웁니다. 여러 컨테이너가 같은 캐시를 공유합니다.
+    """
+
+    def __init__(self, client, prefix: str, max_items: int):
+        self.redis = client
+        self.prefix = prefix
+        self.lru = f"{prefix}:lru"
+        self.max_items = max_items
+        self.evictions = 0
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        values = self.redis.mget([f"{self.prefix}:{k}" for k in keys])
+        hits = {k: time.time() for k, v in zip(keys, values) if v is not None}
+        if hits:
+            self.redis.zadd(self.lru, hits)
+        return values
+
+    def put_many(self, items: Dict[str, bytes]):
+        if not items:
+            return
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.mset({f"{self.prefix}:{k}": v for k, v in items.items()})
+        pipe.zadd(self.lru, {k: now for k in items})
+        pipe.zcard(self.lru)
+        size = pipe.execute()[-1]
+
+        if size > self.max_items:
+            victims = [k.decode() if isinstance(k, bytes) else k for k, _ in self.redis.zpopmin(self.lru, size - self.max_items)]
+            if victims:
+                self.redis.delete(*[f"{self.prefix}:{k}" for k in victims])
+                self.evictions += len(victims)
+
+    @property
+    def stats(self) -> dict:
+        return {"backend": "redis", "items": self.redis.zcard(self.lru), "evictions": self.evictions}
+
+
+# ---------------------------------------------------------
+# 캐시
+# ---------------------------------------------------------
+class EmbeddingCache:
+    """backend 가 None 이면 항상 miss (캐시 끔). 호출 측 코드는 그대로 사용"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        # 파이프라인 다운로드 스레드(image_vectors)와 호출 스레드(embed_posts)가 동시에 갱신
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, stores = self.hits, self.misses, self.stores
+        lookups = hits + misses
+        info = {
+            "hits": hits,
+            "misses": misses,
+            "stores": stores,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.backend is not None:
+            info.update(self.backend.stats)
+        return info
+
+    # ---------------------------------------------------------
+    # 키 / 직렬화
+    # ---------------------------------------------------------
+    @staticmethod
+    def _key(kind: str, engine, value: str) -> str:
+        h = hashlib.sha256()
+        for part in (kind, engine.model_name, engine.weights_version, value):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def image_key(self, engine, url: str) -> str:
+        return self._key("image", engine, url)
+
+    def text_key(self, engine, text: str) -> str:
+        # 패딩 방식에 따라 SigLIP 텍스트 벡터가 달라지므로 키에 포함
+        return self._key("text", engine, f"{engine.text_padding}\0{text}")
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        if self.backend is None:
+            self._count(misses=len(keys))
+            return [None] * len(keys)
+        try:
+            raw = self.backend.get_many(keys)
+        except Exception as e:
+            # 캐시 장애로 임베딩이 실패하면 안 되므로 miss 로 처리
+            logger.warning(f"임베딩 캐시 조회 실패: {e}")
+            raw = [None] * len(keys)
+        vectors = [np.frombuffer(v, dtype=_DTYPE).astype(np.float32) if v else None for v in raw]
+        hit = sum(v is not None for v in vectors)
+        self._count(hits=hit, misses=len(vectors) - hit)
+        return vectors
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if self.backend is None or not items:
+            return
+        try:
+            self.backend.put_many({k: np.ascontiguousarray(v, dtype=_DTYPE).tobytes() for k, v in items.items()})
+            self._count(stores=len(items))
+        except Exception as e:
+            logger.warning(f"임베딩 캐시 저장 실패: {e}")
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    # ---------------------------------------------------------
+    # 엔진 연동
+    # ---------------------------------------------------------
+    def image_vectors(self, engine, urls: Sequence[str]) -> Dict[str, np.ndarray]:
+        """캐시에 있는 이미지 벡터만 {url: vector} 로 반환합니다. (나머지만 다운로드하면 됨)"""
+        unique = list(dict.fromkeys(urls))
+        vectors = self.get_many([self.image_key(engine, u) for u in unique])
+        return {u: v for u, v in zip(unique, vectors) if v is not None}
+
+    def put_images(self, engine, vectors: Dict[str, np.ndarray]):
+        """다른 곳에서 인코딩한 이미지 벡터 {url: vector} 를 저장합니다. (embedding/pipeline.py)"""
+        self.put_many({self.image_key(engine, u): v for u, v in vectors.items() if v is not None})
+
+    def embed_posts(
+        self,
+        engine,
+        posts: Sequence[Tuple[Sequence[str], Dict[str, np.ndarray], Dict[str, object], Optional[str]]],
+    ) -> List[Optional[np.ndarray]]:
+        """
+        posts: [(urls, 캐시된 이미지 벡터 {url: vector}, 새로 받은 이미지 {url: PIL 이미지}, content), ...]
+        새 이미지 / 캐시에 없는 텍스트만 배치로 인코딩해서 캐시에 저장하고,
+        게시물별로 URL 순서대로 모아 engine.embed_posts 와 같은 방식으로 통합합니다.
+        """
+        from embedding.engine import fuse_vectors
+
+        # 이미지: 게시물 경계를 넘어 한 번에 인코딩
+        new_urls, new_images = [], []
+        for _, _, images, _ in posts:
+            for url, img in images.items():
+                if img is not None:
+                    new_urls.append(url)
+                    new_images.append(img)
+        encoded = dict(zip(new_urls, engine.encode_images(new_images)))
+        self.put_many({self.image_key(engine, u): v for u, v in encoded.items()})
+
+        # 텍스트: 캐시 조회 후 없는 것만 인코딩
+        texts = list(dict.fromkeys(c for _, _, _, c in posts if c and isinstance(c, str) and c.strip()))
+        text_keys = [self.text_key(engine, t) for t in texts]
+        text_vectors = dict(zip(texts, self.get_many(text_keys)))
+        missing = [t for t in texts if text_vectors[t] is None]
+        if missing:
+            fresh = engine.encode_texts(missing)
+            text_vectors.update(zip(missing, fresh))
+            self.put_many({self.text_key(engine, t): v for t, v in zip(missing, fresh)})
+
+        results = []
+        for urls, cached, _, content in posts:
+            vectors = []
+            for url in urls:
+                vec = cached.get(url)
+                if vec is None:
+                    vec = encoded.get(url)
+                if vec is not None:
+                    vectors.append(vec)
+            if content in text_vectors:
+                vectors.append(text_vectors[content])
+            results.append(fuse_vectors(vectors))
+        return results
+
+    def embed_urls(self, engine, fetcher, posts: Sequence[Tuple[Sequence[str], Optional[str]]]) -> List[Optional[np.ndarray]]:
+        """[(image_urls, content), ...] -> 통합 벡터 목록. 캐시에 없는 이미지만 동시에 다운로드합니다."""
+        cached = [self.image_vectors(engine, urls or []) for urls, _ in posts]
+        missing = list(dict.fromkeys(u for (urls, _), hits in zip(posts, cached) for u in urls or [] if u not in hits))
+        fetched = dict(zip(missing, fetcher.fetch_all(missing)))
+        return self.embed_posts(
+            engine,
+            [
+                (urls or [], hits, {u: fetched[u] for u in urls or [] if u in fetched}, content)
+                for (urls, content), hits in zip(posts, cached)
+            ],
+        )
+
+
+def create_backend(kind: str = CACHE_BACKEND):
+    if kind == "off":
+        return None
+    if kind == "disk":
+        return DiskBackend(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024)
+    if kind == "redis":
+        import redis
+        from urllib.parse import quote
+
+        host = os.environ.get("REDIS_HOST", "localhost")
+        port = int(os.environ.get("REDIS_PORT", 6379))
+        password = os.environ.get("REDIS_PASSWORD")
+        if password:
+            # app/core/connections.py 와 같은 설정: 비밀번호가 있으면 SSL(rediss://) (AWS ElastiCache)
+            client = redis.Redis.from_url(f"rediss://:{quote(password, safe='')}@{host}:{port}", ssl_cert_reqs=None)
+        else:
+            client = redis.Redis(host=host, port=port)
+        return RedisBackend(client, CACHE_REDIS_PREFIX, CACHE_MAX_ITEMS)
+    raise ValueError(f"알 수 없는 EMBED_CACHE_BACKEND: {kind}")
+
+
+# 프로세스당 1개
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                backend = create_backend()
+            except Exception as e:
+                # 캐시를 못 쓰더라도 임베딩은 계속
+                logger.warning(f"임베딩 캐시 초기화 실패, 캐시 없이 진행: {e}")
+                backend = None
+            _cache = EmbeddingCache(backend)
+        return _cache
+
+
+# ---------------------------------------------------------
+# 동작 확인 (tiny 모델, 로컬 http.server)
+# ---------------------------------------------------------
+def main():
+    import tempfile
+    import torch
+    from embedding.engine import get_engine
+    from embedding.fetcher import ImageFetcher, _serve_images
+    from embedding.tiny import build_tiny_model
+
+    root = tempfile.mkdtemp(prefix="embed-cache-")
+    engine = get_engine(build_tiny_model(os.path.join(root, "model")), os.path.join(root, "siglip_best.pth"), device="cpu")
+    server = _serve_images(40, 0.0)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    posts = [([f"{base}/{i}.jpg", f"{base}/{i + 1}.jpg"], f"post {i % 5}") for i in range(20)]
+    fetcher = ImageFetcher(max_workers=8)
+
+    cache = EmbeddingCache(DiskBackend(os.path.join(root, "cache"), 1024 * 1024))
+    reference = engine.embed_posts([(fetcher.fetch_all(urls), content) for urls, content in posts])
+
+    for label in ("1회차 (cold)", "2회차 (warm)"):
+        before = dict(fetcher.stats)
+        started = time.perf_counter()
+        vectors = cache.embed_urls(engine, fetcher, posts)
+        elapsed = time.perf_counter() - started
+        diff = max(float(np.abs(a - b).max()) for a, b in zip(vectors, reference))
+        print(f"{label}: {elapsed:.3f}s, 다운로드 {fetcher.stats['fetched'] - before['fetched']}건, "
+              f"기준 대비 최대 오차 {diff:.4f} (float16), stats={cache.stats}")
+
+    # 가중치 교체 -> 키가 바뀌어 전부 miss
+    torch.save({k: v + 0.01 for k, v in engine.model.state_dict().items() if v.is_floating_point()}, engine.weights_path)
+    engine.maybe_reload()
+    cache.hits = cache.misses = 0
+    cache.embed_urls(engine, fetcher, posts)
+    print(f"가중치 교체 후: version={engine.weights_version}, stats={cache.stats}")
+
+    # LRU: 용량을 줄이면 오래 안 쓴 항목부터 제거
+    small = DiskBackend(os.path.join(root, "cache"), 40 * 64)
+    small._evict()
+    print(f"용량 축소 후: {small.stats}")
+
+    fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
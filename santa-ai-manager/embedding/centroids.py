@@ -0,0 +1,37 @@
+# embedding/centroids.py
+# 배치 Centroid 재산출용 레벨별 누적 합 (modal_batch.py)
+# 게시물 벡터를 모아두지 않고 레벨마다 float64 합 / 개수만 유지하므로 메모리 = 레벨 수 x 차원
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+class LevelSums:
+    def __init__(self, levels: Iterable[int]):
+        self.counts: Dict[int, int] = {int(lvl): 0 for lvl in levels}
+        self.sums: Dict[int, np.ndarray] = {}
+
+    def add(self, level: int, vector) -> bool:
+        """범위 밖 레벨은 무시하고 False 를 반환합니다."""
+        level = int(level)
+        if level not in self.counts:
+            return False
+        vector = np.asarray(vector, dtype=np.float64)
+        if level not in self.sums:
+            self.sums[level] = np.zeros(vector.shape[-1], dtype=np.float64)
+        self.sums[level] += vector
+        self.counts[level] += 1
+        return True
+
+    def centroids(self) -> Dict[str, list]:
+        """
+        {레벨 문자열: 단위벡터(float32 리스트)}. 게시물이 없는 레벨은 빠집니다.
+        합 / 개수 = 평균 -> 단위벡터화 (평균 방향은 합의 방향과 같음)
+        """
+        result = {}
+        for level, count in self.counts.items():
+            if count == 0:
+                continue
+            mean_v = self.sums[level] / count
+            result[str(level)] = (mean_v / np.linalg.norm(mean_v)).astype(np.float32).tolist()
+        return result
@@ -0,0 +1,209 @@
+# embedding/engine.py
+# SigLIP 임베딩 엔진 (Modal run_inference / run_inference_batch / run_batch_recalculation 공용)
+# - 모델 / 프로세서 / 학습된 가중치를 프로세스당 한 번만 로드
+# - 가중치 파일(siglip_best.pth)이 바뀌면 다음 요청 때 state_dict 만 다시 로드 (hot-swap)
+import os
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "google/siglip-so400m-patch14-384"
+
+# 한 번의 forward 에 넣는 최대 개수 (T4 16GB 기준, so400m 384px)
+IMAGE_BATCH_SIZE = int(os.environ.get("EMBED_IMAGE_BATCH_SIZE", 32))
+TEXT_BATCH_SIZE = int(os.environ.get("EMBED_TEXT_BATCH_SIZE", 64))
+# "max_length": SigLIP 학습 방식 (기존 centroid 와 같은 벡터), "longest": 배치 내 가장 긴 문장까지만 패딩
+TEXT_PADDING = os.environ.get("EMBED_TEXT_PADDING", "max_length")
+
+
+def _as_numpy(output) -> np.ndarray:
+    """get_*_features 결과 (transformers 버전에 따라 Tensor 또는 pooler_output 을 가진 객체)"""
+    if not hasattr(output, "cpu"):
+        output = output.pooler_output
+    return output.detach().float().cpu().numpy()
+
+
+def fuse_vectors(vectors: Sequence[np.ndarray]) -> Optional[np.ndarray]:
+    """게시물 하나의 이미지 / 텍스트 벡터를 평균 후 단위벡터화. 벡터가 없으면 None"""
+    if len(vectors) == 0:
+        return None
+    # 모든 벡터 평균
+    combined = np.mean(vectors, axis=0)
+
+    # L2 정규화: 벡터의 길이를 1로 변환
+    norm = np.linalg.norm(combined)
+    return combined / norm if norm > 0 else combined
+
+
+class EmbeddingEngine:
+    """
+    - model_name: HuggingFace 모델 이름 또는 로컬 디렉터리 (테스트용 tiny 모델 포함)
+    - weights_path: 파인튜닝 가중치(state_dict). 없으면 기본 가중치 그대로 사용
+    - weights_version: 가중치 파일의 (mtime, size). 캐시 키 등에 사용
+    - image_batch_size / text_batch_size / text_padding: 인코딩 배치 설정 (기본값은 EMBED_* 환경변수)
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, weights_path: Optional[str] = None, device: Optional[str] = None):
+        import torch
+
+        self.model_name = model_name
+        self.weights_path = weights_path
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.image_batch_size = IMAGE_BATCH_SIZE
+        self.text_batch_size = TEXT_BATCH_SIZE
+        self.text_padding = TEXT_PADDING
+        self.processor = None
+        self.model = None
+        self.weights_version = "base"
+        self._weights_stat = None
+        self._lock = threading.RLock()
+        self.reloads = 0
+
+    # ---------------------------------------------------------
+    # 로드 / hot-swap
+    # ---------------------------------------------------------
+    def load(self) -> "EmbeddingEngine":
+        with self._lock:
+            if self.model is not None:
+                return self
+            from transformers import AutoModel, AutoProcessor
+
+            logger.info(f"SigLIP 모델 로딩 중... ({self.model_name}, device={self.device})")
+            self.processor = AutoProcessor.from_pretrained(self.model_name)
+            self.model = AutoModel.from_pretrained(self.model_name).to(self.device)
+            self.model.eval()
+            self._load_weights()
+        return self
+
+    def _stat(self):
+        if not self.weights_path or not os.path.exists(self.weights_path):
+            return None
+        st = os.stat(self.weights_path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load_weights(self):
+        import torch
+
+        stat = self._stat()
+        if stat is None:
+            self._weights_stat = None
+            self.weights_version = "base"
+            return
+        logger.info(f"학습된 가중치 로드: {self.weights_path}")
+        state_dict = torch.load(self.weights_path, map_location=self.device)
+        self.model.load_state_dict(state_dict, strict=False)
+        self._weights_stat = stat
+        self.weights_version = f"{stat[0]}-{stat[1]}"
+
+    def maybe_reload(self) -> bool:
+        """가중치 파일이 바뀌었으면 다시 로드합니다. (요청 시작마다 호출, stat 1번이라 가벼움)"""
+        with self._lock:
+            if self.model is None:
+                self.load()
+                return False
+            stat = self._stat()
+            # 파일이 잠깐 없어진 경우(업로드 중 등)에는 지금 가중치를 유지
+            if stat is None or stat == self._weights_stat:
+                return False
+            self._load_weights()
+            self.reloads += 1
+            logger.info(f"가중치 변경 감지, 다시 로드했습니다. (version={self.weights_version})")
+            return True
+
+    # ---------------------------------------------------------
+    # 인코딩
+    # ---------------------------------------------------------
+    def encode_images(self, images: List) -> np.ndarray:
+        """PIL 이미지 목록 -> (N, D). image_batch_size 개씩 묶어서 forward"""
+        self.load()
+        if not images:
+            return np.zeros((0, 0), dtype=np.float32)
+        chunks = []
+        for i in range(0, len(images), self.image_batch_size):
+            inputs = self.processor(images=images[i:i + self.image_batch_size], return_tensors="np")
+            chunks.append(self.encode_pixels(inputs["pixel_values"]))
+        return np.concatenate(chunks)
+
+    def encode_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        """전처리가 끝난 pixel_values (N, C, H, W) -> (N, D). 전처리를 다른 프로세스에서 할 때 사용"""
+        import torch
+
+        self.load()
+        chunks = []
+        for i in range(0, len(pixel_values), self.image_batch_size):
+            batch = torch.from_numpy(np.ascontiguousarray(pixel_values[i:i + self.image_batch_size])).to(self.device)
+            with torch.no_grad():
+                chunks.append(_as_numpy(self.model.get_image_features(pixel_values=batch)))
+        return np.concatenate(chunks).astype(np.float32, copy=False)
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        텍스트 목록 -> (N, D). text_batch_size 개씩 묶어서 forward
+        길이순으로 정렬해 묶으므로 text_padding="longest" 일 때 배치별 패딩이 최소가 됩니다.
+        """
+        import torch
+
+        self.load()
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for i in range(0, len(order), self.text_batch_size):
+            idx = order[i:i + self.text_batch_size]
+            inputs = self.processor(
+                text=[texts[j] for j in idx], padding=self.text_padding, truncation=True, return_tensors="pt"
+            ).to(self.device)
+            with torch.no_grad():
+                out = _as_numpy(self.model.get_text_features(**inputs))
+            for j, vec in zip(idx, out):
+                vectors[j] = vec
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_posts(self, posts: Sequence[Tuple[List, Optional[str]]]) -> List[Optional[np.ndarray]]:
+        """
+        여러 게시물 [(images, content), ...] 의 통합 벡터 목록.
+        모든 게시물의 이미지 / 텍스트를 모아 배치로 인코딩한 뒤 게시물별로 다시 나눠 평균 + 단위벡터화합니다.
+        """
+        images, image_owner = [], []
+        texts, text_owner = [], []
+        for n, (post_images, content) in enumerate(posts):
+            for img in post_images or []:
+                images.append(img)
+                image_owner.append(n)
+            if content and isinstance(content, str) and content.strip():
+                texts.append(content)
+                text_owner.append(n)
+
+        per_post = [[] for _ in posts]
+        # 기존 순서 유지: 이미지 벡터 다음 텍스트 벡터
+        for n, vec in zip(image_owner, self.encode_images(images)):
+            per_post[n].append(vec)
+        for n, vec in zip(text_owner, self.encode_texts(texts)):
+            per_post[n].append(vec)
+        return [fuse_vectors(vectors) for vectors in per_post]
+
+    def embed_post(self, images: List, content: Optional[str]) -> Optional[np.ndarray]:
+        """게시물 하나의 통합 벡터 (이미지 + 텍스트 평균 후 단위벡터화)"""
+        return self.embed_posts([(images, content)])[0]
+
+
+# 프로세스당 1개 (Modal 컨테이너가 재사용되면 다음 호출에서도 그대로 사용)
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(model_name: str = DEFAULT_MODEL_NAME, weights_path: Optional[str] = None, device: Optional[str] = None) -> EmbeddingEngine:
+    """같은 설정의 엔진을 재사용합니다. 가중치가 바뀌었으면 여기서 다시 로드됩니다."""
+    key = (model_name, weights_path, device)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = EmbeddingEngine(model_name, weights_path, device)
+            _engines[key] = engine
+    engine.load()
+    engine.maybe_reload()
+    return engine
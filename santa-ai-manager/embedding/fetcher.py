@@ -0,0 +1,252 @@
+# embedding/fetcher.py
+# 이미지 다운로드 (공용 커넥션 풀 세션 + 스레드 풀 + 호스트별 동시 요청 제한)
+#
+# 사용법:
+#   python -m embedding.fetcher           # 로컬 http.server 로 순차 requests.get 과 비교 벤치마크
+import time
+import logging
+import threading
+from io import BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class ImageFetcher:
+    """
+    - max_workers: 전체 동시 다운로드 수 (= 스레드 수 = 세션 커넥션 풀 크기)
+    - per_host: 같은 호스트로 동시에 보내는 최대 요청 수 (S3 / CDN 과부하 방지)
+    - timeout: 요청 타임아웃 (초)
+    - max_bytes: 이보다 큰 응답은 중간에 끊고 실패 처리
+    다운로드와 디코드(PIL)는 모두 풀 스레드에서 처리되고, 호출 측은 완성된 RGB 이미지만 받습니다.
+    """
+
+    def __init__(self, max_workers: int = 16, per_host: int = 4, timeout: float = 10.0, max_bytes: int = 20 * 1024 * 1024):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fetch")
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+        # 모니터링용 카운터
+        self.fetched = 0
+        self.failed = 0
+        self.too_large = 0
+        self.bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        return {"fetched": self.fetched, "failed": self.failed, "too_large": self.too_large, "bytes": self.bytes}
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    # ---------------------------------------------------------
+    # 단건
+    # ---------------------------------------------------------
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            sem = self._host_limits.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_host)
+                self._host_limits[host] = sem
+            return sem
+
+    def fetch_bytes(self, url: str) -> bytes:
+        with self._host_limit(url):
+            with self.session.get(url, timeout=self.timeout, stream=True) as res:
+                res.raise_for_status()
+                length = res.headers.get("Content-Length")
+                if length and int(length) > self.max_bytes:
+                    raise ImageTooLarge(f"{url}: {length} bytes > {self.max_bytes}")
+
+                buf = BytesIO()
+                for chunk in res.iter_content(chunk_size=64 * 1024):
+                    buf.write(chunk)
+                    if buf.tell() > self.max_bytes:
+                        raise ImageTooLarge(f"{url}: > {self.max_bytes} bytes")
+                return buf.getvalue()
+
+    def fetch_raw(self, url: str) -> Optional[bytes]:
+        """다운로드만. 실패하면 None (디코드는 호출 측에서, 예: embedding/pipeline.py 의 프로세스 풀)"""
+        try:
+            data = self.fetch_bytes(url)
+        except ImageTooLarge as e:
+            self._count(failed=1, too_large=1)
+            logger.warning(f"이미지 크기 초과로 건너뜀: {e}")
+            return None
+        except Exception as e:
+            self._count(failed=1)
+            logger.warning(f"이미지 다운로드 실패: {url} ({e})")
+            return None
+
+        self._count(fetched=1, bytes=len(data))
+        return data
+
+    def fetch(self, url: str):
+        """다운로드 + 디코드. 실패하면 None (기존 코드처럼 해당 이미지만 건너뜀)"""
+        from PIL import Image
+
+        data = self.fetch_raw(url)
+        if data is None:
+            return None
+        try:
+            return Image.open(BytesIO(data)).convert("RGB")
+        except Exception as e:
+            self._count(fetched=-1, failed=1)
+            logger.warning(f"이미지 디코드 실패: {url} ({e})")
+            return None
+
+    def submit(self, fn, *args):
+        """다운로드 스레드 풀에서 fn 실행 (파이프라인 등에서 사용)"""
+        return self._pool.submit(fn, *args)
+
+    def _count(self, **deltas):
+        # 풀 스레드 여러 개가 동시에 갱신
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    # ---------------------------------------------------------
+    # 여러 건
+    # ---------------------------------------------------------
+    def fetch_all(self, urls: Sequence[str]) -> List:
+        """입력 순서대로 이미지 목록 (실패한 항목은 None)"""
+        return [f.result() for f in [self._pool.submit(self.fetch, url) for url in urls]]
+
+    def iter_completed(self, urls: Sequence[str]) -> Iterator[Tuple[int, object]]:
+        """도착하는 순서대로 (index, image) - 받는 즉시 인코더로 넘길 때 사용"""
+        futures = {self._pool.submit(self.fetch, url): i for i, url in enumerate(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def iter_posts(self, url_lists: Sequence[Sequence[str]], lookahead: int = 8, keep_failed: bool = False) -> Iterator[List]:
+        """
+        게시물별 URL 목록을 받아 게시물 순서대로 이미지 목록(실패 제외)을 돌려줍니다.
+        현재 게시물을 인코딩하는 동안 다음 lookahead 개 게시물의 다운로드가 미리 진행됩니다.
+        keep_failed=True 면 실패한 자리에 None 을 남겨 URL 목록과 길이를 맞춥니다.
+        url_lists 는 제너레이터여도 되며, 앞선 게시물이 끝날 때마다 하나씩 더 꺼냅니다.
+        """
+        window: deque = deque()
+        source = iter(url_lists)
+
+        def _submit_next() -> bool:
+            urls = next(source, None)
+            if urls is None:
+                return False
+            window.append([self._pool.submit(self.fetch, url) for url in urls or []])
+            return True
+
+        for _ in range(max(1, lookahead)):
+            if not _submit_next():
+                break
+        while window:
+            futures = window.popleft()
+            _submit_next()
+            images = [f.result() for f in futures]
+            yield images if keep_failed else [img for img in images if img is not None]
+
+
+# 프로세스당 1개 (세션 / 커넥션 재사용)
+_fetcher: Optional[ImageFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher(**kwargs) -> ImageFetcher:
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ImageFetcher(**kwargs)
+        return _fetcher
+
+
+# ---------------------------------------------------------
+# 벤치마크 (로컬 http.server)
+# ---------------------------------------------------------
+def _serve_images(n_images: int, latency: float):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from embedding.tiny import random_image
+
+    images = []
+    for i in range(n_images):
+        buf = BytesIO()
+        random_image(i, size=(384, 384)).save(buf, format="JPEG")
+        images.append(buf.getvalue())
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)   # 원격 스토리지 왕복 지연 흉내
+            body = images[int(self.path.strip("/").split(".")[0]) % n_images]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    import argparse
+    import requests
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="이미지 다운로드 벤치마크")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.03, help="요청당 서버 지연 (초)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-host", type=int, default=8)
+    args = parser.parse_args()
+
+    server = _serve_images(args.images, args.latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{i}.jpg" for i in range(args.images)]
+
+    # 기존 방식: 건별 requests.get (세션 재사용 없음, 순차)
+    started = time.perf_counter()
+    for url in urls:
+        res = requests.get(url, timeout=10)
+        Image.open(BytesIO(res.content)).convert("RGB")
+    sequential = time.perf_counter() - started
+
+    fetcher = ImageFetcher(max_workers=args.workers, per_host=args.per_host)
+    started = time.perf_counter()
+    images = fetcher.fetch_all(urls)
+    pooled = time.perf_counter() - started
+
+    print(f"이미지 {args.images}장, 서버 지연 {args.latency * 1000:.0f}ms")
+    print(f"  순차 requests.get : {sequential:.2f}s ({args.images / sequential:.1f} img/s)")
+    print(f"  ImageFetcher      : {pooled:.2f}s ({args.images / pooled:.1f} img/s, workers={args.workers}, per_host={args.per_host})")
+    print(f"  성공 {sum(img is not None for img in images)}장, stats={fetcher.stats}")
+
+    fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+# embedding/pipeline.py
+# 다운로드 / 디코드+전처리 / 인코딩을 겹쳐서 실행하는 이미지 임베딩 파이프라인 (modal_batch 재계산용)
+#
+#   [입력] -> 다운로드 (ImageFetcher 스레드 풀) -> download_q -> 디코드+전처리 (프로세스 풀) -> decode_q -> 인코더 (배치 forward)
+#
+# - 큐는 모두 크기 제한이 있어 뒤 단계가 밀리면 앞 단계가 멈춤 (메모리 일정)
+# - 인코더는 호출한 스레드에서 돌고, 입력 순서대로 결과를 돌려줌
+#
+# 사용법:
+#   python -m embedding.pipeline         # tiny 모델 + 로컬 http.server 로 순차 처리와 비교 (CPU)
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+# ---------------------------------------------------------
+# 디코드 + 전처리 (워커 프로세스)
+# ---------------------------------------------------------
+_image_processor = None
+
+
+def _init_decoder(model_name: str):
+    """워커마다 1번 이미지 프로세서 로드"""
+    global _image_processor
+    from transformers import AutoImageProcessor
+
+    _image_processor = AutoImageProcessor.from_pretrained(model_name)
+
+
+def _ready() -> bool:
+    return _image_processor is not None
+
+
+def _decode(data: bytes) -> Optional[Tuple[np.ndarray, float]]:
+    """이미지 bytes -> (pixel_values (C, H, W), 걸린 시간). 실패하면 None"""
+    from PIL import Image
+
+    started = time.perf_counter()
+    try:
+        img = Image.open(BytesIO(data)).convert("RGB")
+        pixels = _image_processor(images=img, return_tensors="np")["pixel_values"][0]
+    except Exception as e:
+        logger.warning(f"이미지 디코드 실패: {e}")
+        return None
+    return pixels, time.perf_counter() - started
+
+
+# ---------------------------------------------------------
+# 모니터링
+# ---------------------------------------------------------
+class _QueueGauge:
+    """꺼낼 때마다 큐 길이를 기록 (평균 / 최대 점유)"""
+
+    def __init__(self, q: queue.Queue):
+        self.q = q
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+    def sample(self):
+        size = self.q.qsize()
+        self.samples += 1
+        self.total += size
+        self.max = max(self.max, size)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "capacity": self.q.maxsize,
+            "avg": round(self.total / self.samples, 2) if self.samples else 0.0,
+            "max": self.max,
+        }
+
+
+class _StageStats:
+    def __init__(self):
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def to_dict(self, wall: float, workers: int) -> dict:
+        return {
+            "items": self.items,
+            "per_s": round(self.items / wall, 1) if wall > 0 else 0.0,
+            "busy_s": round(self.busy, 3),
+            # 워커들이 일한 시간 비율 (1 에 가까울수록 이 단계가 병목)
+            "utilization": round(self.busy / (wall * workers), 3) if wall > 0 else 0.0,
+        }
+
+
+# ---------------------------------------------------------
+# 파이프라인
+# ---------------------------------------------------------
+class EmbeddingPipeline:
+    """
+    - engine: EmbeddingEngine (인코더 단계, 배치 크기는 engine.image_batch_size)
+    - fetcher: ImageFetcher (다운로드 단계, 스레드 수 = fetcher.max_workers)
+    - decode_workers: 디코드+전처리 프로세스 수. 0 이면 스레드 1개로 처리 (코어가 1개인 환경 등)
+      None 이면 (CPU 수 - 1), 최대 4
+    - queue_size: 단계 사이 큐에 쌓아둘 최대 게시물 수
+    - max_wait: 인코더가 배치를 채우려고 기다리는 최대 시간 (초)
+    """
+
+    def __init__(self, engine, fetcher, decode_workers: Optional[int] = None, queue_size: int = 64, max_wait: float = 0.05):
+        if decode_workers is None:
+            decode_workers = max(0, min(4, (os.cpu_count() or 1) - 1))
+        self.engine = engine
+        self.fetcher = fetcher
+        self.decode_workers = decode_workers
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+
+        self._download_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._decode_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._gauges = {"download": _QueueGauge(self._download_q), "decode": _QueueGauge(self._decode_q)}
+        self._stages = {"download": _StageStats(), "decode": _StageStats(), "encode": _StageStats()}
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._threads = []
+        self._decoder = None
+        self._started = None
+        self._finished = None
+        self.batches = 0
+        self.encode_wait = 0.0
+        self.warmup = 0.0
+
+    @property
+    def stats(self) -> dict:
+        wall = ((self._finished or time.perf_counter()) - self._started) if self._started else 0.0
+        encode = self._stages["encode"].to_dict(wall, 1)
+        encode.update(
+            batches=self.batches,
+            avg_batch=round(self._stages["encode"].items / self.batches, 1) if self.batches else 0.0,
+            wait_s=round(self.encode_wait, 3),
+        )
+        return {
+            "wall_s": round(wall, 3),
+            "warmup_s": round(self.warmup, 3),
+            "decode_workers": self.decode_workers,
+            "download": self._stages["download"].to_dict(wall, self.fetcher.max_workers),
+            "decode": self._stages["decode"].to_dict(wall, max(1, self.decode_workers)),
+            "encode": encode,
+            "queues": {name: gauge.stats for name, gauge in self._gauges.items()},
+        }
+
+    # ---------------------------------------------------------
+    # 실행
+    # ---------------------------------------------------------
+    def run(self, items: Iterable[Tuple[object, Sequence[str]]]) -> Iterator[Tuple[object, Dict[str, Optional[np.ndarray]]]]:
+        """
+        items: (tag, urls) 를 내는 iterable (제너레이터 가능, 다운로드 스레드에서 소비됨)
+        결과: 입력 순서대로 (tag, {url: 이미지 벡터 또는 None(다운로드 / 디코드 실패)})
+        """
+        self._start(items)
+        try:
+            yield from self._encode_loop()
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=False, cancel_futures=True)
+            self._decoder = None
+        if self._finished is None and self._started is not None:
+            self._finished = time.perf_counter()
+
+    def _start(self, items):
+        self.engine.load()
+        started = time.perf_counter()
+        if self.decode_workers > 0:
+            # fork 는 torch / 스레드와 충돌할 수 있으므로 spawn
+            self._decoder = ProcessPoolExecutor(
+                max_workers=self.decode_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_decoder,
+                initargs=(self.engine.model_name,),
+            )
+        else:
+            self._decoder = ThreadPoolExecutor(max_workers=1, initializer=_init_decoder, initargs=(self.engine.model_name,))
+        # 워커 기동(transformers import + 프로세서 로드)을 미리 끝내서 처리량 측정에서 제외
+        for future in [self._decoder.submit(_ready) for _ in range(max(1, self.decode_workers))]:
+            future.result()
+        self.warmup = time.perf_counter() - started
+
+        self._started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._guard, args=(self._feed, items), name="pipeline-download", daemon=True),
+            threading.Thread(target=self._guard, args=(self._dispatch,), name="pipeline-decode", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _guard(self, fn, *args):
+        try:
+            fn(*args)
+        except BaseException as e:
+            logger.error(f"파이프라인 단계 에러 ({threading.current_thread().name}): {e}")
+            self._error = self._error or e
+            self._stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        # 소비 측이 멈췄을 때 영원히 막히지 않도록 stop 을 보면서 대기
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, name: str, timeout: Optional[float] = None):
+        q = self._gauges[name].q
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            # 에러뿐 아니라 소비 측이 일찍 멈춘 경우(close)에도 끝냄 (_put 과 같은 조건)
+            if self._stop.is_set():
+                return _DONE
+            wait = 0.1 if deadline is None else min(0.1, deadline - time.perf_counter())
+            if wait <= 0:
+                raise queue.Empty
+            try:
+                item = q.get(timeout=wait)
+            except queue.Empty:
+                continue
+            self._gauges[name].sample()
+            return item
+
+    # 1단계: 다운로드 (입력 소비 + fetcher 스레드 풀에 제출)
+    def _download(self, url: str) -> Optional[bytes]:
+        started = time.perf_counter()
+        data = self.fetcher.fetch_raw(url)
+        self._stages["download"].add(1, time.perf_counter() - started)
+        return data
+
+    def _feed(self, items):
+        for tag, urls in items:
+            futures = [self.fetcher.submit(self._download, url) for url in urls]
+            if not self._put(self._download_q, (tag, list(urls), futures)):
+                return
+        self._put(self._download_q, _DONE)
+
+    # 2단계: 다운로드가 끝난 순서대로 디코드+전처리 프로세스에 제출
+    def _dispatch(self):
+        while True:
+            entry = self._get("download")
+            if entry is _DONE:
+                self._put(self._decode_q, _DONE)
+                return
+            tag, urls, futures = entry
+            decoded = []
+            for future in futures:
+                data = future.result()
+                decoded.append(self._decoder.submit(_decode, data) if data is not None else None)
+            if not self._put(self._decode_q, (tag, urls, decoded)):
+                return
+
+    # 3단계: 배치 인코딩 (호출 스레드)
+    def _encode_loop(self):
+        pending = []            # 입력 순서대로 [tag, urls, vectors, 남은 이미지 수]
+        pixels, owners = [], []
+        done = False
+
+        while not done or pixels or pending:
+            entry = None
+            if not done:
+                started = time.perf_counter()
+                try:
+                    # 쌓인 이미지가 없으면 올 때까지, 있으면 max_wait 만큼만 기다렸다가 모인 만큼 인코딩
+                    entry = self._get("decode", None if not pixels else self.max_wait)
+                except queue.Empty:
+                    entry = None
+                self.encode_wait += time.perf_counter() - started
+
+            if entry is _DONE:
+                if self._error is not None:
+                    return
+                done = True
+            elif entry is not None:
+                tag, urls, decoded = entry
+                post = [tag, urls, {}, 0]
+                pending.append(post)
+                for url, future in zip(urls, decoded):
+                    result = future.result() if future is not None else None
+                    if result is None:
+                        post[2][url] = None
+                        continue
+                    px, seconds = result
+                    self._stages["decode"].add(1, seconds)
+                    pixels.append(px)
+                    owners.append((post, url))
+                    post[3] += 1
+                if len(pixels) < self.engine.image_batch_size:
+                    # 배치가 덜 찼으면 다음 게시물을 더 받아봄
+                    continue
+
+            if pixels:
+                self._encode(pixels, owners)
+                pixels, owners = [], []
+
+            while pending and pending[0][3] == 0:
+                tag, _, vectors, _ = pending.pop(0)
+                yield tag, vectors
+
+    def _encode(self, pixels, owners):
+        started = time.perf_counter()
+        try:
+            vectors = self.engine.encode_pixels(np.stack(pixels))
+        except Exception as e:
+            # 배치가 실패하면 한 장씩 다시 시도해서 문제 이미지만 제외
+            logger.warning(f"배치 인코딩 실패, 한 장씩 재시도: {e}")
+            vectors = []
+            for px in pixels:
+                try:
+                    vectors.append(self.engine.encode_pixels(px[None])[0])
+                except Exception as e:
+                    logger.warning(f"이미지 인코딩 실패: {e}")
+                    vectors.append(None)
+        self._stages["encode"].add(len(pixels), time.perf_counter() - started)
+        self.batches += 1
+        for (post, url), vec in zip(owners, vectors):
+            post[2][url] = vec
+            post[3] -= 1
+
+
+# ---------------------------------------------------------
+# 벤치마크 (tiny 모델, CPU)
+# ---------------------------------------------------------
+def main():
+    import os
+    import json
+    import argparse
+    import tempfile
+    from embedding.engine import get_engine
+    from embedding.fetcher import ImageFetcher, _serve_images
+    from embedding.tiny import build_tiny_model
+
+    parser = argparse.ArgumentParser(description="임베딩 파이프라인 벤치마크 (CPU)")
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--images-per-post", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.03, help="요청당 서버 지연 (초)")
+    parser.add_argument("--decode-workers", type=int, default=None, help="기본: CPU 수 - 1 (0 이면 스레드)")
+    args = parser.parse_args()
+
+    engine = get_engine(build_tiny_model(os.path.join(tempfile.mkdtemp(prefix="tiny-siglip-"), "model")), device="cpu")
+    n_images = args.posts * args.images_per_post
+    server = _serve_images(n_images, args.latency)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    posts = [
+        [f"{base}/{p * args.images_per_post + k}.jpg" for k in range(args.images_per_post)]
+        for p in range(args.posts)
+    ]
+
+    # 기존 방식: 게시물마다 다운로드 -> 디코드 -> 전처리 -> forward 순차
+    import requests
+    from PIL import Image
+
+    started = time.perf_counter()
+    sequential = []
+    for urls in posts:
+        images = [Image.open(BytesIO(requests.get(u, timeout=10).content)).convert("RGB") for u in urls]
+        sequential.append(engine.encode_images(images))
+    sequential_s = time.perf_counter() - started
+
+    fetcher = ImageFetcher(max_workers=16, per_host=16)
+    pipeline = EmbeddingPipeline(engine, fetcher, decode_workers=args.decode_workers)
+    started = time.perf_counter()
+    results = list(pipeline.run((i, urls) for i, urls in enumerate(posts)))
+    pipeline_s = time.perf_counter() - started
+
+    in_order = [tag for tag, _ in results] == list(range(args.posts))
+    diff = max(
+        float(np.abs(np.stack([vectors[u] for u in posts[tag]]) - sequential[tag]).max())
+        for tag, vectors in results
+    )
+    print(f"게시물 {args.posts}개 x 이미지 {args.images_per_post}장, 서버 지연 {args.latency * 1000:.0f}ms")
+    print(f"  순차      : {sequential_s:.2f}s ({n_images / sequential_s:.1f} img/s)")
+    print(
+        f"  파이프라인: {pipeline_s:.2f}s (워커 기동 {pipeline.warmup:.2f}s 포함, {n_images / pipeline_s:.1f} img/s, "
+        f"입력 순서 유지={in_order}, 최대 오차={diff:.2e})"
+    )
+    print(json.dumps(pipeline.stats, indent=2, ensure_ascii=False))
+
+    fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# embedding/tiny.py
+# 오프라인 / CPU 테스트용 초소형 SigLIP (랜덤 가중치, 네트워크 불필요)
+#
+# 사용법:
+#   python -m embedding.tiny            # tiny 모델 생성 후 엔진 로드 / 인코딩 / hot-swap 확인
+import os
+import time
+import tempfile
+
+import numpy as np
+
+TINY_DIM = 32
+
+
+def build_tiny_model(path: str, seed: int = 0) -> str:
+    """path 에 AutoModel / AutoProcessor 로 읽을 수 있는 tiny SigLIP 을 저장하고 path 를 반환합니다."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import (
+        SiglipConfig, SiglipModel, SiglipImageProcessor, SiglipProcessor, PreTrainedTokenizerFast,
+    )
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+    os.makedirs(path, exist_ok=True)
+    torch.manual_seed(seed)
+
+    vocab = {"<pad>": 0, "<unk>": 1, "</s>": 2}
+    for ch in "abcdefghijklmnopqrstuvwxyz0123456789 ":
+        vocab[ch] = len(vocab)
+
+    config = SiglipConfig(
+        text_config=dict(
+            vocab_size=len(vocab), hidden_size=TINY_DIM, intermediate_size=64, num_hidden_layers=2,
+            num_attention_heads=2, max_position_embeddings=16, projection_size=TINY_DIM,
+            pad_token_id=0, bos_token_id=None, eos_token_id=2,
+        ),
+        vision_config=dict(
+            hidden_size=TINY_DIM, intermediate_size=64, num_hidden_layers=2,
+            num_attention_heads=2, image_size=32, patch_size=8,
+        ),
+    )
+    SiglipModel(config).save_pretrained(path)
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    processor = SiglipProcessor(
+        image_processor=SiglipImageProcessor(size={"height": 32, "width": 32}),
+        tokenizer=PreTrainedTokenizerFast(
+            tokenizer_object=tokenizer, pad_token="<pad>", unk_token="<unk>", eos_token="</s>", model_max_length=16,
+        ),
+    )
+    processor.save_pretrained(path)
+    return path
+
+
+def random_image(seed: int = 0, size=(48, 40)):
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    return Image.fromarray((rng.random((size[1], size[0], 3)) * 255).astype("uint8"))
+
+
+def main():
+    import torch
+    from embedding.engine import get_engine
+
+    root = tempfile.mkdtemp(prefix="tiny-siglip-")
+    model_dir = build_tiny_model(os.path.join(root, "model"))
+    weights = os.path.join(root, "siglip_best.pth")
+
+    started = time.perf_counter()
+    engine = get_engine(model_dir, weights, device="cpu")
+    print(f"로드: {time.perf_counter() - started:.2f}s (weights={engine.weights_version})")
+
+    vector = engine.embed_post([random_image(0), random_image(1)], "hello santa")
+    print(f"통합 벡터: shape={vector.shape}, norm={np.linalg.norm(vector):.4f}")
+
+    started = time.perf_counter()
+    same = get_engine(model_dir, weights, device="cpu")
+    print(f"재사용: {time.perf_counter() - started:.4f}s (같은 엔진={same is engine})")
+
+    # 가중치 파일 교체 -> 다음 요청에서 다시 로드
+    state = {k: v + 0.01 for k, v in engine.model.state_dict().items() if v.is_floating_point()}
+    torch.save(state, weights)
+    get_engine(model_dir, weights, device="cpu")
+    swapped = engine.embed_post([random_image(0), random_image(1)], "hello santa")
+    print(f"hot-swap: reloads={engine.reloads}, version={engine.weights_version}, 벡터 변화={np.linalg.norm(swapped - vector):.4f}")
+
+
+if __name__ == "__main__":
+    main()
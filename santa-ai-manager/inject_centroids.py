@@ -1,17 +1,16 @@
 import json
-import redis
 import os
 import sys
 
-# Qdrant & WandB 라이브러리
-from qdrant_client import QdrantClient
+# Qdrant 라이브러리
 from qdrant_client.http import models
-import wandb  # 스크립트 종료 처리를 위해 직접 import
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from app.core.config import settings
+from app.core.connections import create_sync_redis, qdrant_client
 # 방금 만든 wandb_service 가져오기
 from app.services.wandb_service import wandb_service
+from app.services.centroid_store import CENTROIDS_KEY, overwrite_centroids
 
 def inject_centroids():
     print("Centroid 데이터 주입 시작...")
@@ -30,25 +29,16 @@ def inject_centroids():
     # 1. Redis 저장
     # ---------------------------------------------------------
     try:
-        if not settings.REDIS_PASSWORD:
-            print("오류: .env 파일에 'REDIS_PASSWORD'가 설정되지 않았습니다!")
-            return
-
-        redis_url = f"rediss://:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}"
-        
-        # ssl_cert_reqs=None 추가 (AWS ElastiCache 등 호환성)
-        r = redis.Redis.from_url(
-            redis_url, 
-            decode_responses=True, 
-            ssl_cert_reqs=None 
-        )
+        # 서버와 같은 연결 설정 사용 (REDIS_PASSWORD 가 있으면 rediss://, ssl_cert_reqs=None)
+        r = create_sync_redis()
         
         r.ping()
         print("Redis 연결 성공!")
 
-        redis_key = "system:centroids"
-        r.set(redis_key, json.dumps(centroids_data))
-        print(f"Redis Key '{redis_key}' 저장 완료!")
+        redis_key = CENTROIDS_KEY
+        # 저장 + version 증가 + bound 전체 무효화를 한 트랜잭션으로, 이후 서버들의 메모리 캐시 무효화 알림
+        version = overwrite_centroids(r, json.dumps(centroids_data))
+        print(f"Redis Key '{redis_key}' 저장 완료! (version={version})")
 
     except Exception as e:
         print(f"Redis 처리 중 에러: {e}")
@@ -59,7 +49,7 @@ def inject_centroids():
     # ---------------------------------------------------------
     print("\nQdrant 데이터 주입 시작...")
     try:
-        q_client = QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        q_client = qdrant_client
         
         # A. santa_centroids (순수 Centroid 저장소)
         collection_name = "santa_centroids"
@@ -120,12 +110,11 @@ def inject_centroids():
                 int(level)
             ))
 
-        # log_batch 호출 -> 내부에서 wandb.init()이 자동으로 수행됨
+        # log_batch 호출 -> 백그라운드 스레드에서 wandb.init() 후 전송됨
         wandb_service.log_batch(batch_items)
         
-        # 스크립트가 바로 종료되지 않도록 전송 완료 대기
-        if wandb.run:
-            wandb.finish()
+        # 스크립트가 바로 종료되지 않도록 전송 완료 대기 (백그라운드 큐 flush + wandb.finish)
+        wandb_service.close()
         print("WandB 로깅 완료!")
 
     except Exception as e:
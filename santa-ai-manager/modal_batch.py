@@ -20,38 +20,53 @@ batch_image = (
         "accelerate",
         "sentencepiece"
     )
+    # 임베딩 캐시는 볼륨에 저장해서 다음 재계산 때 재사용 (embedding/cache.py)
+    .env({"EMBED_CACHE_BACKEND": "disk", "EMBED_CACHE_DIR": "/cache/embeddings"})
+    # 공용 임베딩 엔진 (embedding/) + Redis 접속 설정 / Centroid 키 (app/core/redis_options.py, app/services/centroid_store.py)
+    .add_local_python_source("embedding", "app")
 )
 
 app = modal.App("santa-batch", image=batch_image)
 
 model_volume = modal.Volume.from_name("santa-models", create_if_missing=True)
+cache_volume = modal.Volume.from_name("santa-embed-cache", create_if_missing=True)
 secrets = [modal.Secret.from_name("santa-aws-secret")]
 
 MODEL_PATH = "/models/siglip_best.pth"
+# 한 번에 모아서 인코딩할 게시물 수 (이미지 / 텍스트 배치 크기는 embedding.engine 의 EMBED_* 설정)
+POST_CHUNK_SIZE = int(os.environ.get("BATCH_POST_CHUNK_SIZE", 32))
+# 서버 측 커서에서 한 번에 가져오는 행 수
+BATCH_FETCH_SIZE = int(os.environ.get("BATCH_FETCH_SIZE", 500))
+BATCH_NET_WRITE_TIMEOUT = int(os.environ.get("BATCH_NET_WRITE_TIMEOUT", 3600))
+# 디코드+전처리 프로세스 수 (컨테이너 cpu 와 맞춤, 0 이면 스레드)
+BATCH_DECODE_WORKERS = int(os.environ.get("BATCH_DECODE_WORKERS", 3))
 
 @app.function(
     gpu="T4",
-    volumes={"/models": model_volume},
+    volumes={"/models": model_volume, "/cache": cache_volume},
     secrets=secrets,
+    cpu=BATCH_DECODE_WORKERS + 1,
     timeout=3600
 )
 def run_batch_recalculation():
     """
     Centroid 재계산
-    - posts 테이블과 image_sources 테이블을 JOIN하여 데이터 조회
+    - posts 테이블과 image_sources 테이블을 JOIN하여 데이터 조회 (서버 측 커서, BATCH_FETCH_SIZE 행씩)
+    - 레벨별 벡터 합 / 개수만 누적하므로 게시물 수가 늘어도 메모리는 일정
     - post_level (FLOAT) -> int로 변환하여 사용
     - SigLIP으로 멀티 모달 벡터 생성 -> 통합 벡터 -> Centroid 갱신
     """
-    import torch
-    import numpy as np
-    import requests
     import json
     import redis
     import pymysql
-    from PIL import Image
-    from io import BytesIO
+    from app.core.redis_options import redis_options
+    from app.services.centroid_store import overwrite_centroids
     from sqlalchemy import create_engine, text
-    from transformers import AutoModel, AutoProcessor
+    from embedding import get_engine
+    from embedding.centroids import LevelSums
+    from embedding.cache import get_cache
+    from embedding.fetcher import get_fetcher
+    from embedding.pipeline import EmbeddingPipeline
     from qdrant_client import QdrantClient, models
 
     print("[Batch] 멀티모달 Centroid 재계산 작업 시작 (Schema Sync)")
@@ -59,33 +74,24 @@ def run_batch_recalculation():
     # ---------------------------------------------------------
     # 1. DB 및 Redis 연결
     # ---------------------------------------------------------
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    
     db_url = f"mysql+pymysql://{os.environ['MYSQL_USER']}:{os.environ['MYSQL_PASSWORD']}@{os.environ['MYSQL_HOST']}:{os.environ['MYSQL_PORT']}/{os.environ['MYSQL_DB']}"
     engine = create_engine(db_url)
 
-    r = redis.Redis(
-        host=os.environ['REDIS_HOST'], 
-        port=int(os.environ['REDIS_PORT']), 
-        decode_responses=True
+    # 서버와 같은 접속 설정 (REDIS_PASSWORD 가 있으면 rediss://, ssl_cert_reqs=None)
+    redis_url, redis_kwargs = redis_options(
+        os.environ['REDIS_HOST'], int(os.environ['REDIS_PORT']), os.environ.get('REDIS_PASSWORD')
     )
+    r = redis.Redis.from_url(redis_url, **redis_kwargs)
 
     # ---------------------------------------------------------
     # 2. 모델 로드
     # ---------------------------------------------------------
-    print("🧠 SigLIP 모델 로딩 중...")
-    model_name = "google/siglip-so400m-patch14-384"
-    processor = AutoProcessor.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name).to(device)
-    
-    if os.path.exists(MODEL_PATH):
-        print(f"📂 학습된 가중치 로드: {MODEL_PATH}")
-        model.load_state_dict(torch.load(MODEL_PATH, map_location=device), strict=False)
-    
-    model.eval()
+    # modal_deploy 와 같은 엔진 (가중치 파일이 있으면 파인튜닝 가중치 적용)
+    embedder = get_engine(weights_path=MODEL_PATH)
+    print(f"🧠 SigLIP 모델 로드 완료 (weights={embedder.weights_version})")
 
     # ---------------------------------------------------------
-    # 3. 데이터 로드 (Posts + Image Sources JOIN)
+    # 3. 데이터 조회 (Posts + Image Sources JOIN, 서버 측 커서로 페이지 단위 스트리밍)
     # ---------------------------------------------------------
     print("📥 RDS 데이터 조회 중...")
     
@@ -100,105 +106,131 @@ def run_batch_recalculation():
         WHERE p.post_level BETWEEN 1 AND 10
         GROUP BY p.post_id, p.content, p.post_level
     """
+    count_str = "SELECT COUNT(*) FROM posts WHERE post_level BETWEEN 1 AND 10"
 
-    with engine.connect() as conn:
-        posts = conn.execute(text(query_str)).fetchall()
-
-    print(f"📊 처리 대상 게시물: {len(posts)}개")
-    
-    level_vectors_map = {i: [] for i in range(1, 11)}
+    # 레벨별 벡터 합 / 개수만 유지 (메모리 = 레벨 수 x 차원, 게시물 수와 무관)
+    level_sums = LevelSums(range(1, 11))
     
     success_cnt = 0
     fail_cnt = 0
+    streamed_cnt = 0
 
     # ---------------------------------------------------------
     # 4. 루프: 게시물별 통합 벡터 생성
     # ---------------------------------------------------------
-    for row in posts:
-        pid, content, level, img_urls_json = row
-        
-        # level이 float->int 변환 과정에서 범위 벗어날 수 있으므로 안전장치
-        if not (1 <= level <= 10):
-            continue
-
-        temp_vectors = []
-
-        try:
-            # A. 이미지 벡터화 (JSON 문자열 파싱)
-            if img_urls_json:
+    def _parse_urls(img_urls_json):
+        # MySQL JSON_ARRAYAGG 결과가 문자열로 넘어오면 파싱
+        url_list = json.loads(img_urls_json) if isinstance(img_urls_json, str) else img_urls_json
+        # null 값이 리스트에 섞일 수 있으므로 필터링
+        return [u for u in (url_list or []) if u]
+
+    def _targets(result):
+        nonlocal streamed_cnt
+        for page in result.partitions():
+            for row in page:
+                streamed_cnt += 1
+                pid, content, level, img_urls_json = row
+                # level이 float->int 변환 과정에서 범위 벗어날 수 있으므로 안전장치
+                if not (1 <= level <= 10):
+                    continue
                 try:
-                    # MySQL JSON_ARRAYAGG 결과가 문자열로 넘어오면 파싱
-                    url_list = json.loads(img_urls_json) if isinstance(img_urls_json, str) else img_urls_json
-                    
-                    # null 값이 리스트에 섞일 수 있으므로 필터링
-                    url_list = [u for u in url_list if u]
-
-                    for url in url_list:
-                        try:
-                            res = requests.get(url, timeout=5)
-                            if res.status_code == 200:
-                                img = Image.open(BytesIO(res.content)).convert("RGB")
-                                inputs = processor(images=img, return_tensors="pt").to(device)
-                                with torch.no_grad():
-                                    v = model.get_image_features(**inputs).cpu().numpy()[0]
-                                    temp_vectors.append(v)
-                        except Exception:
-                            continue 
+                    url_list = _parse_urls(img_urls_json) if img_urls_json else []
                 except Exception as e:
                     print(f"⚠️ 이미지 처리 실패 (ID: {pid}): {e}")
+                    url_list = []
+                yield pid, content, level, url_list
+
+    # 캐시에 있는 이미지는 다운로드부터 건너뛰고, 나머지는 파이프라인으로 처리 (embedding/pipeline.py)
+    #   다운로드 스레드 -> 디코드+전처리 프로세스 -> 배치 인코딩 (GPU), 단계 사이는 크기 제한 큐
+    cache = get_cache()
+    fetcher = get_fetcher(timeout=5)
+    pipeline = EmbeddingPipeline(embedder, fetcher, decode_workers=BATCH_DECODE_WORKERS, queue_size=2 * POST_CHUNK_SIZE)
+
+    def _pipeline_items(targets):
+        # 파이프라인 다운로드 스레드에서 실행됨 (DB 커서 읽기 + 캐시 조회도 인코딩과 겹침)
+        for pid, content, level, urls in targets:
+            hits = cache.image_vectors(embedder, urls)
+            yield (pid, content, level, urls, hits), [u for u in dict.fromkeys(urls) if u not in hits]
+
+    def _flush(chunk):
+        nonlocal success_cnt, fail_cnt
+        # 텍스트만 모아 배치 forward 후 게시물별 통합 (Mean & Normalize), 이미지는 파이프라인에서 인코딩 완료
+        try:
+            vectors = cache.embed_posts(embedder, [post for _, _, post in chunk])
+        except Exception as e:
+            print(f"배치 인코딩 실패, 게시물별로 재시도: {e}")
+            vectors = []
+            for pid, _, post in chunk:
+                try:
+                    vectors.append(cache.embed_posts(embedder, [post])[0])
+                except Exception as e:
+                    print(f"치명적 에러 (ID: {pid}): {e}")
+                    vectors.append(None)
 
-            # B. 텍스트 벡터화
-            if content and isinstance(content, str) and len(content.strip()) > 0:
-                text_inputs = processor(text=[content], padding="max_length", truncation=True, return_tensors="pt").to(device)
-                with torch.no_grad():
-                    v_text = model.get_text_features(**text_inputs).cpu().numpy()[0]
-                    temp_vectors.append(v_text)
-
-            # C. 통합 (Mean & Normalize)
-            if temp_vectors:
-                combined_vec = np.mean(temp_vectors, axis=0)
-                
-                norm = np.linalg.norm(combined_vec)
-                if norm > 0:
-                    final_vector = combined_vec / norm
-                else:
-                    final_vector = combined_vec
-
-                level_vectors_map[level].append(final_vector)
+        for (_, level, _), final_vector in zip(chunk, vectors):
+            if final_vector is not None:
+                level_sums.add(level, final_vector)
                 success_cnt += 1
             else:
                 fail_cnt += 1
 
-        except Exception as e:
-            print(f"치명적 에러 (ID: {pid}): {e}")
-            fail_cnt += 1
-            
-        if (success_cnt + fail_cnt) % 50 == 0:
-            print(f"진행률: {success_cnt + fail_cnt}/{len(posts)}")
+    with engine.connect() as conn:
+        total = conn.execute(text(count_str)).scalar()
+        print(f"📊 처리 대상 게시물: 약 {total}개")
+
+        # 읽는 쪽이 인코딩하느라 늦어도 MySQL 이 스트리밍 연결을 끊지 않도록
+        conn.execute(text(f"SET SESSION net_write_timeout = {BATCH_NET_WRITE_TIMEOUT}"))
+        result = conn.execution_options(stream_results=True, yield_per=BATCH_FETCH_SIZE).execute(text(query_str))
+
+        chunk = []
+        for (pid, content, level, urls, hits), new_vectors in pipeline.run(_pipeline_items(_targets(result))):
+            # 새로 인코딩한 이미지는 캐시에 저장, 실패한 이미지(None)는 통합에서 제외됨
+            cache.put_images(embedder, new_vectors)
+            vectors = dict(hits)
+            vectors.update((u, v) for u, v in new_vectors.items() if v is not None)
+            chunk.append((pid, level, (urls, vectors, {}, content)))
+            if len(chunk) < POST_CHUNK_SIZE:
+                continue
+            _flush(chunk)
+            chunk = []
+            if (success_cnt + fail_cnt) % (POST_CHUNK_SIZE * 10) == 0:
+                stats = pipeline.stats
+                print(
+                    f"진행률: {success_cnt + fail_cnt}/{total} "
+                    f"(조회 {streamed_cnt}건, 성공 {success_cnt}, 실패 {fail_cnt}, 캐시 적중률 {cache.stats['hit_rate']:.1%}) "
+                    f"| 다운로드 {stats['download']['per_s']}/s, 디코드 {stats['decode']['per_s']}/s, "
+                    f"인코딩 {stats['encode']['per_s']}/s, 큐 {stats['queues']['download']['avg']}/{stats['queues']['decode']['avg']}"
+                )
+        if chunk:
+            _flush(chunk)
+        result.close()
+
+    print(f"📊 처리 완료: 조회 {streamed_cnt}건, 성공 {success_cnt}, 실패 {fail_cnt}")
+    print(f"임베딩 캐시: {cache.stats}")
+    print(f"파이프라인: {json.dumps(pipeline.stats, ensure_ascii=False)}")
 
     # ---------------------------------------------------------
     # 5. Centroid 계산 및 저장
     # ---------------------------------------------------------
     print("Centroid 산출 중...")
-    new_centroids = {}
-
-    for lvl in range(1, 11):
-        vecs = np.array(level_vectors_map[lvl])
-        
-        if len(vecs) > 0:
-            mean_v = np.mean(vecs, axis=0)
-            norm_v = mean_v / np.linalg.norm(mean_v)
-            new_centroids[str(lvl)] = norm_v.tolist()
-            print(f"  - Level {lvl}: {len(vecs)}개 게시물 사용")
+    new_centroids = level_sums.centroids()
+
+    for lvl, count in level_sums.counts.items():
+        if count > 0:
+            print(f"  - Level {lvl}: {count}개 게시물 사용")
         else:
             print(f"Level {lvl}: 데이터 부족으로 갱신 스킵")
 
     if new_centroids:
-        r.set("system:centroids", json.dumps(new_centroids))
-        print(f"Centroid 업데이트 완료! (총 {len(new_centroids)}개 레벨)")
+        # 저장 + version 증가 + 증분 재계산 bound 전체 무효화를 한 트랜잭션으로, 이후 서버들의 메모리 캐시 무효화 알림
+        version = overwrite_centroids(r, json.dumps(new_centroids))
+        print(f"Centroid 업데이트 완료! (총 {len(new_centroids)}개 레벨, version={version})")
     else:
         print("갱신된 Centroid가 없습니다.")
 
+    # 다음 재계산에서 쓸 수 있도록 캐시 저장
+    cache_volume.commit()
+
     return {"status": "success", "updated_levels": list(new_centroids.keys())}
 
 if __name__ == "__main__":
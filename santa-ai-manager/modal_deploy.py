@@ -1,17 +1,88 @@
 import modal
 import os
+import time
 
 image = (
     modal.Image.debian_slim()
     .pip_install(
         "torch", "torchvision", "transformers", "pillow", 
-        "boto3", "accelerate", "sentencepiece", "protobuf", "timm"
+        "boto3", "accelerate", "sentencepiece", "protobuf", "timm", "pydantic"
     )
+    # 공용 임베딩 엔진 (embedding/) + 웹훅 벡터 인코딩 (app/core/vector_codec.py)
+    .add_local_python_source("embedding", "app")
 )
 
 app = modal.App("santa", image=image)
 model_volume = modal.Volume.from_name("santa-models", create_if_missing=True)
 MODEL_PATH = "/models/siglip_best.pth"
+# 볼륨 reload 최소 간격 (초). reload 는 원격 호출이라 요청마다 하지 않음
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", 300))
+
+# 마지막 볼륨 reload 시각 (컨테이너 기동 시 마운트된 볼륨이 최신이므로 첫 요청에서 기준만 잡음)
+_last_volume_reload = None
+
+
+def _reload_volume_if_due():
+    """다른 컨테이너가 올린 새 가중치를 MODEL_RELOAD_INTERVAL 마다 반영 (가중치 파일 변경은 엔진이 stat 으로 감지)"""
+    global _last_volume_reload
+    now = time.monotonic()
+    if _last_volume_reload is None:
+        _last_volume_reload = now
+        return
+    if now - _last_volume_reload < MODEL_RELOAD_INTERVAL:
+        return
+    # 실패해도 간격은 지킴 (열린 파일이 있으면 실패할 수 있으므로 무시)
+    _last_volume_reload = now
+    try:
+        model_volume.reload()
+    except Exception as e:
+        print(f"볼륨 reload 실패 (기존 가중치 사용): {e}")
+
+
+def _load_engine():
+    """
+    SigLIP 엔진 (컨테이너당 1번 로드, 재사용되는 컨테이너에서는 그대로 사용)
+    가중치 파일이 바뀌었으면 다시 로드됩니다.
+    """
+    from embedding import get_engine
+
+    # 모델 가중치 다운로드 (최초 1번)
+    if not os.path.exists(MODEL_PATH):
+        import boto3
+        from botocore.config import Config
+
+        s3 = boto3.client("s3", config=Config(region_name='ap-southeast-2'))
+        s3.download_file("kosta-santa-s3", "siglip_best.pth", MODEL_PATH)
+        model_volume.commit()
+    else:
+        _reload_volume_if_due()
+
+    return get_engine(weights_path=MODEL_PATH)
+
+
+def _embed_post(engine, image_urls: list, content: str):
+    """
+    이미지 동시 다운로드 후 엔진으로 통합 벡터 생성. 벡터가 하나도 없으면 None
+    캐시에 있는 이미지 / 텍스트는 다운로드와 인코딩을 모두 건너뜀 (embedding/cache.py)
+    """
+    from embedding.cache import get_cache
+    from embedding.fetcher import get_fetcher
+
+    # 실패한 이미지는 건너뜀 (컨테이너당 세션 / 스레드 풀 재사용)
+    return get_cache().embed_urls(engine, get_fetcher(timeout=10), [(image_urls or [], content)])[0]
+
+def _result_payload(job_id, unified, vector_encoding: str) -> dict:
+    """웹훅 InferenceResult 형식 (app/api/routes.py)"""
+    from app.core.vector_codec import SUPPORTED_DTYPES, encode_array
+
+    payload = {"job_id": job_id, "status": "completed"}
+    if unified is not None and vector_encoding in SUPPORTED_DTYPES:
+        # base64 little-endian 바이너리 (서버가 디코딩하는 것과 같은 인코더)
+        payload["vector"] = encode_array(unified, vector_encoding)
+    else:
+        payload["unified_vector"] = unified.tolist() if unified is not None else None
+    return payload
+
 
 @app.function(
     gpu="T4", 
@@ -19,64 +90,62 @@ MODEL_PATH = "/models/siglip_best.pth"
     secrets=[modal.Secret.from_name("santa-aws-secret")],
     timeout=900 
 )
-def run_inference(image_urls: list, content: str, job_id: str, callback_url: str, secret_token: str):
-    import torch
+def run_inference(image_urls: list, content: str, job_id: str, callback_url: str, secret_token: str, vector_encoding: str = "json"):
     import requests
-    from PIL import Image
-    from io import BytesIO
-    from transformers import AutoModel, AutoProcessor
-    from botocore.config import Config
-    import numpy as np
 
-    # 모델 가중치 로드
-    if not os.path.exists(MODEL_PATH):
-        s3 = boto3.client("s3", config=Config(region_name='ap-southeast-2'))
-        s3.download_file("kosta-santa-s3", "siglip_best.pth", MODEL_PATH)
-        model_volume.commit()
-
-    # SigLIP 모델 설정
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model_name = "google/siglip-so400m-patch14-384" 
-    processor = AutoProcessor.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name).to(device)
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=device), strict=False)
-    model.eval()
-
-    all_vectors = []
-
-    # 이미지 벡터 추출
-    for url in image_urls:
-        try:
-            res = requests.get(url, timeout=10)
-            img = Image.open(BytesIO(res.content)).convert("RGB")
-            inputs = processor(images=img, return_tensors="pt").to(device)
-            with torch.no_grad():
-                v = model.get_image_features(**inputs).cpu().numpy()[0]
-                all_vectors.append(v)
-        except: continue
-
-    # 텍스트 벡터 추출
-    if content:
-        text_inputs = processor(text=[content], padding="max_length", truncation=True, return_tensors="pt").to(device)
-        with torch.no_grad():
-            v = model.get_text_features(**text_inputs).cpu().numpy()[0]
-            all_vectors.append(v)
-
-    # 통합 및 단위벡터화
-    unified_vector = None
-    if all_vectors:
-        # 모든 벡터 평균
-        combined = np.mean(all_vectors, axis=0)
-        
-        # L2 정규화: 벡터의 길이를 1로 변환
-        norm = np.linalg.norm(combined)
-        if norm > 0:
-            unified_vector = (combined / norm).tolist() # 단위벡터화 완료
-        else:
-            unified_vector = combined.tolist()
+    engine = _load_engine()
+    unified = _embed_post(engine, image_urls, content)
 
     # Webhook 전송
-    payload = {"job_id": job_id, "unified_vector": unified_vector, "status": "completed"}
+    payload = _result_payload(job_id, unified, vector_encoding)
     requests.post(callback_url, json=payload, headers={"x-santa-token": secret_token})
     
-    return {"status": "success"}
\ No newline at end of file
+    return {"status": "success"}
+
+
+@app.function(
+    gpu="T4",
+    volumes={"/models": model_volume},
+    secrets=[modal.Secret.from_name("santa-aws-secret")],
+    timeout=900
+)
+def run_inference_batch(jobs: list, callback_url: str, secret_token: str, vector_encoding: str = "json"):
+    """
+    여러 게시물을 한 번의 컨테이너 호출로 처리합니다. (app/services/inference_batcher.py)
+    - jobs: [{"job_id", "image_urls", "content"}, ...]
+    - 모델은 컨테이너당 한 번만 로드하고, 결과는 /internal/inference-results 로 한 번에 전송
+    """
+    import requests
+    from embedding.cache import get_cache
+    from embedding.fetcher import get_fetcher
+
+    engine = _load_engine()
+    cache = get_cache()
+
+    # 캐시에 없는 이미지만 동시에 받은 뒤 게시물 경계를 넘어 배치로 인코딩
+    fetcher = get_fetcher(timeout=10)
+    try:
+        vectors = cache.embed_urls(engine, fetcher, [(job.get("image_urls") or [], job.get("content")) for job in jobs])
+    except Exception as e:
+        # 배치 전체가 실패하면 게시물별로 다시 시도해서 실패한 게시물만 골라냄
+        print(f"배치 인코딩 실패, 게시물별로 재시도: {e}")
+        vectors = []
+        for job in jobs:
+            try:
+                vectors.append(_embed_post(engine, job.get("image_urls"), job.get("content")))
+            except Exception as e:
+                print(f"게시물 처리 실패 (Job ID: {job.get('job_id')}): {e}")
+                vectors.append(e)
+    print(f"임베딩 캐시: {cache.stats}")
+
+    results = []
+    for job, unified in zip(jobs, vectors):
+        if isinstance(unified, Exception):
+            results.append({"job_id": job.get("job_id"), "status": "failed"})
+        else:
+            results.append(_result_payload(job["job_id"], unified, vector_encoding))
+
+    # Webhook 일괄 전송
+    requests.post(callback_url, json=results, headers={"x-santa-token": secret_token})
+
+    return {"status": "success", "count": len(results)}
@@ -1,12 +1,9 @@
 # push_job.py (수정본)
-import redis
-import json
-import os
+import asyncio
 from app.core.config import settings
+from app.services.queue_backend import inference_queue
 
-def push_test_job():
-    r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
-
+async def push_test_job():
     test_job = {
         "job_id": "santa-refactor-test",
         "image_urls": ["https://images.unsplash.com/photo-1543508282-6319a3e2621f"],
@@ -14,9 +11,10 @@ def push_test_job():
         "post_id": "post-123"
     }
 
-    # 공유된 변수로 데이터 전송
-    r.lpush(settings.REDIS_QUEUE_NAME, json.dumps(test_job))
-    print(f"[{settings.REDIS_QUEUE_NAME}] 에 일감을 던졌습니다!")
+    # QUEUE_BACKEND 에 맞게 LPUSH 또는 XADD
+    queue = inference_queue()
+    await queue.push(test_job)
+    print(f"[{queue.name}] 에 일감을 던졌습니다! ({settings.QUEUE_BACKEND})")
 
 if __name__ == "__main__":
-    push_test_job()
\ No newline at end of file
+    asyncio.run(push_test_job())
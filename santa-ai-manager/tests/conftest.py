@@ -0,0 +1,19 @@
+# tests/conftest.py
+# 테스트 공통 설정
+# - app.core.config.Settings 의 필수 값을 더미로 채움 (실제 Redis / MySQL / Qdrant 연결은 만들지 않음)
+# - 네트워크가 필요한 외부 서비스는 각 테스트에서 fakeredis / 가짜 클라이언트로 대체
+import os
+
+for key, value in {
+    "REDIS_HOST": "localhost",
+    "CALLBACK_BASE_URL": "http://callback.test",
+    "SANTA_SECRET_TOKEN": "test-token",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "MYSQL_HOST": "localhost",
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "MYSQL_DB": "test",
+    "WANDB_MODE": "disabled",
+}.items():
+    os.environ.setdefault(key, value)
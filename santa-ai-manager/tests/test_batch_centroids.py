@@ -0,0 +1,43 @@
+# tests/test_batch_centroids.py
+# 배치 재산출의 레벨별 누적 합이 기존 "전부 모은 뒤 평균" 방식과 같은 Centroid 를 내는지 확인 (user-024)
+import numpy as np
+
+from embedding.centroids import LevelSums
+
+DIM = 16
+
+
+def _collect_then_mean(rows):
+    """스트리밍 이전 구현: 레벨별로 벡터를 전부 모은 뒤 평균 -> 정규화"""
+    level_vectors_map = {i: [] for i in range(1, 11)}
+    for level, vector in rows:
+        if 1 <= level <= 10:
+            level_vectors_map[level].append(vector)
+    centroids = {}
+    for lvl, vectors in level_vectors_map.items():
+        if vectors:
+            mean_v = np.mean(vectors, axis=0)
+            centroids[str(lvl)] = (mean_v / np.linalg.norm(mean_v)).astype(np.float32).tolist()
+    return centroids
+
+
+def test_running_sums_match_collect_then_mean():
+    rng = np.random.default_rng(0)
+    # 레벨 1~10 중 일부는 비어 있고, 범위 밖 레벨(0, 11)도 섞인 행
+    levels = rng.choice([0, 1, 2, 3, 5, 8, 10, 11], size=500)
+    vectors = rng.normal(size=(500, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = list(zip(levels.tolist(), vectors))
+
+    sums = LevelSums(range(1, 11))
+    accepted = [sums.add(level, vector) for level, vector in rows]
+
+    expected = _collect_then_mean(rows)
+    actual = sums.centroids()
+
+    assert sorted(actual) == sorted(expected)
+    for level in expected:
+        assert np.allclose(actual[level], expected[level], atol=1e-6)
+    assert sum(accepted) == sum(1 for level in levels if 1 <= level <= 10)
+    assert sums.counts[4] == 0 and "4" not in actual
+    assert sums.counts[3] == int((levels == 3).sum())
@@ -0,0 +1,122 @@
+# tests/test_centroid_cas.py
+# update_centroids 의 WATCH/MULTI 낙관적 동시성 제어 (user-011)
+# - 두 피드백이 동시에 저장되면 한쪽은 WatchError 로 최신 값 위에 다시 계산되어 둘 다 반영됨
+# - 계속 충돌하면 CAS_MAX_RETRIES 후 RuntimeError
+import json
+import asyncio
+
+import fakeredis
+import numpy as np
+import pytest
+
+from app.services import centroid_service as cs
+from app.services.centroid_cache import CentroidSet, CENTROIDS_KEY, VERSION_KEY, DRIFT_KEY
+
+DIM = 8
+
+
+@pytest.fixture
+def service(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cs, "redis_client", redis)
+    service = cs.CentroidService()
+    published = []
+
+    async def publish(saved):
+        published.append(saved.version)
+
+    monkeypatch.setattr(service, "_publish_centroids", publish)
+    service.published = published
+    service.redis = redis
+    return service
+
+
+def _initial(rng):
+    centroids = rng.normal(size=(3, DIM))
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    return {str(i + 1): c.tolist() for i, c in enumerate(centroids)}
+
+
+def test_concurrent_updates_both_apply_after_watch_conflict(service):
+    rng = np.random.default_rng(0)
+    initial = _initial(rng)
+    vec_a, vec_b = rng.normal(size=(2, DIM))
+    attempts = {"a": 0, "b": 0}
+
+    def feedback(name, vector, correct_level, gate=None, ready=None):
+        async def mutate(current: CentroidSet):
+            attempts[name] += 1
+            updated = await service._adjust_centroids_logic(
+                current, vector, correct_level, service.determine_level(vector, current)
+            )
+            if gate is not None and attempts[name] == 1:
+                # 첫 시도는 다른 업데이트가 먼저 저장될 때까지 붙잡아 둠 → EXEC 시 WatchError
+                ready.set()
+                await gate.wait()
+            return updated
+        return mutate
+
+    async def scenario():
+        await service.redis.set(CENTROIDS_KEY, json.dumps(initial))
+        await service.redis.set(VERSION_KEY, 1)
+        gate, ready = asyncio.Event(), asyncio.Event()
+
+        task_a = asyncio.create_task(service.update_centroids(feedback("a", vec_a, 1, gate, ready)))
+        await ready.wait()
+        saved_b = await service.update_centroids(feedback("b", vec_b, 2))
+        gate.set()
+        saved_a = await task_a
+        stored = await service.redis.mget(CENTROIDS_KEY, VERSION_KEY, DRIFT_KEY)
+        return saved_a, saved_b, stored
+
+    saved_a, saved_b, (data, version, drift) = asyncio.run(scenario())
+
+    # A 는 한 번 충돌해서 B 가 저장한 값 위에서 다시 계산됨
+    assert attempts == {"a": 2, "b": 1}
+    assert int(version) == 3
+    assert (saved_b.version, saved_a.version) == (2, 3)
+    assert service.published == [2, 3]
+
+    # 저장된 Centroid == 초기값에 B, 그 다음 A 를 순서대로 적용한 결과 (둘 다 반영)
+    async def expected():
+        start = CentroidSet.from_dict(initial, version=1)
+        after_b = await service._adjust_centroids_logic(start, vec_b, 2, service.determine_level(vec_b, start))
+        after_a = await service._adjust_centroids_logic(after_b, vec_a, 1, service.determine_level(vec_a, after_b))
+        return start, after_b, after_a
+
+    start, after_b, after_a = asyncio.run(expected())
+    stored = CentroidSet.from_payload(data, int(version))
+    assert np.allclose(stored.matrix, after_a.matrix, atol=1e-6)
+
+    # drift 는 두 번의 이동량이 누적
+    expected_drift = service._drift_between(start, after_b) + service._drift_between(after_b, after_a)
+    assert float(drift) == pytest.approx(expected_drift, rel=1e-5)
+    assert saved_a.drift == pytest.approx(expected_drift, rel=1e-5)
+
+
+def test_gives_up_after_max_retries(service, monkeypatch):
+    monkeypatch.setattr(cs.CentroidService, "CAS_MAX_RETRIES", 3)
+    rng = np.random.default_rng(1)
+    initial = _initial(rng)
+    attempts = []
+
+    async def always_conflicting(current: CentroidSet):
+        attempts.append(current.version)
+        # 읽은 뒤 다른 레플리카가 매번 먼저 저장
+        await service.redis.incr(VERSION_KEY)
+        return current
+
+    async def scenario():
+        await service.redis.set(CENTROIDS_KEY, json.dumps(initial))
+        await service.redis.set(VERSION_KEY, 1)
+        with pytest.raises(RuntimeError):
+            await service.update_centroids(always_conflicting)
+        return await service.redis.mget(CENTROIDS_KEY, VERSION_KEY)
+
+    data, version = asyncio.run(scenario())
+
+    assert len(attempts) == 3
+    assert service.published == []
+    # 실패한 시도는 아무것도 저장하지 않음 (다른 쪽 INCR 만 남음)
+    assert json.loads(data) == initial
+    assert int(version) == 4
@@ -0,0 +1,59 @@
+# tests/test_centroid_store.py
+# 배치 재산출 / 초기 주입의 Centroid 덮어쓰기가 SET + version + drift 를 한 트랜잭션으로 쓰는지,
+# 스크립트 / 배치 작업이 서버와 같은 Redis 접속 설정을 쓰는지 확인 (user-006)
+import json
+
+import fakeredis
+import pytest
+from redis.exceptions import WatchError
+
+from app.core.redis_options import redis_options
+from app.services.centroid_store import (
+    CENTROIDS_KEY, VERSION_KEY, DRIFT_KEY, UPDATE_CHANNEL, DRIFT_INVALIDATE_ALL, overwrite_centroids,
+)
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_overwrite_writes_all_keys_and_publishes_new_version(client):
+    client.set(VERSION_KEY, 7)
+    client.set(DRIFT_KEY, 0.5)
+    pubsub = client.pubsub()
+    pubsub.subscribe(UPDATE_CHANNEL)
+    pubsub.get_message(timeout=1)
+
+    version = overwrite_centroids(client, json.dumps({"1": [1.0, 0.0]}))
+
+    assert version == 8
+    assert json.loads(client.get(CENTROIDS_KEY)) == {"1": [1.0, 0.0]}
+    assert float(client.get(DRIFT_KEY)) == pytest.approx(0.5 + DRIFT_INVALIDATE_ALL)
+    message = pubsub.get_message(timeout=1)
+    assert message["data"] == "8"
+
+
+def test_overwrite_conflicts_with_concurrent_cas_update(client):
+    # update_centroids 처럼 WATCH 후 읽은 사이에 덮어쓰기가 끝나면 EXEC 가 실패해야 함 (새 Centroid + 예전 drift 조합 방지)
+    with client.pipeline(transaction=True) as pipe:
+        pipe.watch(CENTROIDS_KEY, VERSION_KEY)
+        pipe.mget(CENTROIDS_KEY, VERSION_KEY, DRIFT_KEY)
+        overwrite_centroids(client, json.dumps({"1": [0.0, 1.0]}))
+        pipe.multi()
+        pipe.set(CENTROIDS_KEY, json.dumps({"1": [1.0, 0.0]}))
+        pipe.incr(VERSION_KEY)
+        with pytest.raises(WatchError):
+            pipe.execute()
+
+    assert json.loads(client.get(CENTROIDS_KEY)) == {"1": [0.0, 1.0]}
+
+
+def test_redis_options_match_server_settings():
+    url, kwargs = redis_options("cache.example", 6380, "p@ss/word")
+    assert url == "rediss://:p%40ss%2Fword@cache.example:6380"
+    assert kwargs == {"decode_responses": True, "ssl_cert_reqs": None}
+
+    url, kwargs = redis_options("localhost", 6379)
+    assert url == "redis://localhost:6379"
+    assert kwargs == {"decode_responses": True}
@@ -0,0 +1,91 @@
+# tests/test_collection_migration.py
+# 복사 중 들어온 쓰기(추가 / 삭제 / 이미 복사된 포인트의 재임베딩, payload 갱신)를 따라잡고,
+# 끝내 맞지 않으면 alias 전환 / 원본 삭제를 하지 않는지 확인 (user-014)
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient, models
+
+from app.db.collection_profiles import get_profile, collection_config, migrate_collection
+
+DIM = 8
+
+
+def _points(ids, seed=0):
+    rng = np.random.default_rng(seed)
+    return [models.PointStruct(id=i, vector=rng.normal(size=DIM).tolist(), payload={"level": 1}) for i in ids]
+
+
+@pytest.fixture
+def client():
+    client = QdrantClient(":memory:")
+    client.create_collection("santa_images", **collection_config(get_profile("default"), DIM))
+    client.upsert("santa_images", points=_points(range(1, 21)), wait=True)
+    return client
+
+
+def _write_during_copy(client, monkeypatch, on_first_scroll):
+    """원본의 첫 scroll 직후에 쓰기가 들어온 상황을 흉내냅니다."""
+    original = client.scroll
+    state = {"done": False}
+
+    def scroll(collection_name, **kwargs):
+        result = original(collection_name=collection_name, **kwargs)
+        if collection_name == "santa_images" and not state["done"]:
+            state["done"] = True
+            on_first_scroll()
+        return result
+
+    monkeypatch.setattr(client, "scroll", scroll)
+
+
+def test_migration_catches_up_writes_during_copy(client, monkeypatch):
+    # 첫 페이지(ID 1~5)를 읽은 뒤 앞쪽 ID 가 새로 들어오고 일부가 삭제됨
+    _write_during_copy(client, monkeypatch, lambda: (
+        client.upsert("santa_images", points=_points([0], seed=1), wait=True),
+        client.delete("santa_images", points_selector=models.PointIdsList(points=[2]), wait=True),
+    ))
+
+    target = migrate_collection(client, get_profile("float16"), batch_size=5, drop_source=True)
+
+    ids = sorted(p.id for p in client.scroll("santa_images", limit=100)[0])
+    assert ids == [0, 1] + list(range(3, 21))
+    assert client.get_aliases().aliases[0].collection_name == target
+
+
+def test_migration_catches_up_updates_to_already_copied_points(client, monkeypatch):
+    # 첫 페이지(ID 1~5)를 읽은 뒤, 이미 복사된 ID 1 은 재임베딩되고 ID 2 는 level / bound 만 바뀜
+    reembedded = _points([1], seed=7)[0]
+    reembedded.payload = {"level": 3, "bound": 0.5, "embedded_at": 2}
+    _write_during_copy(client, monkeypatch, lambda: (
+        client.upsert("santa_images", points=[reembedded], wait=True),
+        client.set_payload("santa_images", payload={"level": 4, "bound": 0.25}, points=[2], wait=True),
+    ))
+
+    migrate_collection(client, get_profile("float16"), batch_size=5, drop_source=True)
+
+    expected = np.asarray(reembedded.vector) / np.linalg.norm(reembedded.vector)
+    first, second = client.retrieve("santa_images", ids=[1, 2], with_vectors=True)
+    assert first.payload == reembedded.payload
+    assert np.allclose(first.vector, expected, atol=1e-3)
+    assert second.payload == {"level": 4, "bound": 0.25}
+
+
+def test_migration_keeps_source_when_counts_never_match(client, monkeypatch):
+    # 원본을 읽을 때마다 포인트가 늘어나는 상황: 따라잡기 후에도 건수가 다름
+    original = client.scroll
+    next_id = iter(range(100, 200))
+
+    def scroll(collection_name, **kwargs):
+        result = original(collection_name=collection_name, **kwargs)
+        if collection_name == "santa_images":
+            client.upsert("santa_images", points=_points([next(next_id)]), wait=True)
+        return result
+
+    monkeypatch.setattr(client, "scroll", scroll)
+
+    with pytest.raises(RuntimeError):
+        migrate_collection(client, get_profile("float16"), batch_size=50, drop_source=True)
+
+    # 원본은 그대로, alias 도 만들지 않음
+    assert client.collection_exists("santa_images")
+    assert client.get_aliases().aliases == []
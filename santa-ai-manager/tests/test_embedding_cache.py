@@ -0,0 +1,111 @@
+# tests/test_embedding_cache.py
+# EMBED_CACHE_BACKEND=redis: 앱과 같은 보안 Redis (비밀번호 + SSL) 에 붙는지, LRU 제거 확인 (user-023)
+# EmbeddingCache: float16 왕복, hit / miss 집계 (여러 스레드), 가중치 버전이 바뀌면 miss
+import threading
+from types import SimpleNamespace
+
+import fakeredis
+import numpy as np
+import redis
+
+from embedding.cache import DiskBackend, EmbeddingCache, RedisBackend, create_backend
+
+
+def test_redis_backend_uses_password_and_ssl(monkeypatch):
+    monkeypatch.setenv("REDIS_HOST", "cache.example.internal")
+    monkeypatch.setenv("REDIS_PORT", "6380")
+    monkeypatch.setenv("REDIS_PASSWORD", "p@ss:word/1")
+
+    pool = create_backend("redis").redis.connection_pool
+    kwargs = pool.connection_kwargs
+    assert pool.connection_class is redis.SSLConnection
+    assert kwargs["host"] == "cache.example.internal" and kwargs["port"] == 6380
+    assert kwargs["password"] == "p@ss:word/1"
+    assert kwargs["ssl_cert_reqs"] is None
+
+
+def test_redis_backend_without_password_is_plain(monkeypatch):
+    monkeypatch.setenv("REDIS_HOST", "localhost")
+    monkeypatch.delenv("REDIS_PASSWORD", raising=False)
+
+    pool = create_backend("redis").redis.connection_pool
+    assert pool.connection_class is redis.Connection
+    assert pool.connection_kwargs.get("password") is None
+
+
+def test_redis_backend_evicts_least_recently_used():
+    backend = RedisBackend(fakeredis.FakeRedis(), "test:embed", max_items=2)
+    backend.put_many({"a": b"1", "b": b"2"})
+    assert backend.get_many(["a"]) == [b"1"]   # a 가 더 최근에 사용됨
+    backend.put_many({"c": b"3"})
+
+    assert backend.get_many(["a", "b", "c"]) == [b"1", None, b"3"]
+    assert backend.evictions == 1
+
+
+def _engine(weights_version="v1"):
+    return SimpleNamespace(model_name="siglip", weights_version=weights_version, text_padding="max_length")
+
+
+def _vector(seed: int) -> np.ndarray:
+    v = np.random.default_rng(seed).normal(size=1152).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_vectors_round_trip_as_float16(tmp_path):
+    cache = EmbeddingCache(DiskBackend(str(tmp_path), max_bytes=1 << 20))
+    engine = _engine()
+    vector = _vector(0)
+    cache.put_images(engine, {"http://img/a.jpg": vector, "http://img/b.jpg": None})
+
+    hits = cache.image_vectors(engine, ["http://img/a.jpg", "http://img/b.jpg", "http://img/a.jpg"])
+    assert list(hits) == ["http://img/a.jpg"]
+    assert hits["http://img/a.jpg"].dtype == np.float32
+    assert np.array_equal(hits["http://img/a.jpg"], vector.astype(np.float16).astype(np.float32))
+    assert cache.stats["stores"] == 1
+
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = EmbeddingCache(DiskBackend(str(tmp_path), max_bytes=1 << 20))
+    engine = _engine()
+    cache.put_images(engine, {"a": _vector(1)})
+
+    cache.image_vectors(engine, ["a", "b", "c"])
+    cache.image_vectors(engine, ["a"])
+    stats = cache.stats
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 2, 0.5)
+
+    disabled = EmbeddingCache(None)
+    disabled.image_vectors(engine, ["a", "b"])
+    assert (disabled.stats["hits"], disabled.stats["misses"]) == (0, 2)
+
+
+def test_counters_are_exact_under_concurrent_lookups():
+    cache = EmbeddingCache(RedisBackend(fakeredis.FakeRedis(), "test:embed", max_items=100))
+    engine = _engine()
+    cache.put_images(engine, {"hit": _vector(2)})
+    threads_n, rounds = 8, 50
+
+    def _lookup():
+        for _ in range(rounds):
+            cache.image_vectors(engine, ["hit", "miss"])
+
+    threads = [threading.Thread(target=_lookup) for _ in range(threads_n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert cache.stats["hits"] == cache.stats["misses"] == threads_n * rounds
+
+
+def test_weights_version_change_misses(tmp_path):
+    cache = EmbeddingCache(DiskBackend(str(tmp_path), max_bytes=1 << 20))
+    cache.put_images(_engine("v1"), {"a": _vector(3)})
+
+    assert cache.image_vectors(_engine("v2"), ["a"]) == {}
+    assert cache.image_key(_engine("v1"), "a") != cache.image_key(_engine("v2"), "a")
+    # 텍스트 키도 가중치 버전을 따름
+    assert cache.text_key(_engine("v1"), "hello") != cache.text_key(_engine("v2"), "hello")
+    assert "a" in cache.image_vectors(_engine("v1"), ["a"])
+    assert (cache.stats["hits"], cache.stats["misses"]) == (1, 1)
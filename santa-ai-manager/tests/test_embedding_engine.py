@@ -0,0 +1,73 @@
+# tests/test_embedding_engine.py
+# EmbeddingEngine: 로드 / 재사용, 배치 인코딩 == 건별 인코딩, 가중치 hot-swap (user-020)
+# tiny SigLIP (랜덤 가중치, CPU) 사용. torch / transformers 가 없으면 건너뜀 (Modal 이미지 전용 의존성)
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from embedding.engine import EmbeddingEngine, get_engine
+from embedding.tiny import build_tiny_model, random_image, TINY_DIM
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    return build_tiny_model(str(tmp_path_factory.mktemp("tiny-siglip") / "model"))
+
+
+def _posts():
+    return [
+        ([random_image(0), random_image(1)], "hello santa"),
+        ([random_image(2)], None),
+        ([], "merry christmas 2024"),
+        ([random_image(3), random_image(4), random_image(5)], "ho ho ho"),
+        ([], None),
+    ]
+
+
+def test_get_engine_loads_once_and_returns_unit_vectors(model_dir):
+    engine = get_engine(model_dir, device="cpu")
+    assert get_engine(model_dir, device="cpu") is engine
+    assert engine.weights_version == "base"
+
+    vector = engine.embed_post([random_image(0)], "hello")
+    assert vector.shape == (TINY_DIM,)
+    assert np.isclose(np.linalg.norm(vector), 1.0, atol=1e-5)
+
+
+def test_batched_embedding_matches_per_post(model_dir):
+    engine = EmbeddingEngine(model_dir, device="cpu").load()
+    # 배치 경계가 게시물 경계와 어긋나도 결과가 같아야 함
+    engine.image_batch_size = 2
+    engine.text_batch_size = 2
+
+    batched = engine.embed_posts(_posts())
+    single = [engine.embed_post(images, content) for images, content in _posts()]
+
+    assert batched[-1] is None and single[-1] is None
+    for got, expected in zip(batched[:-1], single[:-1]):
+        np.testing.assert_allclose(got, expected, atol=1e-5)
+
+
+def test_weights_hot_swap(model_dir, tmp_path):
+    weights = str(tmp_path / "siglip_best.pth")
+    engine = get_engine(model_dir, weights, device="cpu")
+    before = engine.embed_post([random_image(0)], "hello santa")
+    assert engine.weights_version == "base"
+
+    state = {k: v + 0.01 for k, v in engine.model.state_dict().items() if v.is_floating_point()}
+    torch.save(state, weights)
+    assert get_engine(model_dir, weights, device="cpu") is engine
+    assert engine.reloads == 1
+    assert engine.weights_version != "base"
+    after = engine.embed_post([random_image(0)], "hello santa")
+    assert np.linalg.norm(after - before) > 1e-3
+
+    # 변경이 없으면 다시 로드하지 않고, 파일이 잠깐 사라져도 지금 가중치를 유지
+    assert engine.maybe_reload() is False
+    os.remove(weights)
+    assert engine.maybe_reload() is False
+    np.testing.assert_allclose(engine.embed_post([random_image(0)], "hello santa"), after, atol=1e-6)
@@ -0,0 +1,130 @@
+# tests/test_embedding_pipeline.py
+# 소비 측이 run() 을 중간에 멈춰도 (에러 없이 close) 단계 스레드가 바로 끝나는지 확인 (user-025)
+# run() 전체 흐름: 입력 순서 유지, 실패 이미지는 None, 단계별 처리량 / 큐 점유 stats
+import time
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import embedding.pipeline as pipeline_module
+from embedding.pipeline import EmbeddingPipeline
+
+
+def test_close_stops_idle_stage_threads_without_error():
+    pipeline = EmbeddingPipeline(engine=None, fetcher=None, decode_workers=0)
+    # 다운로드 큐가 빈 채로 기다리는 디코드 단계 (입력이 아직 안 들어온 상황)
+    pipeline._threads = [
+        threading.Thread(target=pipeline._guard, args=(pipeline._dispatch,), name="pipeline-decode", daemon=True)
+    ]
+    pipeline._threads[0].start()
+
+    started = time.perf_counter()
+    pipeline.close()
+
+    assert not pipeline._threads[0].is_alive()
+    assert time.perf_counter() - started < 1.0
+    assert pipeline._error is None
+
+
+# ---------------------------------------------------------
+# run() 전체 흐름 (CPU, 스텁 엔진 / fetcher / 이미지 프로세서)
+# ---------------------------------------------------------
+def _png(value: int) -> bytes:
+    buf = BytesIO()
+    Image.new("RGB", (4, 4), (value, 0, 0)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class _StubProcessor:
+    """transformers 이미지 프로세서 대신: 이미지 -> (1, C, H, W) float32"""
+
+    def __call__(self, images, return_tensors):
+        return {"pixel_values": np.asarray(images, dtype=np.float32).transpose(2, 0, 1)[None]}
+
+
+class _StubEngine:
+    model_name = "stub"
+    image_batch_size = 4
+
+    def __init__(self, poison: int):
+        self.poison = poison
+        self.calls = []
+
+    def load(self):
+        pass
+
+    def encode_pixels(self, pixels):
+        self.calls.append(len(pixels))
+        # 빨강 채널 값이 poison 인 이미지가 섞이면 배치 전체가 실패 (한 장씩 재시도 경로)
+        if (pixels[:, 0, 0, 0] == self.poison).any():
+            raise RuntimeError("bad image")
+        return pixels[:, 0, 0, :1].copy()
+
+
+class _StubFetcher:
+    max_workers = 2
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def fetch_raw(self, url):
+        time.sleep(0.005)
+        return self.blobs.get(url)
+
+    def submit(self, fn, *args):
+        return self._pool.submit(fn, *args)
+
+
+def test_run_yields_posts_in_order_with_failed_images_as_none(monkeypatch):
+    # transformers 없이: 디코드 스레드 initializer 가 스텁 프로세서를 올림
+    monkeypatch.setattr(
+        pipeline_module, "_init_decoder",
+        lambda model_name: setattr(pipeline_module, "_image_processor", _StubProcessor()),
+    )
+    monkeypatch.setattr(pipeline_module, "_image_processor", None)
+
+    # 게시물 p 의 k 번째 이미지 값 = 10 * p + k + 1
+    posts = [[f"http://img/{p}/{k}.png" for k in range(p % 4)] for p in range(9)]
+    blobs = {url: _png(10 * p + k + 1) for p, urls in enumerate(posts) for k, url in enumerate(urls)}
+    missing = posts[3][1]           # 다운로드 실패
+    broken = posts[5][0]            # 디코드 실패
+    poisoned = posts[7][2]          # 인코딩 실패 (같은 배치의 나머지는 살아야 함)
+    del blobs[missing]
+    blobs[broken] = b"not an image"
+
+    engine = _StubEngine(poison=73)
+    pipeline = EmbeddingPipeline(engine, _StubFetcher(blobs), decode_workers=0, queue_size=2, max_wait=0.01)
+    results = list(pipeline.run((p, urls) for p, urls in enumerate(posts)))
+
+    assert [tag for tag, _ in results] == list(range(len(posts)))
+    for p, vectors in results:
+        assert set(vectors) == set(posts[p])
+        for k, url in enumerate(posts[p]):
+            if url in (missing, broken, poisoned):
+                assert vectors[url] is None
+            else:
+                assert vectors[url][0] == 10 * p + k + 1
+
+    # 게시물 단위로 모아서 배치 forward (게시물은 쪼개지 않으므로 image_batch_size 를 한 게시물만큼 넘을 수 있음)
+    assert max(engine.calls) > 1
+    # poison 이 섞인 배치는 한 장씩 재시도
+    assert 1 in engine.calls
+    assert pipeline._error is None and not any(t.is_alive() for t in pipeline._threads)
+
+    stats = pipeline.stats
+    for stage in ("download", "decode", "encode"):
+        assert {"items", "per_s", "busy_s", "utilization"} <= set(stats[stage])
+    assert stats["download"]["items"] == sum(len(urls) for urls in posts)
+    assert stats["decode"]["items"] == stats["download"]["items"] - 2
+    assert stats["encode"]["items"] == stats["decode"]["items"]
+    assert stats["encode"]["batches"] == pipeline.batches > 0
+    assert {"avg_batch", "wait_s"} <= set(stats["encode"])
+    for name in ("download", "decode"):
+        assert set(stats["queues"][name]) == {"capacity", "avg", "max"}
+        assert stats["queues"][name]["capacity"] == 2
+        assert stats["queues"][name]["max"] <= 2
+    assert stats["wall_s"] > 0 and stats["decode_workers"] == 0
@@ -0,0 +1,131 @@
+# tests/test_image_fetcher.py
+# ImageFetcher: 도착 순서와 무관하게 입력 / 게시물 순서 유지, 실패 / 크기 초과 처리, 호스트별 동시 요청 제한 (user-021)
+import time
+import threading
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("PIL")
+
+from embedding.fetcher import ImageFetcher
+from embedding.tiny import random_image
+
+MAX_BYTES = 64 * 1024
+
+
+def _png(width: int) -> bytes:
+    buf = BytesIO()
+    random_image(width, size=(width, 8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def server():
+    """
+    /img/<width>?delay=초 : 가로 크기로 구분되는 이미지
+    /missing             : 404
+    /big                 : max_bytes 보다 큰 응답 (Content-Length 없음)
+    /garbage             : 이미지가 아닌 바이트
+    """
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            try:
+                time.sleep(float(parse_qs(url.query).get("delay", ["0"])[0]))
+                if url.path.startswith("/img/"):
+                    self._send(_png(int(url.path.split("/")[-1])))
+                elif url.path == "/big":
+                    self.send_response(200)
+                    self.end_headers()
+                    self.wfile.write(b"\0" * (MAX_BYTES * 2))
+                elif url.path == "/garbage":
+                    self._send(b"not an image")
+                else:
+                    self.send_error(404)
+            finally:
+                with lock:
+                    state["active"] -= 1
+
+        def _send(self, body: bytes):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = ImageFetcher(max_workers=8, per_host=8, timeout=5, max_bytes=MAX_BYTES)
+    yield fetcher
+    fetcher.close()
+
+
+def _widths(images):
+    return [None if img is None else img.size[0] for img in images]
+
+
+def test_fetch_all_keeps_input_order(server, fetcher):
+    base, _ = server
+    # 뒤쪽 URL 이 먼저 도착하도록 지연을 거꾸로 줌
+    widths = [10, 11, 12, 13, 14, 15]
+    urls = [f"{base}/img/{w}?delay={0.05 * (len(widths) - i)}" for i, w in enumerate(widths)]
+
+    arrived = [index for index, _ in fetcher.iter_completed(urls)]
+    assert arrived != sorted(arrived)
+    assert _widths(fetcher.fetch_all(urls)) == widths
+
+
+def test_failures_become_none_and_are_counted(server, fetcher):
+    base, _ = server
+    urls = [f"{base}/img/20", f"{base}/missing", f"{base}/big", f"{base}/garbage", f"{base}/img/21"]
+
+    assert _widths(fetcher.fetch_all(urls)) == [20, None, None, None, 21]
+    assert fetcher.stats["fetched"] == 2
+    assert fetcher.stats["failed"] == 3
+    assert fetcher.stats["too_large"] == 1
+
+
+def test_iter_posts_yields_in_post_order(server, fetcher):
+    base, _ = server
+    posts = [
+        [f"{base}/img/30?delay=0.2", f"{base}/img/31"],
+        [],
+        [f"{base}/missing", f"{base}/img/32?delay=0.1"],
+        [f"{base}/img/33"],
+    ]
+    # 제너레이터 입력 + lookahead 보다 게시물이 많은 경우
+    got = [_widths(images) for images in fetcher.iter_posts((p for p in posts), lookahead=2)]
+    assert got == [[30, 31], [], [32], [33]]
+
+    kept = [_widths(images) for images in fetcher.iter_posts(posts, keep_failed=True)]
+    assert kept == [[30, 31], [], [None, 32], [33]]
+
+
+def test_per_host_limit(server):
+    base, state = server
+    fetcher = ImageFetcher(max_workers=8, per_host=2, timeout=5, max_bytes=MAX_BYTES)
+    try:
+        images = fetcher.fetch_all([f"{base}/img/{40 + i}?delay=0.05" for i in range(8)])
+    finally:
+        fetcher.close()
+    assert all(img is not None for img in images)
+    assert state["peak"] <= 2
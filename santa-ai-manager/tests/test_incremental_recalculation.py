@@ -0,0 +1,84 @@
+# tests/test_incremental_recalculation.py
+# 증분 재계산(bound <= drift 인 포스트만 재채점)이 피드백이 여러 번 쌓인 뒤에도
+# 전체 재채점과 같은 레벨을 남기는지 확인 (user-006)
+import asyncio
+from dataclasses import replace
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from app.services import centroid_service as cs
+from app.services.centroid_cache import CentroidSet
+
+DIM = 16
+POSTS = 400
+LEVELS = 5
+
+
+class FakeConnection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt, params=None):
+        pass
+
+    def commit(self):
+        pass
+
+
+class FakeEngine:
+    def connect(self):
+        return FakeConnection()
+
+
+def _unit(rows):
+    return rows / np.linalg.norm(rows, axis=-1, keepdims=True)
+
+
+def test_incremental_pass_matches_full_rescore_after_feedback(monkeypatch):
+    rng = np.random.default_rng(0)
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(
+        "santa_images", vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE)
+    )
+    vectors = _unit(rng.normal(size=(POSTS, DIM))).astype(np.float32)
+    qdrant.upsert("santa_images", points=[
+        models.PointStruct(id=i + 1, vector=v.tolist(), payload={"post_id": i + 1}) for i, v in enumerate(vectors)
+    ], wait=True)
+
+    monkeypatch.setattr(cs, "engine", FakeEngine())
+    monkeypatch.setattr(cs.settings, "RECALC_TRUST_PAYLOAD_LEVEL", True)
+    monkeypatch.setattr(cs.settings, "RECALC_PAGE_SIZE", 64)
+    service = cs.CentroidService()
+    monkeypatch.setattr(service, "qdrant", qdrant)
+
+    centroid_set = CentroidSet.from_dict(
+        {str(i + 1): c.tolist() for i, c in enumerate(_unit(rng.normal(size=(LEVELS, DIM))))}, version=1
+    )
+    # 첫 재계산은 bound 가 없으므로 전부 채점
+    monkeypatch.setattr(cs.settings, "RECALC_MODE", "incremental")
+    assert service._recalculate_range(centroid_set)[0] == POSTS
+
+    skipped = 0
+    for step in range(8):
+        # 피드백 한 건 반영 (update_centroids 와 같이 drift 누적)
+        post = int(rng.integers(POSTS))
+        correct = int(rng.integers(1, LEVELS + 1))
+        current = service.determine_level(vectors[post], centroid_set)
+        moved = asyncio.run(service._adjust_centroids_logic(centroid_set, vectors[post], correct, current))
+        centroid_set = replace(moved, version=centroid_set.version + 1,
+                               drift=centroid_set.drift + service._drift_between(centroid_set, moved))
+
+        processed, _ = service._recalculate_range(centroid_set)
+        skipped += POSTS - processed
+
+        points, _ = qdrant.scroll("santa_images", limit=POSTS, with_payload=["level"])
+        stored = {p.id: p.payload["level"] for p in points}
+        expected = centroid_set.assign(vectors)
+        assert [stored[i + 1] for i in range(POSTS)] == expected.tolist(), f"step {step}"
+
+    # 실제로 재채점을 건너뛴 포스트가 있어야 의미 있는 검증
+    assert skipped > 0
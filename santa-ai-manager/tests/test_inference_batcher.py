@@ -0,0 +1,77 @@
+# tests/test_inference_batcher.py
+# InferenceBatcher 가 크기 / 지연 기준으로 묶어서 spawn 하는지 확인 (user-018)
+import time
+import asyncio
+
+from app.services.inference_batcher import InferenceBatcher
+
+
+class StubFunction:
+    """Modal Function.spawn 대신 호출 인자를 기록"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    def spawn(self, jobs, **kwargs):
+        self.calls.append((time.monotonic(), [job["job_id"] for job in jobs], kwargs))
+        if self.fail:
+            raise RuntimeError("modal unavailable")
+
+
+def _batcher(stub, max_items, max_delay_ms):
+    return InferenceBatcher(max_items=max_items, max_delay_ms=max_delay_ms, resolve_function=lambda name: stub)
+
+
+def test_flushes_when_batch_is_full():
+    stub = StubFunction()
+
+    async def scenario():
+        # 지연 기준은 충분히 길게: 크기 기준으로만 flush 되어야 함
+        batcher = _batcher(stub, max_items=4, max_delay_ms=5000)
+        started = time.monotonic()
+        results = await asyncio.gather(*(batcher.submit({"job_id": i}) for i in range(8)))
+        elapsed = time.monotonic() - started
+        await batcher.stop()
+        return batcher, results, elapsed
+
+    batcher, results, elapsed = asyncio.run(scenario())
+    assert results == [True] * 8
+    assert [ids for _, ids, _ in stub.calls] == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert elapsed < 1.0
+    assert batcher.stats["batches"] == 2 and batcher.stats["avg_batch_size"] == 4.0
+    assert stub.calls[0][2]["callback_url"].endswith("/internal/inference-results")
+
+
+def test_flushes_partial_batch_after_max_delay():
+    stub = StubFunction()
+
+    async def scenario():
+        batcher = _batcher(stub, max_items=10, max_delay_ms=100)
+        started = time.monotonic()
+        results = await asyncio.gather(*(batcher.submit({"job_id": i}) for i in range(3)))
+        await batcher.stop()
+        return results, started
+
+    results, started = asyncio.run(scenario())
+    assert results == [True] * 3
+    assert len(stub.calls) == 1
+    flushed_at, ids, _ = stub.calls[0]
+    assert ids == [0, 1, 2]
+    assert 0.09 <= flushed_at - started < 1.0
+
+
+def test_failed_spawn_is_reported_to_every_submitter():
+    stub = StubFunction(fail=True)
+
+    async def scenario():
+        batcher = _batcher(stub, max_items=2, max_delay_ms=50)
+        results = await asyncio.gather(*(batcher.submit({"job_id": i}) for i in range(3)))
+        await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    # 실패한 배치의 작업은 ACK 하지 않도록 False
+    assert results == [False] * 3
+    assert batcher.stats["failed_batches"] == 2
+    assert not batcher.running
@@ -0,0 +1,91 @@
+# tests/test_inference_dispatcher.py
+# 추론 디스패치 동시 실행 제한 (user-017)
+# - 슬롯이 다 차면 워커가 큐에서 더 꺼내지 않음 (backpressure)
+# - 실행 중인 태스크를 추적하고 끝나면 슬롯 반환
+# - drain(timeout) 은 기다렸다가 남은 태스크를 취소
+import asyncio
+
+import fakeredis
+
+from app.core.config import settings
+from app.services import worker
+from app.services.inference_dispatcher import InferenceDispatcher
+from app.services.queue_backend import ListQueue
+
+MAX_IN_FLIGHT = 3
+JOBS = 10
+
+
+def test_popping_pauses_while_saturated(monkeypatch):
+    dispatcher = InferenceDispatcher(max_in_flight=MAX_IN_FLIGHT)
+    monkeypatch.setattr(worker, "inference_dispatcher", dispatcher)
+    monkeypatch.setattr(settings, "INFERENCE_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "QUEUE_READ_COUNT", 10)
+    monkeypatch.setattr(settings, "QUEUE_BLOCK_MS", 10)
+
+    gate = asyncio.Event()
+    running, peak, done = [], [], []
+
+    async def slow_trigger(job):
+        running.append(job["job_id"])
+        peak.append(len(running))
+        await gate.wait()
+        running.remove(job["job_id"])
+        done.append(job["job_id"])
+        return True
+
+    monkeypatch.setattr(worker, "trigger_inference", slow_trigger)
+
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        queue = ListQueue(redis, "test:inference")
+        for i in range(JOBS):
+            await queue.push({"job_id": i})
+
+        loop_task = asyncio.create_task(worker.watch_inference_queue(queue))
+        await asyncio.sleep(0.2)
+
+        # 슬롯 3개가 모두 실행 중이면 나머지는 큐에 그대로 남아 있어야 함
+        saturated = (dispatcher.in_flight, dispatcher.stats["reserved"], await redis.llen("test:inference"))
+
+        gate.set()
+        for _ in range(100):
+            if len(done) == JOBS:
+                break
+            await asyncio.sleep(0.02)
+
+        loop_task.cancel()
+        await asyncio.gather(loop_task, return_exceptions=True)
+        return saturated
+
+    in_flight, reserved, left = asyncio.run(scenario())
+
+    assert (in_flight, reserved, left) == (MAX_IN_FLIGHT, MAX_IN_FLIGHT, JOBS - MAX_IN_FLIGHT)
+    assert max(peak) == MAX_IN_FLIGHT
+    assert sorted(done) == list(range(JOBS))
+    assert dispatcher.stats["completed"] == JOBS
+    assert dispatcher.stats["saturated_waits"] >= 1
+    assert dispatcher.in_flight == 0
+
+
+def test_drain_waits_then_cancels_stragglers():
+    dispatcher = InferenceDispatcher(max_in_flight=4)
+    finished = []
+
+    async def job(name, seconds):
+        await asyncio.sleep(seconds)
+        finished.append(name)
+
+    async def scenario():
+        for name, seconds in (("fast", 0.01), ("slow", 10)):
+            await dispatcher.reserve(1)
+            dispatcher.spawn(job(name, seconds))
+        await dispatcher.drain(timeout=0.2)
+        return dispatcher.stats
+
+    stats = asyncio.run(scenario())
+
+    assert finished == ["fast"]
+    assert stats["in_flight"] == 0
+    assert stats["reserved"] == 0
+    assert (stats["completed"], stats["failed"]) == (1, 1)
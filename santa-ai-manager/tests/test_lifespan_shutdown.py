@@ -0,0 +1,79 @@
+# tests/test_lifespan_shutdown.py
+# 종료 순서: 워커 / 재계산이 멈춘 뒤에 미러를 flush·close 하고, 그 뒤에 WandB / 공용 연결을 닫는지 확인 (user-010, user-012)
+import asyncio
+
+from fastapi import FastAPI
+
+from app import main
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def sync(self, name):
+        return lambda *args, **kwargs: self.calls.append(name)
+
+    def coro(self, name):
+        async def record(*args, **kwargs):
+            self.calls.append(name)
+        return record
+
+
+class Stub:
+    pass
+
+
+def test_shutdown_closes_mirror_after_worker_and_recalculation(monkeypatch):
+    rec = Recorder()
+    monkeypatch.setattr(main.settings, "MIRROR_ENABLED", True)
+    monkeypatch.setattr(main.settings, "EMBEDDED_WORKER_ENABLED", True)
+    monkeypatch.setattr(main.settings, "WRITE_BEHIND_ENABLED", False)
+    monkeypatch.setattr(main, "init_system", lambda: None)
+
+    async def worker(role):
+        try:
+            await asyncio.Event().wait()
+        finally:
+            rec.calls.append("worker_stopped")
+
+    async def reconcile_loop():
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(main, "start_worker", worker)
+    monkeypatch.setattr(main, "run_mirror_reconciliation", reconcile_loop)
+
+    stubs = {
+        "centroid_cache": {"start": rec.sync("cache_start"), "stop": rec.coro("cache_stop")},
+        "write_behind": {"start": rec.sync("wb_start"), "stop": rec.coro("write_behind_stop")},
+        "embedding_mirror": {"open": rec.sync("mirror_open"), "flush": rec.sync("mirror_flush"), "close": rec.sync("mirror_close")},
+        "wandb_service": {"start": rec.sync("wandb_start"), "close": rec.sync("wandb_close")},
+        "inference_dispatcher": {"drain": rec.coro("dispatcher_drain")},
+        "inference_batcher": {"stop": rec.coro("batcher_stop")},
+        "centroid_service": {"cancel_recalculation": rec.coro("recalc_cancel"), "close": rec.sync("recalc_close")},
+    }
+    for name, methods in stubs.items():
+        stub = Stub()
+        for method, fn in methods.items():
+            setattr(stub, method, fn)
+        monkeypatch.setattr(main, name, stub)
+    monkeypatch.setattr(main, "close_connections", rec.coro("close_connections"))
+
+    async def run():
+        async with main.lifespan(FastAPI()):
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    order = rec.calls
+    assert "mirror_flush" not in order
+    for before, after in [
+        ("worker_stopped", "mirror_close"),
+        ("recalc_cancel", "mirror_close"),
+        ("recalc_close", "mirror_close"),
+        ("worker_stopped", "wandb_close"),
+        ("recalc_cancel", "wandb_close"),
+        ("mirror_close", "close_connections"),
+        ("wandb_close", "close_connections"),
+    ]:
+        assert order.index(before) < order.index(after), order
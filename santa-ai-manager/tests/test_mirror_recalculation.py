@@ -0,0 +1,229 @@
+# tests/test_mirror_recalculation.py
+# 미러 경로 재계산이 Qdrant 스크롤 경로와 같은 payload (level + bound) 를 쓰는지 (user-010),
+# 미러에 저장된 bound 로 만료된 행만 채점 / 갱신하는지 (user-010),
+# 웹훅을 받지 않는 워커의 미러도 재계산 전에 Qdrant 와 맞추는지 확인 (user-019),
+# 다시 임베딩되거나 삭제 후 다시 들어온 포인트의 벡터를 정합성 맞춤에서 갱신하는지 확인 (user-010)
+from dataclasses import replace
+
+import numpy as np
+
+from app.services import centroid_service as cs
+from app.services.embedding_mirror import EmbeddingMirror
+from app.services.centroid_cache import CentroidSet
+
+DIM = 8
+
+
+class FakeQdrant:
+    def __init__(self):
+        self.payloads = {}
+
+    def batch_update_points(self, collection_name, update_operations):
+        for op in update_operations:
+            for pid in op.set_payload.points:
+                self.payloads[pid] = op.set_payload.payload
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt, params=None):
+        self.executed += 1
+
+    def commit(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def connect(self):
+        return self.conn
+
+
+def test_mirror_recalculation_writes_level_and_bound(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    mirror = EmbeddingMirror(str(tmp_path / "mirror"), dim=DIM)
+    vectors = rng.normal(size=(50, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    post_ids = list(range(1, 51))
+    mirror.upsert(post_ids, vectors, [1] * 50)
+
+    centroids = {str(i + 1): rng.normal(size=DIM).tolist() for i in range(4)}
+    centroid_set = CentroidSet.from_dict(centroids, version=2)
+    expected_levels, margins = centroid_set.score(vectors)
+    expected_bounds = centroid_set.bounds(margins)
+
+    qdrant, engine = FakeQdrant(), FakeEngine()
+    monkeypatch.setattr(cs, "embedding_mirror", mirror)
+    monkeypatch.setattr(cs, "engine", engine)
+    service = cs.CentroidService()
+    monkeypatch.setattr(service, "qdrant", qdrant)
+
+    processed, changed = service._recalculate_from_mirror(centroid_set)
+
+    assert processed == 50
+    assert changed == int((expected_levels != 1).sum())
+    # 레벨이 그대로인 포스트도 포함해 모든 포인트에 bound 가 기록되어야 함
+    assert sorted(qdrant.payloads) == post_ids
+    for pid, level, bound in zip(post_ids, expected_levels, expected_bounds):
+        assert qdrant.payloads[pid]["level"] == int(level)
+        assert qdrant.payloads[pid]["bound"] == bound
+    _, _, mirror_levels = mirror.snapshot()
+    assert np.array_equal(mirror_levels, expected_levels)
+
+
+def test_recalculation_syncs_mirror_that_receives_no_webhooks(tmp_path, monkeypatch):
+    # 독립 워커의 빈 미러: 포스트는 API 쪽 웹훅으로 Qdrant 에만 들어와 있음
+    from qdrant_client import QdrantClient, models
+
+    rng = np.random.default_rng(1)
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(
+        "santa_images", vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE)
+    )
+    vectors = rng.normal(size=(30, DIM)).astype(np.float32)
+    qdrant.upsert("santa_images", points=[
+        models.PointStruct(id=i + 1, vector=v.tolist(), payload={"level": 1}) for i, v in enumerate(vectors)
+    ], wait=True)
+
+    mirror = EmbeddingMirror(str(tmp_path / "worker-0"), dim=DIM)
+    monkeypatch.setattr(cs, "embedding_mirror", mirror)
+    monkeypatch.setattr(cs, "engine", FakeEngine())
+    monkeypatch.setattr(cs.settings, "MIRROR_ENABLED", True)
+    service = cs.CentroidService()
+    monkeypatch.setattr(service, "qdrant", qdrant)
+
+    centroid_set = CentroidSet.from_dict({str(i + 1): rng.normal(size=DIM).tolist() for i in range(3)}, version=2)
+    service._recalculate_all_posts_levels(centroid_set)
+
+    assert len(mirror) == 30
+    points, _ = qdrant.scroll("santa_images", limit=100, with_vectors=True)
+    for point in points:
+        level, _ = centroid_set.score(np.asarray([point.vector], dtype=np.float32))
+        assert point.payload["level"] == int(level[0])
+        assert "bound" in point.payload
+
+
+def test_reconcile_refreshes_reembedded_and_reinserted_vectors(tmp_path):
+    from qdrant_client import QdrantClient, models
+
+    rng = np.random.default_rng(2)
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(
+        "santa_images", vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE)
+    )
+
+    def write(pid, vector, marker):
+        qdrant.upsert("santa_images", points=[
+            models.PointStruct(id=pid, vector=vector.tolist(), payload={"level": 1, "embedded_at": marker})
+        ], wait=True)
+
+    def unit(v):
+        return v / np.linalg.norm(v)
+
+    old = [unit(rng.normal(size=DIM).astype(np.float32)) for _ in range(3)]
+    for pid, vec in enumerate(old, start=1):
+        write(pid, vec, 100)
+
+    mirror = EmbeddingMirror(str(tmp_path / "worker-0"), dim=DIM)
+    assert mirror.reconcile(qdrant)["added"] == 3
+
+    # 1 번은 다시 임베딩, 2 번은 삭제 후 새 벡터로 다시 들어옴, 3 번은 그대로
+    qdrant.delete("santa_images", points_selector=models.PointIdsList(points=[2]), wait=True)
+    assert mirror.reconcile(qdrant)["removed"] == 1
+    new1 = unit(rng.normal(size=DIM).astype(np.float32))
+    write(1, new1, 200)
+    new2 = unit(rng.normal(size=DIM).astype(np.float32))
+    write(2, new2, 300)
+
+    report = mirror.reconcile(qdrant)
+
+    assert report["refreshed"] == 2
+    vectors, post_ids, levels = mirror.snapshot()
+    rows = {int(pid): i for i, pid in enumerate(post_ids)}
+    assert np.allclose(vectors[rows[1]], new1, atol=1e-6)
+    assert np.allclose(vectors[rows[2]], new2, atol=1e-6)
+    assert np.allclose(vectors[rows[3]], old[2], atol=1e-6)
+    assert levels[rows[2]] == 1
+
+
+def test_mirror_recalculation_only_touches_expired_bounds(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    mirror = EmbeddingMirror(str(tmp_path / "mirror"), dim=DIM)
+    vectors = rng.normal(size=(40, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    post_ids = list(range(1, 41))
+    mirror.upsert(post_ids, vectors, [1] * 40)
+
+    qdrant = FakeQdrant()
+    monkeypatch.setattr(cs, "embedding_mirror", mirror)
+    monkeypatch.setattr(cs, "engine", FakeEngine())
+    monkeypatch.setattr(cs.settings, "RECALC_MODE", "incremental")
+    service = cs.CentroidService()
+    monkeypatch.setattr(service, "qdrant", qdrant)
+
+    centroid_set = CentroidSet.from_dict({str(i + 1): rng.normal(size=DIM).tolist() for i in range(4)}, version=2)
+    # bound 가 없는 첫 재계산은 전부 채점
+    assert service._recalculate_from_mirror(centroid_set)[0] == 40
+
+    # drift 가 그대로면 만료된 bound 가 없으므로 채점 / Qdrant 쓰기 없음
+    qdrant.payloads.clear()
+    assert service._recalculate_from_mirror(centroid_set) == (0, 0)
+    assert qdrant.payloads == {}
+
+    # drift 가 일부 bound 를 넘으면 그 행만 다시 채점
+    bounds = mirror.bounds().copy()
+    drift = float(np.median(bounds))
+    moved = replace(centroid_set, drift=drift)
+    expected = {pid for pid, b in zip(post_ids, bounds) if b <= drift + service.BOUND_EPSILON}
+    processed, _ = service._recalculate_from_mirror(moved)
+    assert processed == len(expected)
+    assert set(qdrant.payloads) == expected
+    assert (mirror.bounds() > drift + service.BOUND_EPSILON).all()
+
+    # full 모드는 전부 채점하지만, 레벨도 그대로이고 bound 도 유효하면 쓰지 않음
+    monkeypatch.setattr(cs.settings, "RECALC_MODE", "full")
+    qdrant.payloads.clear()
+    assert service._recalculate_from_mirror(moved)[0] == 40
+    assert qdrant.payloads == {}
+
+
+def test_reconcile_if_stale_skips_recent_reconcile(tmp_path):
+    class CountingQdrant:
+        calls = 0
+
+        def scroll(self, **kwargs):
+            self.calls += 1
+            return [], None
+
+    qdrant = CountingQdrant()
+    mirror = EmbeddingMirror(str(tmp_path / "mirror"), dim=DIM)
+    assert mirror.reconcile_if_stale(qdrant, max_age=300) is not None
+    assert mirror.reconcile_if_stale(qdrant, max_age=300) is None
+    assert mirror.reconcile_if_stale(qdrant, max_age=0) is not None
+    assert qdrant.calls == 2
+
+
+def test_close_persists_scores_and_ignores_late_writes(tmp_path):
+    mirror = EmbeddingMirror(str(tmp_path / "mirror"), dim=DIM)
+    mirror.upsert([1, 2], np.eye(2, DIM, dtype=np.float32), [1, 1])
+    mirror.set_scores([1], [3], [0.5])
+    mirror.close()
+
+    # 종료 후 늦게 온 재계산 결과는 무시 (닫힌 memmap 에 쓰지 않음)
+    mirror.set_scores([2], [4], [0.25])
+
+    reopened = EmbeddingMirror(str(tmp_path / "mirror"), dim=DIM)
+    _, post_ids, levels = reopened.snapshot()
+    assert post_ids.tolist() == [1, 2]
+    assert levels.tolist() == [3, 1]
+    assert reopened.bounds()[0] == 0.5
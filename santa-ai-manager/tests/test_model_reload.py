@@ -0,0 +1,67 @@
+# tests/test_model_reload.py
+# Modal 추론 컨테이너: 볼륨 reload 는 요청마다가 아니라 MODEL_RELOAD_INTERVAL 마다 (user-018)
+from types import SimpleNamespace
+
+import pytest
+
+import embedding
+
+modal_deploy = pytest.importorskip("modal_deploy")
+
+
+class _Volume:
+    def __init__(self, fail: bool = False):
+        self.reloads = 0
+        self.fail = fail
+
+    def reload(self):
+        self.reloads += 1
+        if self.fail:
+            raise RuntimeError("open files")
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    weights = tmp_path / "siglip_best.pth"
+    weights.write_bytes(b"weights")
+    now = [1000.0]
+    monkeypatch.setattr(modal_deploy, "MODEL_PATH", str(weights))
+    monkeypatch.setattr(modal_deploy, "MODEL_RELOAD_INTERVAL", 60.0)
+    monkeypatch.setattr(modal_deploy, "_last_volume_reload", None)
+    monkeypatch.setattr(modal_deploy, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(embedding, "get_engine", lambda weights_path: ("engine", weights_path))
+    return now
+
+
+def test_volume_reloads_only_after_interval(monkeypatch, clock):
+    volume = _Volume()
+    monkeypatch.setattr(modal_deploy, "model_volume", volume)
+
+    # 기동 직후 마운트된 볼륨은 최신이므로 첫 요청도 reload 하지 않음
+    for _ in range(5):
+        assert modal_deploy._load_engine() == ("engine", modal_deploy.MODEL_PATH)
+        clock[0] += 10
+    assert volume.reloads == 0
+
+    clock[0] += 20          # 마지막 기준 시각에서 60s
+    modal_deploy._load_engine()
+    modal_deploy._load_engine()
+    assert volume.reloads == 1
+
+    clock[0] += 59
+    modal_deploy._load_engine()
+    assert volume.reloads == 1
+    clock[0] += 1
+    modal_deploy._load_engine()
+    assert volume.reloads == 2
+
+
+def test_failed_reload_keeps_weights_and_waits_for_next_interval(monkeypatch, clock):
+    volume = _Volume(fail=True)
+    monkeypatch.setattr(modal_deploy, "model_volume", volume)
+
+    modal_deploy._load_engine()
+    clock[0] += 60
+    assert modal_deploy._load_engine() == ("engine", modal_deploy.MODEL_PATH)
+    modal_deploy._load_engine()
+    assert volume.reloads == 1
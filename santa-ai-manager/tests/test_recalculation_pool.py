@@ -0,0 +1,19 @@
+# tests/test_recalculation_pool.py
+# 병렬 재계산용 프로세스 풀 / Manager 가 close() 로 정리되는지 확인 (user-009)
+import multiprocessing
+
+from app.services.centroid_service import CentroidService
+
+
+def test_close_shuts_down_pool_and_manager():
+    service = CentroidService()
+    pool, manager = service._get_process_pool(2)
+    assert pool.submit(abs, -3).result() == 3
+    assert multiprocessing.active_children()
+
+    service.close()
+
+    assert service._process_pool is None and service._manager is None
+    assert multiprocessing.active_children() == []
+    # 두 번 불러도 안전 (API / 워커 종료 경로에서 각각 호출)
+    service.close()
@@ -0,0 +1,43 @@
+# tests/test_recalculation_schedule.py
+# 재계산 예약이 동시에 들어와도 재계산은 항상 1개만 실행되는지 확인 (user-008)
+import time
+import asyncio
+import threading
+
+from app.services.centroid_service import CentroidService
+from app.services.centroid_cache import CentroidSet
+
+
+def test_concurrent_schedules_run_one_recalculation(monkeypatch):
+    service = CentroidService()
+    running = []
+    peak = []
+    cancels = []
+    lock = threading.Lock()
+
+    def fake_recalculate(centroid_set, cancel):
+        cancels.append(cancel)
+        with lock:
+            running.append(centroid_set.version)
+            peak.append(len(running))
+        # 페이지 단위로 cancel 을 확인하는 실제 재계산 흉내
+        deadline = time.monotonic() + 1.0
+        while not cancel.is_set() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        with lock:
+            running.remove(centroid_set.version)
+
+    monkeypatch.setattr(service, "_recalculate_all_posts_levels", fake_recalculate)
+
+    async def scenario():
+        sets = [CentroidSet.empty(version=v) for v in range(1, 6)]
+        await asyncio.gather(*(service.schedule_recalculation(s) for s in sets))
+        await service.cancel_recalculation()
+
+    asyncio.run(scenario())
+
+    assert len(cancels) == 5
+    assert max(peak) == 1
+    # 대체되거나 종료 시 중단된 재계산은 모두 cancel 을 받았어야 함 (버려진 Event 없음)
+    assert all(cancel.is_set() for cancel in cancels)
+    assert running == []
@@ -0,0 +1,48 @@
+# tests/test_score_levels.py
+# /internal/score-levels: what-if centroid 입력이 잘못되면 500 대신 422 (user-015)
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+
+from app.api import routes
+from app.core.config import settings
+
+DIM = routes.VECTOR_DIM
+
+
+def _post(body):
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/internal/score-levels", json=body, headers={"x-santa-token": settings.SANTA_SECRET_TOKEN}
+            )
+
+    return asyncio.run(send())
+
+
+def _vectors(n=2):
+    return np.random.default_rng(0).normal(size=(n, DIM)).tolist()
+
+
+def test_score_levels_with_custom_centroids():
+    rng = np.random.default_rng(1)
+    centroids = {str(i + 1): rng.normal(size=DIM).tolist() for i in range(3)}
+    res = _post({"vectors": _vectors(), "centroids": centroids})
+    assert res.status_code == 200
+
+
+@pytest.mark.parametrize("centroids", [
+    {"easy": [0.1] * DIM},                           # 정수가 아닌 레벨 키
+    {"1": [0.1] * DIM, "2": [0.1] * (DIM - 1)},      # 길이가 제각각
+    {"1": [0.1, 0.2, 0.3], "2": [0.3, 0.2, 0.1]},    # 차원 불일치
+])
+def test_score_levels_rejects_bad_centroids(centroids):
+    res = _post({"vectors": _vectors(), "centroids": centroids})
+    assert res.status_code == 422
@@ -0,0 +1,83 @@
+# tests/test_stream_queue.py
+# StreamQueue 복구 / 회수 / dead letter 동작 확인 (user-016)
+import time
+import asyncio
+
+import fakeredis
+
+from app.services.queue_backend import StreamQueue
+
+STREAM = "test:inference"
+GROUP = "workers"
+
+
+def _queue(redis, consumer, **kwargs):
+    return StreamQueue(redis, STREAM, GROUP, consumer, **kwargs)
+
+
+async def _crash_with_pending(redis, n: int, consumer: str = "w1"):
+    """n 건을 배달받은 뒤 ACK 없이 죽은 consumer"""
+    crashed = _queue(redis, consumer)
+    for i in range(n):
+        await crashed.push({"job_id": i})
+    messages = await crashed.read(count=n, block_ms=10)
+    assert len(messages) == n
+
+
+def test_recovery_returns_pending_entries_once():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await _crash_with_pending(redis, 3)
+
+        # 재시작한 같은 이름의 consumer. ACK 는 처리 태스크가 나중에 하므로 읽기 사이에 ACK 하지 않음
+        restarted = _queue(redis, "w1")
+        reads = [[m.data["job_id"] for m in await restarted.read(count=10, block_ms=10)] for _ in range(4)]
+        return reads, restarted
+
+    reads, restarted = asyncio.run(scenario())
+    assert reads == [[0, 1, 2], [], [], []]
+    assert restarted._recovering is False
+
+
+def test_recovery_pages_through_pending_entries():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await _crash_with_pending(redis, 5)
+        restarted = _queue(redis, "w1")
+        return [[m.data["job_id"] for m in await restarted.read(count=2, block_ms=10)] for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [[0, 1], [2, 3], [4], []]
+
+
+def test_recovered_entries_over_max_deliveries_go_to_dead_letter():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await _crash_with_pending(redis, 2)
+        # 매번 처리 중에 죽는 독성 메시지: 재시작할 때마다 다시 배달됨
+        for _ in range(3):
+            messages = await _queue(redis, "w1", max_deliveries=3).read(count=10, block_ms=10)
+        dead = await redis.xrange(f"{STREAM}:dead")
+        pending = await redis.xpending(STREAM, GROUP)
+        return messages, dead, pending
+
+    messages, dead, pending = asyncio.run(scenario())
+    assert messages == []
+    assert [fields["reason"] for _, fields in dead] == ["max deliveries exceeded"] * 2
+    assert pending["pending"] == 0
+
+
+def test_idle_entries_are_claimed_by_another_consumer():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await _crash_with_pending(redis, 2, consumer="w1")
+        time.sleep(0.05)
+
+        other = _queue(redis, "w2", claim_idle_ms=20)
+        claimed = await other.read(count=10, block_ms=10)
+        await other.ack([m.id for m in claimed])
+        return claimed, other, await redis.xpending(STREAM, GROUP)
+
+    claimed, other, pending = asyncio.run(scenario())
+    assert sorted(m.data["job_id"] for m in claimed) == [0, 1]
+    assert other.claimed == 2
+    assert pending["pending"] == 0
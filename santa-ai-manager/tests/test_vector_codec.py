@@ -0,0 +1,75 @@
+# tests/test_vector_codec.py
+# 벡터 base64 바이너리 코덱 (user-005)
+# - float32 / float16 왕복, JSON 리스트 fallback, 잘못된 shape / dtype 헤더 거절
+# - Modal 쪽 웹훅 payload(modal_deploy._result_payload)를 서버 쪽 모델이 그대로 디코딩
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.api.routes import InferenceResult
+from app.core.vector_codec import EncodedVector, encode_array, decode_array
+
+DIM = 1152
+
+
+@pytest.fixture
+def vector():
+    v = np.random.default_rng(0).normal(size=DIM).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_float32_round_trip_is_exact(vector):
+    encoded = encode_array(vector, "float32")
+    assert encoded["dtype"] == "float32" and encoded["shape"] == [DIM]
+    decoded = decode_array(**encoded)
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, vector)
+
+
+def test_float16_round_trip_within_half_precision(vector):
+    decoded = EncodedVector(**encode_array(vector, "float16")).to_numpy()
+    assert decoded.dtype == np.float32
+    assert np.allclose(decoded, vector, atol=1e-3)
+
+
+def test_batch_shape_round_trip(vector):
+    batch = np.stack([vector, -vector])
+    assert np.array_equal(decode_array(**encode_array(batch)), batch)
+
+
+def test_json_fallback_and_binary_preference(vector):
+    as_json = InferenceResult(job_id=1, status="completed", unified_vector=vector.tolist())
+    assert np.allclose(as_json.get_vector(), vector)
+
+    # 둘 다 있으면 바이너리 우선
+    both = InferenceResult(
+        job_id=1, status="completed", unified_vector=[0.0] * DIM, vector=encode_array(vector),
+    )
+    assert np.array_equal(both.get_vector(), vector)
+
+
+def test_bad_headers_are_rejected(vector):
+    encoded = encode_array(vector)
+    with pytest.raises(ValueError):
+        decode_array("float32", [DIM + 1], encoded["data"])
+    with pytest.raises(ValueError):
+        decode_array("float64", [DIM], encoded["data"])
+    with pytest.raises(ValueError):
+        encode_array(vector, "int8")
+    with pytest.raises(ValidationError):
+        EncodedVector(dtype="float64", shape=[DIM], data=encoded["data"])
+    # 웹훅에서는 ValueError 로 올라와 422 로 처리됨
+    with pytest.raises(ValueError):
+        InferenceResult(job_id=1, status="completed", vector={**encoded, "shape": [2, DIM]}).get_vector()
+
+
+@pytest.mark.parametrize("encoding", ["json", "float32", "float16"])
+def test_modal_result_payload_decodes_on_the_server(vector, encoding):
+    modal_deploy = pytest.importorskip("modal_deploy")
+
+    payload = modal_deploy._result_payload(42, vector, encoding)
+    result = InferenceResult(**payload)
+
+    assert result.job_id == 42 and result.status == "completed"
+    assert ("vector" in payload) == (encoding != "json")
+    assert np.allclose(result.get_vector(), vector, atol=1e-3 if encoding == "float16" else 1e-7)
@@ -0,0 +1,61 @@
+# tests/test_wandb_service.py
+# WandB 로깅 파이프라인을 네트워크 없이 확인 (user-012)
+# - 큐가 가득 차면 버리고 dropped 카운트, max_batch 단위로 묶어 전송, close 시 남은 항목 전송
+# - close 이후 늦게 들어온 로그는 스레드를 다시 띄우지 않고 버림
+from app.services.wandb_service import WandBService, NullSink
+
+
+class RecordingSink(NullSink):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.finished = 0
+
+    def log_rows(self, rows):
+        super().log_rows(rows)
+        self.batches.append(list(rows))
+
+    def finish(self):
+        self.finished += 1
+
+
+def test_drops_and_counts_when_queue_is_full():
+    service = WandBService(sink=RecordingSink(), max_queue=3, flush_interval=60)
+    # 스레드 없이 큐만 채움 (_enqueue 가 start 하지 않도록 이미 살아 있는 것처럼 둠)
+    service.start = lambda: None
+
+    for i in range(5):
+        service.log_point([0.0], "post", str(i), 1)
+
+    assert service.stats["enqueued"] == 3
+    assert service.stats["dropped"] == 2
+    assert service.stats["pending"] == 3
+
+
+def test_batches_by_max_batch_and_flushes_on_close():
+    sink = RecordingSink()
+    service = WandBService(sink=sink, max_queue=100, flush_interval=60, max_batch=4)
+
+    for i in range(10):
+        service.log_point([float(i)], "post", str(i), 1)
+    # flush_interval 이 지나기 전이라도 close 하면 남은 항목을 모두 전송
+    service.close(timeout=5)
+
+    assert [len(batch) for batch in sink.batches] == [4, 4, 2]
+    assert [row[0] for batch in sink.batches for row in batch] == [str(i) for i in range(10)]
+    assert service.stats["logged"] == 10
+    assert service.stats["pending"] == 0
+    assert sink.finished == 1
+
+
+def test_log_after_close_is_dropped_without_restarting():
+    sink = RecordingSink()
+    service = WandBService(sink=sink, max_queue=100, flush_interval=60)
+    service.log_point([0.0], "post", "1", 1)
+    service.close(timeout=5)
+
+    service.log_batch([([0.0], "centroid", "centroid_lv1", 1)])
+
+    assert service._thread is None
+    assert service.stats["dropped"] == 1
+    assert sink.rows == 1
@@ -0,0 +1,128 @@
+# tests/test_webhook_concurrency.py
+# /internal/inference-result 가 이벤트 루프를 막지 않는지 확인 (user-002)
+# Qdrant / MySQL 을 지연이 있는 비동기 가짜 객체로 바꾸고 동시에 요청을 보내서
+# 전체 소요 시간과 p99 지연이 "순차 처리였다면" 보다 훨씬 작은지 봅니다.
+# 차원이 다른 벡터는 일괄 수신과 같이 422 로 거절하는지도 확인 (user-004)
+import time
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+
+from app.api import routes
+from app.core.config import settings
+from app.services import ingest_service
+from app.services.centroid_cache import centroid_cache, CentroidSet
+from app.services.wandb_service import wandb_service
+
+IO_DELAY = 0.05       # 백엔드 호출 1번당 지연 (초)
+REQUESTS = 100
+
+
+class SlowQdrant:
+    def __init__(self):
+        self.points = 0
+
+    async def upsert(self, collection_name, points):
+        await asyncio.sleep(IO_DELAY)
+        self.points += len(points)
+
+
+class SlowConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        await asyncio.sleep(IO_DELAY)
+
+    async def commit(self):
+        self.engine.commits += 1
+
+
+class SlowEngine:
+    def __init__(self):
+        self.commits = 0
+
+    def connect(self):
+        return SlowConnection(self)
+
+
+@pytest.fixture
+def webhook_app(monkeypatch):
+    qdrant, engine = SlowQdrant(), SlowEngine()
+    monkeypatch.setattr(ingest_service, "async_qdrant_client", qdrant)
+    monkeypatch.setattr(ingest_service, "async_engine", engine)
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", False)
+    monkeypatch.setattr(settings, "MIRROR_ENABLED", False)
+    monkeypatch.setattr(wandb_service, "log_point", lambda **kwargs: None)
+
+    rng = np.random.default_rng(0)
+    centroids = rng.normal(size=(10, ingest_service.VECTOR_DIM))
+    centroid_cache.set_local(CentroidSet.from_dict({str(i + 1): c.tolist() for i, c in enumerate(centroids)}, version=1))
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    return app, qdrant, engine
+
+
+async def _fire(app, n: int):
+    rng = np.random.default_rng(1)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def one(i):
+            started = time.perf_counter()
+            res = await client.post(
+                "/internal/inference-result",
+                json={"job_id": i, "status": "completed", "unified_vector": rng.normal(size=ingest_service.VECTOR_DIM).tolist()},
+                headers={"x-santa-token": settings.SANTA_SECRET_TOKEN},
+            )
+            return res, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(n)))
+        return results, time.perf_counter() - started
+
+
+def test_webhook_requests_overlap(webhook_app):
+    app, qdrant, engine = webhook_app
+    results, wall = asyncio.run(_fire(app, REQUESTS))
+
+    assert all(res.status_code == 200 for res, _ in results)
+    assert all(res.json()["assigned_level"] in range(1, 11) for res, _ in results)
+    assert qdrant.points == REQUESTS
+    assert engine.commits == REQUESTS
+
+    # 요청당 백엔드 지연 2번 (Qdrant upsert + MySQL UPDATE). 순차라면 REQUESTS * 0.1s = 10s
+    serial = REQUESTS * 2 * IO_DELAY
+    latencies = np.array([elapsed for _, elapsed in results])
+    p99 = float(np.percentile(latencies, 99))
+    assert wall < serial / 4, f"wall={wall:.2f}s, serial={serial:.2f}s"
+    assert p99 < serial / 4, f"p99={p99:.2f}s"
+
+
+def test_webhook_rejects_wrong_dimension(webhook_app):
+    app, qdrant, engine = webhook_app
+
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/internal/inference-result",
+                json={"job_id": 1, "status": "completed", "unified_vector": [0.1] * (ingest_service.VECTOR_DIM - 1)},
+                headers={"x-santa-token": settings.SANTA_SECRET_TOKEN},
+            )
+
+    res = asyncio.run(post())
+
+    assert res.status_code == 422
+    assert qdrant.points == 0
+    assert engine.commits == 0
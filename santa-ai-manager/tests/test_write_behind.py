@@ -0,0 +1,144 @@
+# tests/test_write_behind.py
+# 웹훅 write-behind 버퍼 (user-003)
+# - 크기 / 시간 조건으로 flush 하면 한 번의 멀티 포인트 upsert + 한 번의 일괄 UPDATE 커밋
+# - 저장 실패는 기다리던 모든 submit 에 예외로 전달
+# - stop 은 남은 항목을 바로 flush 하고, 이후 submit 은 거절
+import time
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import ingest_service
+from app.services.write_behind import WriteBehindBuffer
+
+
+class FakeQdrant:
+    def __init__(self):
+        self.upserts = []
+
+    async def upsert(self, collection_name, points):
+        self.upserts.append([p.id for p in points])
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        if self.engine.error is not None:
+            raise self.engine.error
+        self.engine.statements += 1
+
+    async def commit(self):
+        self.engine.commits += 1
+
+
+class FakeEngine:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.error = None
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    qdrant, engine = FakeQdrant(), FakeEngine()
+    monkeypatch.setattr(ingest_service, "async_qdrant_client", qdrant)
+    monkeypatch.setattr(ingest_service, "async_engine", engine)
+    monkeypatch.setattr(settings, "MIRROR_ENABLED", False)
+    return qdrant, engine
+
+
+def _submit_all(buffer, ids):
+    return [asyncio.create_task(buffer.submit(pid, [0.1, 0.2], 1, 0.5)) for pid in ids]
+
+
+def test_size_flush_writes_one_batch(backends):
+    qdrant, engine = backends
+
+    async def scenario():
+        buffer = WriteBehindBuffer(max_items=5, max_delay_ms=10_000, max_pending=100)
+        buffer.start()
+        started = time.monotonic()
+        await asyncio.gather(*_submit_all(buffer, range(1, 6)))
+        elapsed = time.monotonic() - started
+        await buffer.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    # max_items 가 차면 max_delay 를 기다리지 않음
+    assert elapsed < 1.0
+    assert qdrant.upserts == [[1, 2, 3, 4, 5]]
+    assert engine.statements == 1
+    assert engine.commits == 1
+
+
+def test_age_flush_writes_one_batch(backends):
+    qdrant, engine = backends
+
+    async def scenario():
+        buffer = WriteBehindBuffer(max_items=100, max_delay_ms=50, max_pending=100)
+        buffer.start()
+        await asyncio.gather(*_submit_all(buffer, [7, 8, 9]))
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+    assert qdrant.upserts == [[7, 8, 9]]
+    assert engine.statements == 1
+    assert engine.commits == 1
+
+
+def test_persist_failure_raises_to_every_waiter(backends):
+    _, engine = backends
+    engine.error = RuntimeError("mysql down")
+
+    async def scenario():
+        buffer = WriteBehindBuffer(max_items=3, max_delay_ms=10_000, max_pending=100)
+        buffer.start()
+        results = await asyncio.gather(*_submit_all(buffer, [1, 2, 3]), return_exceptions=True)
+        await buffer.stop()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) and str(r) == "mysql down" for r in results)
+    assert engine.commits == 0
+
+
+def test_stop_flushes_pending_then_rejects(backends):
+    qdrant, engine = backends
+
+    async def scenario():
+        buffer = WriteBehindBuffer(max_items=100, max_delay_ms=10_000, max_pending=100)
+        buffer.start()
+        waiting = _submit_all(buffer, [1, 2])
+        await asyncio.sleep(0.05)
+        assert not any(task.done() for task in waiting)
+
+        started = time.monotonic()
+        await buffer.stop()
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*waiting)
+
+        with pytest.raises(RuntimeError):
+            await buffer.submit(3, [0.1, 0.2], 1)
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    # max_delay(10s) 를 기다리지 않고 바로 flush
+    assert elapsed < 1.0
+    assert qdrant.upserts == [[1, 2]]
+    assert engine.commits == 1